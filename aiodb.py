@@ -0,0 +1,77 @@
+import os
+
+try:
+    import aiomysql
+except ImportError:   # optional: only the async app (asgi.py) needs it
+    aiomysql = None
+
+from db import DB_CONFIG
+
+
+# Async pool settings, per worker process (each worker has its own event loop and pool).
+ASYNC_POOL_MIN = int(os.environ.get("FLYTAU_ASYNC_POOL_MIN", "2"))
+ASYNC_POOL_SIZE = int(os.environ.get("FLYTAU_ASYNC_POOL_SIZE", "20"))
+ASYNC_POOL_RECYCLE = int(os.environ.get("FLYTAU_POOL_RECYCLE", "3600"))   # same setting as the sync pool
+
+_pool = None
+
+
+async def open_pool():
+    """
+    Creates the async connection pool of this worker (called once when the server starts).
+    """
+    global _pool
+    if aiomysql is None:
+        raise RuntimeError("The async app needs aiomysql (pip install aiomysql quart hypercorn).")
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            host=DB_CONFIG["host"],
+            user=DB_CONFIG["user"],
+            password=DB_CONFIG["password"],
+            db=DB_CONFIG["database"],
+            autocommit=DB_CONFIG["autocommit"],
+            charset="utf8mb4",
+            minsize=ASYNC_POOL_MIN,
+            maxsize=ASYNC_POOL_SIZE,
+            pool_recycle=ASYNC_POOL_RECYCLE,
+        )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def fetch_steps(steps):
+    """
+    Async twin of db.run_steps: runs query steps on a connection of the async pool,
+    awaiting each statement instead of blocking. Steps answered from the in-process
+    caches (route directory, seat maps) finish without borrowing a connection.
+    """
+    try:
+        sql, params = steps.send(None)
+    except StopIteration as done:
+        return done.value
+
+    async with _pool.acquire() as cnx:
+        async with cnx.cursor(aiomysql.DictCursor) as cur:
+            while True:
+                await cur.execute(sql, params)
+                rows = list(await cur.fetchall()) if cur.description else []
+                try:
+                    sql, params = steps.send(rows)
+                except StopIteration as done:
+                    return done.value
+
+
+def async_pool_stats():
+    """
+    Snapshot of the async pool of this worker (empty before open_pool()).
+    """
+    if _pool is None:
+        return {}
+    return {"size": _pool.size, "free": _pool.freesize, "max": _pool.maxsize}
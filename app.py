@@ -1,7 +1,57 @@
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, Response, jsonify
 from datetime import datetime, timedelta, date
-from db import get_db_connection
+import os
+import uuid
+from aiodb import async_pool_stats
+from db import (
+    finish_request_stats,
+    get_db_connection,
+    pool_stats,
+    run_steps,
+    sql_debug_snapshot,
+    sql_statement_stats,
+    sql_stats,
+    start_request_stats,
+)
+from pages import (
+    ORDER_STATUSES,
+    guest_order_steps,
+    manager_flights_steps,
+    parse_order_cursor,
+    parse_passengers,
+    parse_search_form,
+    registered_orders_steps,
+    search_page_steps,
+    seat_page_steps,
+)
+from report_export import EXPORT_FORMATS, export_filename, export_formats, export_report
+from reports import (
+    FactDeltas,
+    bookings_changed,
+    invalidate_reports,
+    refresh_facts,
+    report_cache_stats,
+    report_filters,
+    run_report,
+)
+from schedule_import import MAX_SCHEDULE_BYTES, import_schedule
+from scheduling import auto_assign_crew, available_resources
+from search import SEARCH_FLEX_DAYS, connecting_itineraries, fare_calendar, get_route_directory
+from seating import (
+    SeatQuote,
+    quote_seats,
+    get_seat_map,
+    invalidate_seat_map,
+    occupy_seats,
+    release_seats,
+    drop_occupancy,
+    hold_seats,
+    hold_is_valid,
+    release_hold,
+)
+from session_store import make_session_interface
+from sweeper import start_sweeper, sweeper_stats
 from utils import (
     parse_phones,
     mysql_time_to_timedelta,
@@ -19,9 +69,6 @@ from utils import (
     is_valid_hebrew_name,
     create_seats_for_aircraft,
     update_flight_full_status,
-    auto_complete_flights,
-    four_day_availability_ok,
-    seat_layout,
 )
 
 
@@ -34,6 +81,42 @@ app.secret_key = "flytau_secret_key"
 app.config["SESSION_PERMANENT"] = False
 app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
 app.config["SESSION_COOKIE_SECURE"] = False
+app.config["MAX_CONTENT_LENGTH"] = MAX_SCHEDULE_BYTES   # the largest request body is a schedule upload
+
+# Sessions are kept on the server (in-process, or SQLite with FLYTAU_SESSION_DB=<file>);
+# the cookie only carries the session id.
+app.session_interface = make_session_interface()
+
+
+@app.before_request
+def _start_sql_stats():
+    start_request_stats()
+
+
+@app.after_request
+def _add_sql_stats(response):
+    """
+    Adds the request's query count and DB time as response headers
+    and logs statements that ran in a loop (N+1 pattern).
+    """
+    stats = finish_request_stats(request.endpoint, request.method, request.path)
+    if stats is None:
+        return response
+
+    db_ms = stats.seconds * 1000
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["Server-Timing"] = f'db;dur={db_ms:.2f};desc="{stats.queries} queries"'
+    for item in stats.n_plus_one():
+        app.logger.warning("N+1 in %s: %d x %s", request.endpoint, item["calls"], item["sql"])
+    return response
+
+
+# Landed flights are completed by a background sweeper, not by the web requests.
+# Run it as one separate worker ("python sweeper.py"); every web worker process imports
+# this module, so the in-process thread is opt-in (FLYTAU_SWEEPER=thread, e.g. for a
+# single-process dev server).
+if os.environ.get("FLYTAU_SWEEPER", "off") == "thread":
+    start_sweeper()
 
 
 
@@ -55,9 +138,9 @@ def cancel_order(order_id):
 
     cur.execute("""
         SELECT
-          o.O_ID, o.O_STATUS, o.ORDER_PRICE, o.G_MAIL, o.R_MAIL,
-          f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-          f.FLIGHT_NUM
+          o.O_ID, o.O_STATUS, o.ORDER_PRICE, o.G_MAIL, o.R_MAIL, o.O_DATE,
+          f.DEPARTURE_DATE, f.DEPARTURE_TIME, f.DEPARTURE_DT,
+          f.FLIGHT_NUM, f.ECONOMY_PRICE, f.BUSINESS_PRICE
         FROM F_ORDER o
         JOIN FLIGHT f ON o.FLIGHT_NUM=f.FLIGHT_NUM
         WHERE o.O_ID=%s
@@ -97,15 +180,41 @@ def cancel_order(order_id):
         return render_template("cancel_confirm.html", order=o, fee=fee, new_price=new_price)
 
 
+    cancelled_at = datetime.now().replace(microsecond=0)
+    db.start_transaction()   # the cancellation, the freed seats and the facts commit together
     cur.execute("""
         UPDATE F_ORDER
         SET O_STATUS='CUSTOMER_CANCELLED',
             ORDER_PRICE=%s,
-            CANACELATION_DATE_TIME=NOW()
+            CANACELATION_DATE_TIME=%s
         WHERE O_ID=%s AND O_STATUS='ACTIVE'
-    """, (new_price, order_id))
-    update_flight_full_status(cur, o["FLIGHT_NUM"])
+    """, (new_price, cancelled_at, order_id))
+
+    if cur.rowcount == 1:
+        cur.execute("""
+            SELECT os.AIRCRAFT_ID, os.ROW_NUM, os.COL_LETTER, s.CLASS
+            FROM ORDER_SEAT os
+            JOIN SEAT s
+              ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+             AND s.ROW_NUM = os.ROW_NUM
+             AND s.COL_LETTER = os.COL_LETTER
+            WHERE os.O_ID=%s
+        """, (order_id,))
+        order_seats = cur.fetchall()
+        if order_seats:
+            seat_map = get_seat_map(cur, order_seats[0]["AIRCRAFT_ID"])
+            release_seats(cur, o["FLIGHT_NUM"], seat_map, [(x["ROW_NUM"], x["COL_LETTER"]) for x in order_seats])
+
+        update_flight_full_status(cur, o["FLIGHT_NUM"])
+
+        prices = {"ECONOMY": o["ECONOMY_PRICE"], "BUSINESS": o["BUSINESS_PRICE"]}
+        facts = FactDeltas()
+        facts.order_cancelled(o["FLIGHT_NUM"], o["O_DATE"],
+                              [(x["CLASS"], prices[x["CLASS"]]) for x in order_seats], new_price,
+                              (o["DEPARTURE_DT"] - cancelled_at).total_seconds() / 3600)
+        facts.write(cur)
     db.commit()
+    bookings_changed()
 
     cur.close(); db.close()
 
@@ -328,8 +437,6 @@ def flight_search():
     Shows the flight search page and handles searching flights by filters.
     On POST: validates inputs, checks route exists, then returns matching ACTIVE flights.
     """
-    auto_complete_flights()
-
     if session.get("user_type") == "manager":
         return redirect(url_for("manager_flights"))
 
@@ -338,113 +445,137 @@ def flight_search():
         session["first_name"] = "Guest"
         session.permanent = True
 
-    if request.method == "GET":
-        db = get_db_connection()
-        cur = db.cursor(dictionary=True)
-
-        cur.execute("""
-            SELECT DISTINCT ORIGIN AS city FROM ROUTE
-            UNION
-            SELECT DISTINCT DESTINATION AS city FROM ROUTE
-            ORDER BY city
-        """)
-        cities = [row["city"] for row in cur.fetchall()]
-
-        cur.close()
-        db.close()
+    routes = get_route_directory()
+    cities = routes.cities
 
+    if request.method == "GET":
         return render_template("flight_results.html", flights=None,
                                passengers=None, origin=None, destination=None, departure_date=None,
                                cities=cities,container_size="wide")
 
 
-    dep_date = request.form.get("departure_date", "").strip()
-    origin = request.form.get("origin", "").strip()
-    destination = request.form.get("destination", "").strip()
-    passengers_raw = request.form.get("passengers", "").strip()
+    error, search = parse_search_form(request.form)
+    if error:
+        flash(error, "error")
+        return redirect(url_for("flight_search"))
 
+    db = get_db_connection()
+    cur = db.cursor(dictionary=True)
+    page = run_steps(cur, search_page_steps(search))
+    cur.close()
+    db.close()
 
-    if not dep_date or not origin or not destination or not passengers_raw:
-        flash("Please fill in all fields to search flights.", "error")
+    if page["error"]:
+        flash(page["error"], "error")
         return redirect(url_for("flight_search"))
+    if page["notice"]:
+        flash(page["notice"], "error")
+
+    return render_template("flight_results.html",
+                           passengers=search["passengers"],
+                           origin=search["origin"],
+                           destination=search["destination"],
+                           departure_date=search["departure_date"],
+                           cities=cities,container_size="wide",
+                           **page)
+
 
+@app.route("/flights/calendar", methods=["GET"])
+def flight_calendar():
+    """
+    JSON fare/availability calendar: ?origin=&destination=&date=YYYY-MM-DD&days=3&passengers=1
+    Returns every date in the window with its flights and free seats per class.
+    """
+    origin = request.args.get("origin", "").strip()
+    destination = request.args.get("destination", "").strip()
 
     try:
-        passengers = int(passengers_raw)
-        if passengers <= 0:
+        center = datetime.strptime(request.args.get("date", "").strip(), "%Y-%m-%d").date()
+        days = int(request.args.get("days", SEARCH_FLEX_DAYS))
+        passengers = int(request.args.get("passengers", 1))
+        if days < 0 or passengers <= 0:
             raise ValueError()
     except ValueError:
-        flash("Passengers must be a positive number.", "error")
-        return redirect(url_for("flight_search"))
+        return jsonify({"error": "date must be YYYY-MM-DD, days >= 0 and passengers > 0"}), 400
+
+    if get_route_directory().route(origin, destination) is None:
+        return jsonify({"error": "no route between these cities", "days": []}), 404
 
     db = get_db_connection()
     cur = db.cursor(dictionary=True)
+    calendar = fare_calendar(cur, origin, destination, center, days, passengers)
+    cur.close()
+    db.close()
 
+    out = []
+    for day in calendar:
+        out.append({
+            "date": day["date"].isoformat(),
+            "available": day["available"],
+            "min_economy_price": float(day["min_economy_price"]) if day["min_economy_price"] is not None else None,
+            "free_economy": day["free_economy"],
+            "free_business": day["free_business"],
+            "flights": [{
+                "flight_num": f["FLIGHT_NUM"],
+                "departure_time": str(f["DEPARTURE_TIME"]),
+                "arrival_date": f["ARRIVAL_DATE"].isoformat(),
+                "arrival_time": str(f["ARRIVAL_TIME"]),
+                "economy_price": float(f["ECONOMY_PRICE"]) if f["ECONOMY_PRICE"] is not None else None,
+                "business_price": float(f["BUSINESS_PRICE"]) if f["BUSINESS_PRICE"] is not None else None,
+                "free_economy": f["FREE_ECONOMY"],
+                "free_business": f["FREE_BUSINESS"],
+            } for f in day["flights"]],
+        })
+
+    return jsonify({"origin": origin, "destination": destination, "days": out})
+
+
+@app.route("/flights/connections", methods=["GET"])
+def flight_connections():
+    """
+    JSON connecting itineraries: ?origin=&destination=&date=YYYY-MM-DD&stops=2&sort=duration|price
+    Each itinerary lists its legs (flight numbers and times), total duration and Economy price.
+    """
+    origin = request.args.get("origin", "").strip()
+    destination = request.args.get("destination", "").strip()
+    sort = request.args.get("sort", "duration")
 
-    cur.execute(
-        "SELECT 1 FROM ROUTE WHERE ORIGIN=%s AND DESTINATION=%s LIMIT 1",
-        (origin, destination)
-    )
-    route_exists = cur.fetchone() is not None
-
-    if not route_exists:
-        cur.close()
-        db.close()
-        flash("No flights exist for these routes. Try other destinations.", "error")
-        return redirect(url_for("flight_search"))
-
-
-    cur.execute(
-        """
-        SELECT
-            f.FLIGHT_NUM,
-            r.ORIGIN,
-            r.DESTINATION,
-            f.DEPARTURE_DATE,
-            f.DEPARTURE_TIME,
-            f.ARRIVAL_DATE,
-            f.ARRIVAL_TIME,
-            f.DURATION,
-            f.ECONOMY_PRICE
-        FROM FLIGHT f
-        JOIN ROUTE r
-          ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-        WHERE f.FLIGHT_STATUS = 'ACTIVE'
-          AND r.ORIGIN = %s
-          AND r.DESTINATION = %s
-          AND f.DEPARTURE_DATE = %s
-          AND TIMESTAMP(f.DEPARTURE_DATE, f.DEPARTURE_TIME) > NOW()
-        ORDER BY f.DEPARTURE_TIME ASC
-        """,
-            (origin, destination, dep_date)
-    )
-
-    flights = cur.fetchall()
-
+    try:
+        dep_date = datetime.strptime(request.args.get("date", "").strip(), "%Y-%m-%d").date()
+        stops = int(request.args.get("stops", 2))
+        passengers = int(request.args.get("passengers", 1))
+        if stops < 0 or passengers <= 0 or sort not in ("duration", "price"):
+            raise ValueError()
+    except ValueError:
+        return jsonify({"error": "date must be YYYY-MM-DD, stops >= 0, passengers > 0, sort duration|price"}), 400
 
-    cur.execute("""
-        SELECT DISTINCT ORIGIN AS city FROM ROUTE
-        UNION
-        SELECT DISTINCT DESTINATION AS city FROM ROUTE
-        ORDER BY city
-    """)
-    cities = [row["city"] for row in cur.fetchall()]
+    if not origin or not destination or origin.casefold() == destination.casefold():
+        return jsonify({"error": "origin and destination must be two different cities"}), 400
 
+    db = get_db_connection()
+    cur = db.cursor(dictionary=True)
+    itineraries = connecting_itineraries(cur, origin, destination, dep_date, passengers, stops, sort)
     cur.close()
     db.close()
 
-    if not flights:
-        flash("No active flights on this date. Try another date.", "error")
-        return redirect(url_for("flight_search"))
-
-
-    return render_template("flight_results.html",
-                           flights=flights,
-                           passengers=passengers,
-                           origin=origin,
-                           destination=destination,
-                           departure_date=dep_date,
-                           cities=cities,container_size="wide")
+    out = []
+    for it in itineraries:
+        out.append({
+            "stops": it["stops"],
+            "departure": it["departure"].isoformat(),
+            "arrival": it["arrival"].isoformat(),
+            "duration_minutes": int(it["duration"].total_seconds() // 60),
+            "economy_price": float(it["price"]) if it["price"] is not None else None,
+            "legs": [{
+                "flight_num": f["FLIGHT_NUM"],
+                "origin": f["ORIGIN"],
+                "destination": f["DESTINATION"],
+                "departure": f["DEPARTURE_DT"].isoformat(),
+                "arrival": f["ARRIVAL_DT"].isoformat(),
+            } for f in it["legs"]],
+        })
+
+    return jsonify({"origin": origin, "destination": destination, "itineraries": out})
 
 
 @app.route("/flight/<flight_num>/seats", methods=["GET", "POST"])
@@ -460,111 +591,35 @@ def seat_select(flight_num):
 
 
     if request.method == "GET":
-        passengers_raw = request.args.get("passengers", "").strip()
-        try:
-            passengers = int(passengers_raw)
-            if passengers <= 0:
-                raise ValueError()
-        except ValueError:
+        passengers = parse_passengers(request.args.get("passengers"))
+        if passengers is None:
             flash("Invalid passengers number.", "error")
             return redirect(url_for("flight_search"))
 
         db = get_db_connection()
         cur = db.cursor(dictionary=True)
+        page = run_steps(cur, seat_page_steps(flight_num, session.get("hold_id")))
+        cur.close(); db.close()
 
-        cur.execute("""
-            SELECT
-              f.FLIGHT_NUM, f.AIRCRAFT_ID, f.FLIGHT_STATUS,
-              f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-              f.ARRIVAL_DATE, f.ARRIVAL_TIME,
-              f.DURATION, f.ECONOMY_PRICE, f.BUSINESS_PRICE,
-              a.SIZE AS AIRCRAFT_SIZE,
-              a.MANUFACTURER AS MANUFACTURER,
-              r.ORIGIN, r.DESTINATION
-            FROM FLIGHT f
-            JOIN AIRCRAFT a ON f.AIRCRAFT_ID = a.AIRCRAFT_ID
-            JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-            WHERE f.FLIGHT_NUM = %s
-        """, (flight_num,))
-        flight = cur.fetchone()
-
-        if not flight or flight["FLIGHT_STATUS"] != "ACTIVE":
-            cur.close(); db.close()
+        if not page:
             flash("This flight is not active.", "error")
             return redirect(url_for("flight_search"))
 
-        aircraft_id = flight["AIRCRAFT_ID"]
-
-
-        cur.execute("""
-            SELECT ROW_NUM, COL_LETTER, CLASS
-            FROM SEAT
-            WHERE AIRCRAFT_ID=%s
-            ORDER BY ROW_NUM, COL_LETTER
-        """, (aircraft_id,))
-        seats = cur.fetchall()
-
-        if not seats:
-            cur.execute("""
-                SELECT CAPACITY_ECONOMY, CAPACITY_BUSINESS
-                FROM AIRCRAFT
-                WHERE AIRCRAFT_ID=%s
-                LIMIT 1
-            """, (aircraft_id,))
-            a = cur.fetchone()
-
-            if a:
-                create_seats_for_aircraft(
-                    cur,
-                    aircraft_id,
-                    int(a["CAPACITY_ECONOMY"] or 0),
-                    int(a["CAPACITY_BUSINESS"] or 0)
-                )
-                db.commit()
-
-
-                cur.execute("""
-                    SELECT ROW_NUM, COL_LETTER, CLASS
-                    FROM SEAT
-                    WHERE AIRCRAFT_ID=%s
-                    ORDER BY ROW_NUM, COL_LETTER
-                """, (aircraft_id,))
-                seats = cur.fetchall()
-
-        rows_map = {}
-        for s in seats:
-            r = s["ROW_NUM"]
-            c = s["COL_LETTER"]
-            rows_map.setdefault(r, {})[c] = s["CLASS"]
-
-        row_numbers = sorted(rows_map.keys())
-        cols_left, cols_mid, cols_right = seat_layout(flight["MANUFACTURER"], flight["AIRCRAFT_SIZE"])
-
-
-        cur.execute("""
-            SELECT os.ROW_NUM, os.COL_LETTER
-            FROM ORDER_SEAT os
-            JOIN F_ORDER o ON os.O_ID = o.O_ID
-            WHERE o.FLIGHT_NUM=%s AND o.O_STATUS='ACTIVE'
-        """, (flight_num,))
-        occupied = set((x["ROW_NUM"], x["COL_LETTER"]) for x in cur.fetchall())
-
-        cur.close(); db.close()
-
 
         session["passengers"] = passengers
         session["selected_flight_num"] = flight_num
         session.modified = True
 
+        seat_map = page["seat_map"]
         return render_template(
             "seat_select.html",
-            flight=flight,
-            rows_map=rows_map,
-            row_numbers=row_numbers,
-            cols_left=cols_left,
-            cols_mid=cols_mid,
-            cols_right=cols_right,
-            occupied=occupied,
+            flight=page["flight"],
+            rows_map=seat_map.rows_map,
+            row_numbers=seat_map.row_numbers,
+            cols_left=seat_map.cols_left,
+            cols_mid=seat_map.cols_mid,
+            cols_right=seat_map.cols_right,
+            occupied=page["occupied"],
             passengers=passengers
         )
 
@@ -582,61 +637,37 @@ def seat_select(flight_num):
 
     db = get_db_connection()
     cur = db.cursor(dictionary=True)
+    quote = quote_seats(cur, flight_num, selected)
 
-    cur.execute("SELECT AIRCRAFT_ID, ECONOMY_PRICE, BUSINESS_PRICE FROM FLIGHT WHERE FLIGHT_NUM=%s", (flight_num,))
-    f = cur.fetchone()
-    if not f:
+    if not quote:
         cur.close(); db.close()
         flash("Flight not found.", "error")
         return redirect(url_for("flight_search"))
 
-    aircraft_id = f["AIRCRAFT_ID"]
-    econ_price = float(f["ECONOMY_PRICE"] or 0)
-    bus_price = float(f["BUSINESS_PRICE"] or 0)
-
-
-    cur.execute("""
-        SELECT os.ROW_NUM, os.COL_LETTER
-        FROM ORDER_SEAT os
-        JOIN F_ORDER o ON os.O_ID = o.O_ID
-        WHERE o.FLIGHT_NUM=%s AND o.O_STATUS='ACTIVE'
-    """, (flight_num,))
-    occupied_now = set((x["ROW_NUM"], x["COL_LETTER"]) for x in cur.fetchall())
-
-    seat_details = []
-    total_price = 0.0
-
-    for seat_code in selected:
-        seat_code = seat_code.strip().upper()
-        row_num = int(seat_code[:-1])
-        col = seat_code[-1]
-
-        if (row_num, col) in occupied_now:
-            cur.close(); db.close()
-            flash("One of the selected seats was just taken. Please choose again.", "error")
-            return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
-
-        cur.execute("""
-            SELECT CLASS FROM SEAT
-            WHERE AIRCRAFT_ID=%s AND ROW_NUM=%s AND COL_LETTER=%s
-        """, (aircraft_id, row_num, col))
-        srow = cur.fetchone()
-        if not srow:
-            cur.close(); db.close()
-            flash("Invalid seat selection.", "error")
-            return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
+    if quote.taken:
+        cur.close(); db.close()
+        flash("One of the selected seats was just taken. Please choose again.", "error")
+        return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
 
-        seat_class = srow["CLASS"]
-        price = bus_price if seat_class == "BUSINESS" else econ_price
-        total_price += price
+    if not quote.ok or len(quote.seats) != passengers:
+        cur.close(); db.close()
+        flash("Invalid seat selection.", "error")
+        return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
 
-        seat_details.append({"code": seat_code, "row": row_num, "col": col, "class": seat_class, "price": price})
 
+    hold_id = session.get("hold_id") or uuid.uuid4().hex
+    held = hold_seats(cur, flight_num, hold_id, [(x["row"], x["col"]) for x in quote.seats])
     cur.close(); db.close()
 
+    if not held:
+        flash("One of the selected seats was just taken. Please choose again.", "error")
+        return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
+
 
-    session["selected_aircraft_id"] = aircraft_id
-    session["selected_seats"] = [x["code"] for x in seat_details]
+    session["hold_id"] = hold_id
+    session["selected_aircraft_id"] = quote.aircraft_id
+    session["selected_seats"] = [x["code"] for x in quote.seats]
+    session["selected_quote"] = quote.to_session()
     session["selected_flight_num"] = flight_num
     session["passengers"] = passengers
     session.modified = True
@@ -659,7 +690,7 @@ def checkout():
     passengers = session.get("passengers")
     selected_codes = session.get("selected_seats") or []
     aircraft_id = session.get("selected_aircraft_id")
-    total_price = session.get("selected_total_price")
+    quote = SeatQuote.from_session(session.get("selected_quote"))
 
 
     if not flight_num or not passengers or not selected_codes or not aircraft_id:
@@ -667,52 +698,6 @@ def checkout():
         return redirect(url_for("flight_search"))
 
 
-    if total_price is None:
-        db_tmp = get_db_connection()
-        cur_tmp = db_tmp.cursor(dictionary=True)
-
-        cur_tmp.execute(
-            "SELECT ECONOMY_PRICE, BUSINESS_PRICE FROM FLIGHT WHERE FLIGHT_NUM=%s",
-            (flight_num,)
-        )
-        f = cur_tmp.fetchone()
-        if not f:
-            cur_tmp.close(); db_tmp.close()
-            flash("Flight not found.", "error")
-            return redirect(url_for("flight_search"))
-
-        econ = float(f["ECONOMY_PRICE"] or 0)
-        bus = float(f["BUSINESS_PRICE"] or 0)
-
-        total = 0.0
-        for code in selected_codes:
-            code = code.strip().upper()
-            row_num = int(code[:-1])
-            col = code[-1]
-
-            cur_tmp.execute("""
-                SELECT CLASS FROM SEAT
-                WHERE AIRCRAFT_ID=%s AND ROW_NUM=%s AND COL_LETTER=%s
-            """, (aircraft_id, row_num, col))
-            s = cur_tmp.fetchone()
-            seat_class = s["CLASS"] if s else "ECONOMY"
-
-            total += (bus if seat_class == "BUSINESS" else econ)
-
-        cur_tmp.close(); db_tmp.close()
-
-        total_price = float(total)
-        session["selected_total_price"] = total_price
-        session.modified = True
-
-
-    try:
-        total_price = float(total_price)
-    except Exception:
-        flash("Price calculation failed. Please choose seats again.", "error")
-        return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
-
-
     db = None
     cur = None
     try:
@@ -721,6 +706,22 @@ def checkout():
         cur = db.cursor(dictionary=True)
 
 
+        if quote is None or quote.flight_num != flight_num:
+            quote = quote_seats(cur, flight_num, selected_codes)
+            if not quote:
+                flash("Flight not found.", "error")
+                return redirect(url_for("flight_search"))
+            if not quote.ok:
+                flash("Price calculation failed. Please choose seats again.", "error")
+                return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
+            session["selected_quote"] = quote.to_session()
+            session.modified = True
+
+        seat_details = quote.seats
+        total_price = quote.total_price
+        aircraft_id = quote.aircraft_id
+
+
         cur.execute(
             """
             SELECT
@@ -737,36 +738,6 @@ def checkout():
             flash("Flight not found.", "error")
             return redirect(url_for("flight_search"))
 
-
-        cur.execute("SELECT ECONOMY_PRICE, BUSINESS_PRICE FROM FLIGHT WHERE FLIGHT_NUM=%s", (flight_num,))
-        pf = cur.fetchone()
-        econ = float(pf["ECONOMY_PRICE"] or 0)
-        bus = float(pf["BUSINESS_PRICE"] or 0)
-
-
-        seat_details = []
-        for code in selected_codes:
-            code = code.strip().upper()
-            row_num = int(code[:-1])
-            col = code[-1]
-
-            cur.execute("""
-                SELECT CLASS FROM SEAT
-                WHERE AIRCRAFT_ID=%s AND ROW_NUM=%s AND COL_LETTER=%s
-            """, (aircraft_id, row_num, col))
-            srow = cur.fetchone()
-            seat_class = srow["CLASS"] if srow else "ECONOMY"
-
-            price = bus if seat_class == "BUSINESS" else econ
-
-            seat_details.append({
-                "code": code,
-                "row": row_num,
-                "col": col,
-                "class": seat_class,
-                "price": float(price)
-            })
-
         user_type = session.get("user_type")
 
 
@@ -869,15 +840,36 @@ def checkout():
             user_type_enum = "REGISTERD"
 
 
-        order_id = next_order_id(cur)
+        seat_keys = [(x["row"], x["col"]) for x in seat_details]
+        seat_map = get_seat_map(cur, aircraft_id)
+
+        # the seat claim, the order rows and the counters are committed together,
+        # so a failure anywhere below rolls the claim back as well
+        db.start_transaction()
+        if not hold_is_valid(cur, flight_num, session.get("hold_id"), seat_keys):
+            db.rollback()
+            session.pop("selected_quote", None)
+            flash("Your seat reservation expired. Please choose seats again.", "error")
+            return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
+
+        if not occupy_seats(cur, flight_num, seat_map, seat_keys):
+            db.rollback()
+            session.pop("selected_quote", None)
+            flash("One of the selected seats was just taken. Please choose again.", "error")
+            return redirect(url_for("seat_select", flight_num=flight_num, passengers=passengers))
+
+        order_id = next_order_id()
         order_date = date.today()
 
         cur.execute(
             """
-            INSERT INTO F_ORDER (O_ID, FLIGHT_NUM, G_MAIL, R_MAIL, O_STATUS, O_DATE, ORDER_PRICE, USER_TYPE, CANACELATION_DATE_TIME)
-            VALUES (%s,%s,%s,%s,'ACTIVE',%s,%s,%s,NULL)
+            INSERT INTO F_ORDER (O_ID, FLIGHT_NUM, G_MAIL, R_MAIL, O_STATUS, O_DATE, ORDER_PRICE, USER_TYPE,
+                                 CANACELATION_DATE_TIME, DEPARTURE_DT)
+            SELECT %s, FLIGHT_NUM, %s, %s, 'ACTIVE', %s, %s, %s, NULL, DEPARTURE_DT
+            FROM FLIGHT
+            WHERE FLIGHT_NUM=%s
             """,
-            (order_id, flight_num, g_mail, r_mail, order_date, total_price, user_type_enum)
+            (order_id, g_mail, r_mail, order_date, total_price, user_type_enum, flight_num)
         )
 
 
@@ -891,13 +883,20 @@ def checkout():
             )
 
         update_flight_full_status(cur, flight_num)
+        release_hold(cur, session.get("hold_id"))
+
+        facts = FactDeltas()
+        facts.order_placed(flight_num, order_date, [(s["class"], s["price"]) for s in seat_details])
+        facts.write(cur)
         db.commit()
+        bookings_changed()
 
 
+        session.pop("hold_id", None)
         session.pop("selected_flight_num", None)
         session.pop("selected_aircraft_id", None)
         session.pop("selected_seats", None)
-        session.pop("selected_total_price", None)
+        session.pop("selected_quote", None)
         session.pop("passengers", None)
 
         return render_template("order_success.html", order_id=order_id, flight=flight, total_price=total_price)
@@ -914,14 +913,13 @@ def checkout():
         if db:
             db.close()
 
+
 @app.route("/my_orders", methods=["GET", "POST"])
 def my_orders():
     """
     Shows orders page for guests and registered users.
     Guests search by Order ID + Email; registered users see their order list with filters.
     """
-    auto_complete_flights()
-
     user_type = session.get("user_type")
     if user_type not in ["guest", "registered"]:
 
@@ -942,99 +940,36 @@ def my_orders():
             if not order_id or not email:
                 flash("Please enter Order ID and Email.", "error")
             else:
-                cur.execute("""
-                    SELECT
-                      o.O_ID, o.O_DATE, o.ORDER_PRICE, o.O_STATUS,
-                      o.G_MAIL, g.E_FIRST_NAME, g.E_LAST_NAME,
-                      f.FLIGHT_NUM, r.ORIGIN, r.DESTINATION,
-                      f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-                      f.ARRIVAL_DATE, f.ARRIVAL_TIME
-                    FROM F_ORDER o
-                    JOIN FLIGHT f ON o.FLIGHT_NUM = f.FLIGHT_NUM
-                    JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-                    JOIN GUEST g ON o.G_MAIL = g.G_MAIL
-                    WHERE o.O_ID=%s AND o.G_MAIL=%s AND o.O_STATUS='ACTIVE'
-                    LIMIT 1
-                """, (order_id, email))
-                order = cur.fetchone()
+                order = run_steps(cur, guest_order_steps(order_id, email))
 
                 if order:
 
                     session["guest_order_email"] = email
                     session.modified = True
-
-                    cur.execute("""
-                        SELECT
-                          CONCAT(os.ROW_NUM, os.COL_LETTER) AS seat_code,
-                          s.CLASS AS seat_class
-                        FROM ORDER_SEAT os
-                        JOIN SEAT s
-                          ON s.AIRCRAFT_ID=os.AIRCRAFT_ID
-                         AND s.ROW_NUM=os.ROW_NUM
-                         AND s.COL_LETTER=os.COL_LETTER
-                        WHERE os.O_ID=%s
-                        ORDER BY os.ROW_NUM, os.COL_LETTER
-                    """, (order_id,))
-                    order["seats"] = cur.fetchall() or []
                 else:
                     flash("Active order not found (check Order ID / Email).", "error")
 
 
-        if order and "seats" not in order:
-            order["seats"] = []
-
         cur.close();
         db.close()
         return render_template("my_orders_guest.html", order=order)
 
 
-    status = request.args.get("status", "").strip()
-    r_mail = session.get("email")
-
-
-    q = """
-        SELECT
-          o.O_ID, o.O_DATE, o.ORDER_PRICE, o.O_STATUS,
-          reg.E_FIRST_NAME, reg.E_LAST_NAME,
-          f.FLIGHT_NUM, rt.ORIGIN, rt.DESTINATION,
-          f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-          f.ARRIVAL_DATE, f.ARRIVAL_TIME
-        FROM F_ORDER o
-        JOIN `REGISTER` reg ON o.R_MAIL = reg.R_MAIL
-        JOIN FLIGHT f ON o.FLIGHT_NUM = f.FLIGHT_NUM
-        JOIN ROUTE rt ON f.ROUTE_ID = rt.ROUTE_ID AND f.DURATION = rt.DURATION
-        WHERE o.R_MAIL=%s
-    """
-    params = [r_mail]
-
-    if status:
-        q += " AND o.O_STATUS=%s"
-        params.append(status)
-
-    q += " ORDER BY f.DEPARTURE_DATE ASC, f.DEPARTURE_TIME ASC"
-
-    cur.execute(q, tuple(params))
-    orders = cur.fetchall()
+    status = request.args.get("status", "").strip().upper()
+    if status not in ORDER_STATUSES:
+        status = ""
 
-
-    for o in orders:
-        cur.execute("""
-            SELECT CONCAT(os.ROW_NUM, os.COL_LETTER) AS seat_code, s.CLASS AS seat_class
-            FROM ORDER_SEAT os
-            JOIN SEAT s
-              ON s.AIRCRAFT_ID=os.AIRCRAFT_ID
-             AND s.ROW_NUM=os.ROW_NUM
-             AND s.COL_LETTER=os.COL_LETTER
-            WHERE os.O_ID=%s
-            ORDER BY os.ROW_NUM, os.COL_LETTER
-        """, (o["O_ID"],))
-        seats = cur.fetchall()
-        o["seats"] = seats
-        o["seat_count"] = len(seats)
-        o["seat_summary"] = ", ".join([f"{s['seat_code']} ({s['seat_class']})" for s in seats])
+    after = parse_order_cursor(request.args.get("after"))
+    before = parse_order_cursor(request.args.get("before")) if not after else None
+    page = run_steps(cur, registered_orders_steps(session.get("email"), status, after, before))
 
     cur.close(); db.close()
-    return render_template("my_orders_registered.html", orders=orders, selected_status=status, container_size="wide")
+    return render_template(
+        "my_orders_registered.html",
+        selected_status=status,
+        container_size="wide",
+        **page,
+    )
 
 
 
@@ -1046,64 +981,17 @@ def manager_flights():
     """
     if session.get("user_type") != "manager":
         return redirect(url_for("manager_login"))
-    auto_complete_flights()
 
     f_date = request.args.get("date", "").strip()
     f_status = request.args.get("status", "").strip()
     f_origin = request.args.get("origin", "").strip()
     f_dest = request.args.get("destination", "").strip()
 
+    cities = get_route_directory().cities
+
     db = get_db_connection()
     cur = db.cursor(dictionary=True)
-
-    cur.execute("""
-        SELECT DISTINCT ORIGIN AS city FROM ROUTE
-        UNION
-        SELECT DISTINCT DESTINATION AS city FROM ROUTE
-        ORDER BY city
-    """)
-    cities = [r["city"] for r in cur.fetchall()]
-
-    where = []
-    params = []
-
-    if f_date:
-        where.append("f.DEPARTURE_DATE=%s")
-        params.append(f_date)
-    if f_status:
-        where.append("f.FLIGHT_STATUS=%s")
-        params.append(f_status)
-    if f_origin:
-        where.append("r.ORIGIN=%s")
-        params.append(f_origin)
-    if f_dest:
-        where.append("r.DESTINATION=%s")
-        params.append(f_dest)
-
-    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
-
-    query = f"""
-        SELECT
-          f.FLIGHT_NUM,
-          f.AIRCRAFT_ID,
-          a.SIZE AS AIRCRAFT_SIZE,
-          f.FLIGHT_STATUS,
-          f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-          f.ARRIVAL_DATE, f.ARRIVAL_TIME,
-          f.ECONOMY_PRICE,
-          f.BUSINESS_PRICE,
-          r.ORIGIN,
-          r.DESTINATION
-        FROM FLIGHT f
-        JOIN AIRCRAFT a ON f.AIRCRAFT_ID = a.AIRCRAFT_ID
-        JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-        {where_sql}
-        ORDER BY f.DEPARTURE_DATE, f.DEPARTURE_TIME
-    """
-
-    cur.execute(query, tuple(params))
-    flights = cur.fetchall()
-
+    flights = run_steps(cur, manager_flights_steps(f_date, f_status, f_origin, f_dest))
     cur.close()
     db.close()
 
@@ -1148,6 +1036,7 @@ def manager_cancel_flight(flight_num):
     hours_left = (dep_dt - now).total_seconds() / 3600.0
 
     if request.method == "GET":
+        cur.close(); db.close()
         return render_template("manager_cancel_flight.html",
                                flight=f,
                                hours_left=hours_left)
@@ -1159,6 +1048,7 @@ def manager_cancel_flight(flight_num):
         return redirect(url_for("manager_flights"))
 
 
+    db.start_transaction()
     cur.execute("UPDATE FLIGHT SET FLIGHT_STATUS='CANCELLED' WHERE FLIGHT_NUM=%s", (flight_num,))
 
 
@@ -1169,8 +1059,11 @@ def manager_cancel_flight(flight_num):
             CANACELATION_DATE_TIME=NOW()
         WHERE FLIGHT_NUM=%s AND O_STATUS='ACTIVE'
     """, (flight_num,))
+    drop_occupancy(cur, flight_num)
+    refresh_facts(cur, [flight_num])
 
     db.commit()
+    invalidate_reports()
     cur.close(); db.close()
 
     flash("Flight cancelled. All active orders were set to SYSTEM_CANCELLED with price 0.", "success")
@@ -1186,20 +1079,10 @@ def manager_new_flight_step1():
     if not require_manager():
         return redirect(url_for("manager_login"))
 
-    db = get_db_connection()
-    cur = db.cursor(dictionary=True)
-
-
-    cur.execute("""
-        SELECT DISTINCT ORIGIN AS city FROM ROUTE
-        UNION
-        SELECT DISTINCT DESTINATION AS city FROM ROUTE
-        ORDER BY city
-    """)
-    cities = [x["city"] for x in cur.fetchall()]
+    routes = get_route_directory()
+    cities = routes.cities
 
     if request.method == "GET":
-        cur.close(); db.close()
         return render_template("manager_new_flight_step1.html", cities=cities, aircrafts=None)
 
     dep_date = request.form.get("departure_date", "").strip()
@@ -1209,7 +1092,6 @@ def manager_new_flight_step1():
 
     if not dep_date or not dep_time or not origin or not destination:
         flash("Please fill all fields.", "error")
-        cur.close(); db.close()
         return redirect(url_for("manager_new_flight_step1"))
 
 
@@ -1217,16 +1099,9 @@ def manager_new_flight_step1():
         dep_time = dep_time + ":00"
 
 
-    cur.execute("""
-        SELECT ROUTE_ID, DURATION
-        FROM ROUTE
-        WHERE ORIGIN=%s AND DESTINATION=%s
-        LIMIT 1
-    """, (origin, destination))
-    route = cur.fetchone()
+    route = routes.route(origin, destination)
     if not route:
         flash("Route does not exist in the system.", "error")
-        cur.close(); db.close()
         return render_template("manager_new_flight_step1.html", cities=cities, aircrafts=None,
                                departure_date=dep_date, departure_time=dep_time[:5],
                                origin=origin, destination=destination)
@@ -1238,6 +1113,8 @@ def manager_new_flight_step1():
     dep_dt = combine_date_time(dep_date, dep_time)
     arr_dt = dep_dt + route_duration_td
 
+    db = get_db_connection()
+    cur = db.cursor(dictionary=True)
 
     if long_flight:
         cur.execute("SELECT * FROM AIRCRAFT WHERE SIZE='BIG' ORDER BY AIRCRAFT_ID")
@@ -1246,32 +1123,10 @@ def manager_new_flight_step1():
     all_aircrafts = cur.fetchall()
 
 
-    available = []
-    for a in all_aircrafts:
-        aircraft_id = a["AIRCRAFT_ID"]
-
-        cur.execute("""
-            SELECT
-              f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-              f.ARRIVAL_DATE, f.ARRIVAL_TIME,
-              r.ORIGIN, r.DESTINATION
-            FROM FLIGHT f
-            JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-            WHERE f.AIRCRAFT_ID=%s
-              AND f.FLIGHT_STATUS <> 'CANCELLED'
-        """, (aircraft_id,))
-        flights = cur.fetchall()
-
-        ok = four_day_availability_ok(
-            flights,
-            dep_dt, arr_dt,
-            origin, destination
-        )
-
-        if ok:
-            total_seats = int((a["CAPACITY_ECONOMY"] or 0) + (a["CAPACITY_BUSINESS"] or 0))
-            a["TOTAL_SEATS"] = total_seats
-            available.append(a)
+    available = available_resources(cur, "aircraft", all_aircrafts, "AIRCRAFT_ID",
+                                    dep_dt, arr_dt, origin, destination)
+    for a in available:
+        a["TOTAL_SEATS"] = int((a["CAPACITY_ECONOMY"] or 0) + (a["CAPACITY_BUSINESS"] or 0))
 
 
     session["new_flight"] = {
@@ -1384,25 +1239,8 @@ def manager_new_flight_step3_attendants():
 
             attendants = cur.fetchall()
 
-            available = []
-            for a in attendants:
-                aid = a["ID_A"]
-                cur.execute("""
-                    SELECT
-                      f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-                      f.ARRIVAL_DATE, f.ARRIVAL_TIME,
-                      r.ORIGIN, r.DESTINATION
-                    FROM ASSIGHNED_ATTENDANT aa
-                    JOIN FLIGHT f ON aa.FLIGHT_NUM = f.FLIGHT_NUM
-                    JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-                    WHERE aa.ID_A=%s
-                      AND f.FLIGHT_STATUS <> 'CANCELLED'
-                """, (aid,))
-                flights = cur.fetchall()
-
-                ok = four_day_availability_ok(flights, dep_dt, arr_dt, nf["origin"], nf["destination"])
-                if ok:
-                    available.append(a)
+            available = available_resources(cur, "attendant", attendants, "ID_A",
+                                            dep_dt, arr_dt, nf["origin"], nf["destination"])
 
             cur.close();
             db.close()
@@ -1429,31 +1267,8 @@ def manager_new_flight_step3_attendants():
 
     attendants = cur.fetchall()
 
-    available = []
-    for a in attendants:
-        aid = a["ID_A"]
-
-        cur.execute("""
-            SELECT
-              f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-              f.ARRIVAL_DATE, f.ARRIVAL_TIME,
-              r.ORIGIN, r.DESTINATION
-            FROM ASSIGHNED_ATTENDANT aa
-            JOIN FLIGHT f ON aa.FLIGHT_NUM = f.FLIGHT_NUM
-            JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-            WHERE aa.ID_A=%s
-              AND f.FLIGHT_STATUS <> 'CANCELLED'
-        """, (aid,))
-        flights = cur.fetchall()
-
-        ok = four_day_availability_ok(
-            flights,
-            dep_dt, arr_dt,
-            nf["origin"], nf["destination"]
-        )
-
-        if ok:
-            available.append(a)
+    available = available_resources(cur, "attendant", attendants, "ID_A",
+                                    dep_dt, arr_dt, nf["origin"], nf["destination"])
 
     cur.close(); db.close()
 
@@ -1466,6 +1281,40 @@ def manager_new_flight_step3_attendants():
                            attendants=available,
                            required_count=required_att)
 
+@app.route("/manager/flights/new/auto_crew", methods=["POST"])
+def manager_new_flight_auto_crew():
+    """
+    Fills the attendants and pilots of the flight draft automatically.
+    Picks legal employees with the fewest flown hours, then goes to pricing.
+    """
+    if not require_manager():
+        return redirect(url_for("manager_login"))
+
+    nf = get_new_flight_session()
+    if not nf or not nf.get("aircraft_id"):
+        flash("Session expired. Please start again.", "error")
+        return redirect(url_for("manager_new_flight_step1"))
+
+    db = get_db_connection()
+    cur = db.cursor(dictionary=True)
+    try:
+        attendants, pilots = auto_assign_crew(cur, nf)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("manager_new_flight_step3_attendants"))
+    finally:
+        cur.close()
+        db.close()
+
+    nf["attendants"] = attendants
+    nf["pilots"] = pilots
+    session["new_flight"] = nf
+    session.modified = True
+
+    flash(f"Crew assigned: attendants {', '.join(attendants)}; pilots {', '.join(pilots)}.", "success")
+    return redirect(url_for("manager_new_flight_step5_pricing"))
+
+
 @app.route("/manager/flights/new/step4/pilots", methods=["GET", "POST"])
 def manager_new_flight_step4_pilots():
     """
@@ -1500,30 +1349,8 @@ def manager_new_flight_step4_pilots():
 
         pilots = cur.fetchall()
 
-        available = []
-        for p in pilots:
-            pid = p["ID_P"]
-            cur.execute("""
-                SELECT
-                  f.DEPARTURE_DATE, f.DEPARTURE_TIME,
-                  f.ARRIVAL_DATE, f.ARRIVAL_TIME,
-                  r.ORIGIN, r.DESTINATION
-                FROM ASSIGNED_PILOT ap
-                JOIN FLIGHT f ON ap.FLIGHT_NUM = f.FLIGHT_NUM
-                JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
-                WHERE ap.ID_P=%s
-                  AND f.FLIGHT_STATUS <> 'CANCELLED'
-            """, (pid,))
-            flights = cur.fetchall()
-
-            ok = four_day_availability_ok(
-                flights, dep_dt, arr_dt,
-                nf["origin"], nf["destination"]
-            )
-
-            if ok:
-                available.append(p)
-
+        available = available_resources(cur, "pilot", pilots, "ID_P",
+                                        dep_dt, arr_dt, nf["origin"], nf["destination"])
         return available
 
 
@@ -1638,8 +1465,9 @@ def manager_new_flight_step6_summary():
     cur = db.cursor(dictionary=True)
 
     try:
-        flight_num = next_flight_num(cur)
+        flight_num = next_flight_num()
 
+        db.start_transaction()
         cur.execute("""
             INSERT INTO FLIGHT
             (FLIGHT_NUM, AIRCRAFT_ID, DURATION, ROUTE_ID, FLIGHT_STATUS,
@@ -1668,7 +1496,9 @@ def manager_new_flight_step6_summary():
         for pid in nf["pilots"]:
             cur.execute("INSERT INTO ASSIGNED_PILOT (ID_P, FLIGHT_NUM) VALUES (%s,%s)", (pid, flight_num))
 
+        refresh_facts(cur, [flight_num])
         db.commit()
+        invalidate_reports()
 
         session.pop("new_flight", None)
         flash(f"Flight {flight_num} was created successfully.", "success")
@@ -1684,510 +1514,86 @@ def manager_new_flight_step6_summary():
         db.close()
 
 
-@app.route("/manager/reports", methods=["GET"])
-def manager_reports():
+@app.route("/manager/flights/import", methods=["POST"])
+def manager_import_schedule():
     """
-    Shows the manager reports page (5 reports) with filters.
-    Runs SQL queries to calculate things like occupancy, revenue, crew hours, cancellations, and utilization.
+    Bulk import of flights with crew from an uploaded CSV or JSON file ("schedule").
+    Returns a JSON report with per-row errors; ?skip_invalid=1 imports the valid rows only.
     """
-    if session.get("user_type") != "manager":
-        return redirect(url_for("manager_login"))
-
-
-    def parse_date(s):
-
-        if not s:
-            return None
-        try:
-            return date.fromisoformat(s)
-        except Exception:
-            return None
-
-    def parse_month(s):
-
-        if not s:
-            return None
-        try:
-            y, m = s.split("-")
-            return int(y), int(m)
-        except Exception:
-            return None
-
-    def month_start_end(ym_from, ym_to):
-
-        if not ym_from and not ym_to:
-            return None, None
-
-        if ym_from:
-            y, m = ym_from
-            start = date(y, m, 1)
-        else:
-            start = date(1900, 1, 1)
-
-        if ym_to:
-            y, m = ym_to
-
-            if m == 12:
-                end = date(y, 12, 31)
-            else:
-                end = date(y, m + 1, 1) - timedelta(days=1)
-        else:
-            end = date(2100, 12, 31)
-
-        return start, end
-
-
-    active_report = request.args.get("active_report", "r1").strip() or "r1"
-    if active_report not in ["r1", "r2", "r3", "r4", "r5"]:
-        active_report = "r1"
-
-
-    r1_avg = None
-    r1_from = request.args.get("r1_from", "").strip()
-    r1_to = request.args.get("r1_to", "").strip()
-
-    r2_from = request.args.get("r2_from", "").strip()
-    r2_to = request.args.get("r2_to", "").strip()
-    r2_class = request.args.get("r2_class", "").strip().upper()
-    r2_manufacturer = request.args.get("r2_manufacturer", "").strip()
-    r2_size = request.args.get("r2_size", "").strip().upper()
-    r2_sort = request.args.get("r2_sort", "DESC").strip().upper()
-    r2_rows = []
-
-    r3_role = request.args.get("r3_role", "").strip().upper()
-    r3_emp = request.args.get("r3_emp", "").strip()
-    r3_flight_type = request.args.get("r3_flight_type", "").strip().upper()
-    r3_sort = request.args.get("r3_sort", "DESC").strip().upper()
-    r3_rows = []
-
-    r4_from = request.args.get("r4_from", "").strip()
-    r4_to = request.args.get("r4_to", "").strip()
-    r4_class = request.args.get("r4_class", "").strip().upper()
-    r4_sort = request.args.get("r4_sort", "ASC").strip().upper()
-    r4_rows = []
-
-    r5_from = request.args.get("r5_from", "").strip()
-    r5_to = request.args.get("r5_to", "").strip()
-    r5_aircraft = request.args.get("r5_aircraft", "").strip()
-    r5_manufacturer = request.args.get("r5_manufacturer", "").strip()
-    r5_origin = request.args.get("r5_origin", "").strip()
-    r5_destination = request.args.get("r5_destination", "").strip()
-    r5_rows = []
-
-
-    if r2_sort not in ["ASC", "DESC"]:
-        r2_sort = "DESC"
-    if r3_sort not in ["ASC", "DESC"]:
-        r3_sort = "DESC"
-    if r4_sort not in ["ASC", "DESC"]:
-        r4_sort = "ASC"
-
-
-    if r2_class not in ["", "ECONOMY", "BUSINESS"]:
-        r2_class = ""
-    if r2_size not in ["", "SMALL", "BIG"]:
-        r2_size = ""
-    if r3_role not in ["", "PILOT", "ATTENDANT"]:
-        r3_role = ""
-    if r3_flight_type not in ["", "SHORT", "LONG"]:
-        r3_flight_type = ""
-    if r4_class not in ["", "ECONOMY", "BUSINESS"]:
-        r4_class = ""
-
+    if not require_manager():
+        return jsonify({"error": "manager login required"}), 403
 
-    db = get_db_connection()
-    cur = db.cursor(dictionary=True)
+    upload = request.files.get("schedule")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "upload a CSV or JSON file as 'schedule'"}), 400
 
+    fmt = "json" if upload.filename.lower().endswith(".json") else "csv"
     try:
+        text = upload.read().decode("utf-8-sig")
+        report = import_schedule(
+            text, fmt,
+            skip_invalid=request.args.get("skip_invalid") == "1",
+            dry_run=request.args.get("dry_run") == "1",
+        )
+    except ValueError as e:
+        return jsonify({"error": f"could not read the schedule: {e}"}), 400
 
-        d1 = parse_date(r1_from)
-        d2 = parse_date(r1_to)
-
-        where = ["f.FLIGHT_STATUS = 'COMPLETED'"]
-        params = []
-
-        if d1:
-            where.append("f.DEPARTURE_DATE >= %s")
-            params.append(d1.isoformat())
-        if d2:
-            where.append("f.DEPARTURE_DATE <= %s")
-            params.append(d2.isoformat())
-
-        q1 = f"""
-            SELECT AVG(occupied_seats / total_capacity) AS avg_occupancy
-            FROM (
-                SELECT
-                    f.FLIGHT_NUM,
-                    COUNT(DISTINCT os.AIRCRAFT_ID, os.ROW_NUM, os.COL_LETTER) AS occupied_seats,
-                    (a.CAPACITY_ECONOMY + a.CAPACITY_BUSINESS) AS total_capacity
-                FROM FLIGHT f
-                JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
-                LEFT JOIN F_ORDER o
-                    ON o.FLIGHT_NUM = f.FLIGHT_NUM
-                   AND o.O_STATUS = 'COMPLETED'
-                LEFT JOIN ORDER_SEAT os
-                    ON os.O_ID = o.O_ID
-                WHERE {" AND ".join(where)}
-                GROUP BY f.FLIGHT_NUM, (a.CAPACITY_ECONOMY + a.CAPACITY_BUSINESS)
-            ) AS Occupation_per_flight
-        """
-        cur.execute(q1, tuple(params))
-        row = cur.fetchone()
-        r1_avg = row["avg_occupancy"] if row and row["avg_occupancy"] is not None else None
-
-
-
-        d1 = parse_date(r2_from)
-        d2 = parse_date(r2_to)
-
-        where = ["f.FLIGHT_STATUS <> 'CANCELLED'"]
-        params = []
-
-        if d1:
-            where.append("f.DEPARTURE_DATE >= %s")
-            params.append(d1.isoformat())
-        if d2:
-            where.append("f.DEPARTURE_DATE <= %s")
-            params.append(d2.isoformat())
-
-        if r2_class:
-            where.append("s.CLASS = %s")
-            params.append(r2_class)
-
-        if r2_manufacturer:
-            where.append("a.MANUFACTURER = %s")
-            params.append(r2_manufacturer)
-
-        if r2_size:
-            where.append("a.SIZE = %s")
-            params.append(r2_size)
-
-        q2 = f"""
-            SELECT a.SIZE, a.MANUFACTURER, s.CLASS,
-                SUM(
-                    CASE
-                        WHEN o.O_STATUS IN ('ACTIVE','COMPLETED') THEN
-                            CASE
-                                WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
-                                WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
-                            END
-
-                        WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
-                             AND o.CANACELATION_DATE_TIME IS NOT NULL
-                             AND TIMESTAMPDIFF(
-                                    HOUR,
-                                    o.CANACELATION_DATE_TIME,
-                                    TIMESTAMP(f.DEPARTURE_DATE, f.DEPARTURE_TIME)
-                                 ) < 36
-                        THEN
-                            CASE
-                                WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
-                                WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
-                            END
-
-                        WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
-                             AND o.CANACELATION_DATE_TIME IS NOT NULL
-                             AND TIMESTAMPDIFF(
-                                    HOUR,
-                                    o.CANACELATION_DATE_TIME,
-                                    TIMESTAMP(f.DEPARTURE_DATE, f.DEPARTURE_TIME)
-                                 ) >= 36
-                        THEN
-                            (0.05 * o.ORDER_PRICE) *
-                            (1.0 / (
-                                  SELECT COUNT(*)
-                                  FROM ORDER_SEAT os2
-                                  WHERE os2.O_ID = o.O_ID
-                            ))
-
-                        ELSE 0
-                    END
-                ) AS revenue
-            FROM FLIGHT f
-            JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
-            JOIN F_ORDER o ON o.FLIGHT_NUM = f.FLIGHT_NUM
-            JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
-            JOIN SEAT s
-              ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
-             AND s.ROW_NUM = os.ROW_NUM
-             AND s.COL_LETTER = os.COL_LETTER
-            WHERE {" AND ".join(where)}
-            GROUP BY a.SIZE, a.MANUFACTURER, s.CLASS
-            ORDER BY revenue {r2_sort}, a.SIZE, a.MANUFACTURER, s.CLASS
-        """
-        cur.execute(q2, tuple(params))
-        r2_rows = cur.fetchall()
-
-
-
-        where_outer = ["1=1"]
-        params_outer = []
-
-        if r3_role:
-            where_outer.append("employee_type = %s")
-            params_outer.append(r3_role)
-
-        if r3_emp:
-            where_outer.append("employee_id = %s")
-            params_outer.append(r3_emp)
-
-        if r3_flight_type:
-            where_outer.append("flight_type = %s")
-            params_outer.append(r3_flight_type)
-
-        q3 = f"""
-            SELECT employee_type, employee_id, flight_type,
-                   ROUND(SUM(TIME_TO_SEC(duration)) / 3600, 2) AS total_hours
-            FROM (
-                SELECT
-                    'PILOT' AS employee_type,
-                    ap.ID_P AS employee_id,
-                    CASE WHEN f.DURATION > '06:00:00' THEN 'LONG' ELSE 'SHORT' END AS flight_type,
-                    f.DURATION AS duration
-                FROM ASSIGNED_PILOT ap
-                JOIN FLIGHT f ON f.FLIGHT_NUM = ap.FLIGHT_NUM
-                WHERE f.FLIGHT_STATUS = 'COMPLETED'
-
-                UNION ALL
-
-                SELECT
-                    'ATTENDANT' AS employee_type,
-                    aa.ID_A AS employee_id,
-                    CASE WHEN f.DURATION > '06:00:00' THEN 'LONG' ELSE 'SHORT' END AS flight_type,
-                    f.DURATION AS duration
-                FROM ASSIGHNED_ATTENDANT aa
-                JOIN FLIGHT f ON f.FLIGHT_NUM = aa.FLIGHT_NUM
-                WHERE f.FLIGHT_STATUS = 'COMPLETED'
-            ) AS employee_flight_hours
-            WHERE {" AND ".join(where_outer)}
-            GROUP BY employee_type, employee_id, flight_type
-            ORDER BY total_hours {r3_sort}, employee_type, employee_id
-        """
-        cur.execute(q3, tuple(params_outer))
-        r3_rows = cur.fetchall()
-
-
-
-        ym1 = parse_month(r4_from)
-        ym2 = parse_month(r4_to)
-        start_date, end_date = month_start_end(ym1, ym2)
-
-
-        base_where = ["1=1"]
-        base_params = []
-
-        if start_date:
-            base_where.append("o.O_DATE >= %s")
-            base_params.append(start_date.isoformat())
-        if end_date:
-            base_where.append("o.O_DATE <= %s")
-            base_params.append(end_date.isoformat())
-
+    if report["imported"]:
+        invalidate_reports()
 
+    status = 200 if not report["errors"] or report["imported"] else 422
+    return jsonify(report), status
 
 
-        if r4_class:
-            base_where.append("s.CLASS = %s")
-            base_params.append(r4_class)
+@app.route("/manager/reports", methods=["GET"])
+def manager_reports():
+    """
+    Shows the manager reports page (5 reports) with filters.
+    Only the active report is computed, and results are cached until FLIGHT/F_ORDER change.
+    """
+    if session.get("user_type") != "manager":
+        return redirect(url_for("manager_login"))
 
-        q4 = f"""
-            SELECT
-                yr AS year,
-                mo AS month,
-                ROUND(100.0 * cancelled_cnt / NULLIF(total_cnt,0), 2) AS cancel_rate_percent
-            FROM (
-                SELECT
-                    YEAR(o.O_DATE) AS yr,
-                    MONTH(o.O_DATE) AS mo,
-                    COUNT(DISTINCT o.O_ID) AS total_cnt,
-                    COUNT(DISTINCT CASE
-                        WHEN o.O_STATUS='CUSTOMER_CANCELLED'
-                         AND o.CANACELATION_DATE_TIME IS NOT NULL
-                        THEN o.O_ID END
-                    ) AS cancelled_cnt
-                FROM F_ORDER o
-                JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
-                LEFT JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
-                LEFT JOIN SEAT s
-                  ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
-                 AND s.ROW_NUM = os.ROW_NUM
-                 AND s.COL_LETTER = os.COL_LETTER
-                WHERE {" AND ".join(base_where)}
-                GROUP BY YEAR(o.O_DATE), MONTH(o.O_DATE)
-            ) t
-            ORDER BY cancel_rate_percent {r4_sort}, year, month
-        """
-        cur.execute(q4, tuple(base_params))
-        r4_rows = cur.fetchall()
-
-
-
-        ym1 = parse_month(r5_from)
-        ym2 = parse_month(r5_to)
-        start_date, end_date = month_start_end(ym1, ym2)
-
-
-        outer_where = ["1=1"]
-        outer_params = []
-
-        if r5_aircraft:
-            outer_where.append("x.AIRCRAFT_ID = %s")
-            outer_params.append(r5_aircraft)
-
-        if r5_manufacturer:
-            outer_where.append("x.MANUFACTURER = %s")
-            outer_params.append(r5_manufacturer)
-
-        if r5_origin:
-            outer_where.append("(x.origin = %s)")
-            outer_params.append(r5_origin)
-
-        if r5_destination:
-            outer_where.append("(x.destination = %s)")
-            outer_params.append(r5_destination)
-
-        if start_date:
-            outer_where.append("STR_TO_DATE(CONCAT(x.year,'-',LPAD(x.month,2,'0'),'-01'), '%Y-%m-%d') >= %s")
-            outer_params.append(start_date.isoformat())
-        if end_date:
-            outer_where.append("STR_TO_DATE(CONCAT(x.year,'-',LPAD(x.month,2,'0'),'-01'), '%Y-%m-%d') <= %s")
-            outer_params.append(end_date.isoformat())
-
-        q5 = f"""
-            WITH
-            years AS (
-              SELECT DISTINCT YEAR(DEPARTURE_DATE) AS year
-              FROM FLIGHT
-            ),
-            months AS (
-              SELECT 1 AS month UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4
-              UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8
-              UNION ALL SELECT 9 UNION ALL SELECT 10 UNION ALL SELECT 11 UNION ALL SELECT 12
-            ),
-            skeleton AS (
-              SELECT a.AIRCRAFT_ID, a.MANUFACTURER, y.year, m.month
-              FROM AIRCRAFT a
-              CROSS JOIN years y
-              CROSS JOIN months m
-            ),
-            monthly_flights AS (
-              SELECT
-                AIRCRAFT_ID,
-                YEAR(DEPARTURE_DATE) AS year,
-                MONTH(DEPARTURE_DATE) AS month,
-                SUM(FLIGHT_STATUS = 'COMPLETED') AS completed_flights,
-                SUM(FLIGHT_STATUS = 'CANCELLED') AS cancelled_flights
-              FROM FLIGHT
-              GROUP BY AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE)
-            ),
-            dominant_route AS (
-              SELECT AIRCRAFT_ID, year, month, origin, destination
-              FROM (
-                SELECT
-                  f.AIRCRAFT_ID,
-                  YEAR(f.DEPARTURE_DATE) AS year,
-                  MONTH(f.DEPARTURE_DATE) AS month,
-                  r.ORIGIN AS origin,
-                  r.DESTINATION AS destination,
-                  COUNT(*) AS cnt,
-                  ROW_NUMBER() OVER (
-                    PARTITION BY f.AIRCRAFT_ID, YEAR(f.DEPARTURE_DATE), MONTH(f.DEPARTURE_DATE)
-                    ORDER BY COUNT(*) DESC, r.ORIGIN, r.DESTINATION
-                  ) AS rn
-                FROM FLIGHT f
-                JOIN ROUTE r
-                  ON r.ROUTE_ID = f.ROUTE_ID AND r.DURATION = f.DURATION
-                WHERE f.FLIGHT_STATUS = 'COMPLETED'
-                GROUP BY f.AIRCRAFT_ID,
-                         YEAR(f.DEPARTURE_DATE),
-                         MONTH(f.DEPARTURE_DATE),
-                         r.ORIGIN,
-                         r.DESTINATION
-              ) t
-              WHERE rn = 1
-            )
-            SELECT *
-            FROM (
-              SELECT
-                s.AIRCRAFT_ID,
-                s.MANUFACTURER,
-                s.year,
-                s.month,
-
-                CASE WHEN mf.completed_flights IS NULL THEN 0 ELSE mf.completed_flights END AS completed_flights,
-                CASE WHEN mf.cancelled_flights IS NULL THEN 0 ELSE mf.cancelled_flights END AS cancelled_flights,
-
-                ROUND(
-                  LEAST(
-                    (CASE WHEN mf.completed_flights IS NULL THEN 0 ELSE mf.completed_flights END) / 30.0,
-                    1
-                  ) * 100,
-                  2
-                ) AS utilization_percent,
-
-                dr.origin,
-                dr.destination
-              FROM skeleton s
-              LEFT JOIN monthly_flights mf
-                ON mf.AIRCRAFT_ID = s.AIRCRAFT_ID
-               AND mf.year = s.year
-               AND mf.month = s.month
-              LEFT JOIN dominant_route dr
-                ON dr.AIRCRAFT_ID = s.AIRCRAFT_ID
-               AND dr.year = s.year
-               AND dr.month = s.month
-            ) x
-            WHERE {" AND ".join(outer_where)}
-            ORDER BY x.AIRCRAFT_ID, x.year, x.month
-        """
-        cur.execute(q5, tuple(outer_params))
-        r5_rows = cur.fetchall()
+    active_report, filters = report_filters(request.args)
+    result = run_report(active_report, filters)
 
-    finally:
-        cur.close()
-        db.close()
+    results = {"r1_avg": None, "r2_rows": [], "r3_rows": [], "r4_rows": [], "r5_rows": []}
+    if active_report == "r1":
+        results["r1_avg"] = result
+    else:
+        results[f"{active_report}_rows"] = result
 
     return render_template(
         "manager_reports.html",
         container_size="wide",
         active_report=active_report,
+        export_formats=export_formats(),
+        **filters,
+        **results
+    )
 
 
-        r1_avg=r1_avg,
-        r1_from=r1_from,
-        r1_to=r1_to,
-
-
-        r2_from=r2_from,
-        r2_to=r2_to,
-        r2_class=r2_class if r2_class else "",
-        r2_manufacturer=r2_manufacturer,
-        r2_size=r2_size if r2_size else "",
-        r2_sort=r2_sort,
-        r2_rows=r2_rows,
-
-
-        r3_role=r3_role if r3_role else "",
-        r3_emp=r3_emp,
-        r3_flight_type=r3_flight_type if r3_flight_type else "",
-        r3_sort=r3_sort,
-        r3_rows=r3_rows,
-
-
-        r4_from=r4_from,
-        r4_to=r4_to,
-        r4_class=r4_class if r4_class else "",
-        r4_sort=r4_sort,
-        r4_rows=r4_rows,
-
+@app.route("/manager/reports/<report_id>/export", methods=["GET"])
+def manager_report_export(report_id):
+    """
+    Downloads one report as CSV (or Parquet with format=parquet), using the same filters
+    as the reports page. Rows are streamed from the database, so big exports use little memory.
+    """
+    if session.get("user_type") != "manager":
+        return redirect(url_for("manager_login"))
 
-        r5_from=r5_from,
-        r5_to=r5_to,
-        r5_aircraft=r5_aircraft,
-        r5_manufacturer=r5_manufacturer,
-        r5_origin=r5_origin,
-        r5_destination=r5_destination,
-        r5_rows=r5_rows
+    fmt = (request.args.get("format", "csv") or "csv").strip().lower()
+    _, filters = report_filters(request.args)
+    try:
+        chunks = export_report(report_id, filters, fmt)
+    except ValueError as e:
+        flash(f"Export failed: {e}.", "error")
+        return redirect(url_for("manager_reports", active_report=report_id))
+
+    return Response(
+        chunks,
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(report_id, fmt)}"'},
     )
 
 
@@ -2331,6 +1737,7 @@ def manager_add_aircraft():
     cur = db.cursor(dictionary=True)
 
     try:
+        db.start_transaction()   # the aircraft and its seats are added together or not at all
         cur.execute("""
           INSERT INTO AIRCRAFT (AIRCRAFT_ID, SIZE, MANUFACTURER, PURCHASE_DATE, CAPACITY_BUSINESS, CAPACITY_ECONOMY)
           VALUES (%s,%s,%s,%s,%s,%s)
@@ -2339,6 +1746,8 @@ def manager_add_aircraft():
         create_seats_for_aircraft(cur, aircraft_id, cap_economy_int, cap_business_int)
 
         db.commit()
+        invalidate_seat_map(aircraft_id)
+        invalidate_reports()
 
     except Exception as e:
         db.rollback()
@@ -2359,6 +1768,45 @@ def logout():
     session.clear()
     return redirect(url_for("flight_search"))
 
+@app.route("/metrics")
+def metrics():
+    """
+    Plain-text metrics page (Prometheus format) for monitoring.
+    Shows the database connection pools, flight sweeper, report cache, session store
+    and SQL numbers (with the statements that used the most DB time).
+    """
+    lines = []
+    for name, value in pool_stats().items():
+        lines.append(f"flytau_db_pool_{name} {value}")
+    for name, value in async_pool_stats().items():   # only when served by asgi.py
+        lines.append(f"flytau_async_pool_{name} {value}")
+    for name, value in sweeper_stats().items():
+        if isinstance(value, (int, float)):
+            lines.append(f"flytau_sweeper_{name} {value}")
+    for name, value in report_cache_stats().items():
+        lines.append(f"flytau_report_cache_{name} {value}")
+    for name, value in app.session_interface.store.snapshot().items():
+        lines.append(f"flytau_session_{name} {value}")
+    for name, value in sql_stats().items():
+        lines.append(f"flytau_sql_{name} {value}")
+    for st in sql_statement_stats():
+        label = st["sql"][:200].replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'flytau_sql_statement_calls_total{{statement="{label}"}} {st["calls"]}')
+        lines.append(f'flytau_sql_statement_seconds_total{{statement="{label}"}} {st["seconds"]}')
+    return Response("\n".join(lines) + "\n", mimetype="text/plain")
+
+
+@app.route("/debug/sql")
+def sql_debug():
+    """
+    SQL profile for managers: totals, top statements, slow queries and the last
+    requests with their query counts and N+1 warnings (JSON).
+    """
+    if session.get("user_type") != "manager":
+        return redirect(url_for("manager_login"))
+    return jsonify(sql_debug_snapshot())
+
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template("error.html", code=404), 404
@@ -0,0 +1,266 @@
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart, flash, redirect, render_template, request, session, url_for
+from quart.sessions import SessionInterface
+from werkzeug.exceptions import HTTPException
+
+from aiodb import close_pool, fetch_steps, open_pool
+from app import app as flask_app
+from pages import (
+    ORDER_STATUSES,
+    guest_order_steps,
+    manager_flights_steps,
+    parse_order_cursor,
+    parse_passengers,
+    parse_search_form,
+    registered_orders_steps,
+    search_page_steps,
+    seat_page_steps,
+)
+from search import route_directory_steps
+
+
+# Async serving mode (needs: pip install quart aiomysql hypercorn):
+#
+#     export FLYTAU_SESSION_DB=/var/lib/flytau/sessions.db WEB_CONCURRENCY=<cores>
+#     hypercorn asgi:application --workers <cores> --bind 0.0.0.0:8000
+#
+# Every worker is its own process, so sessions must live in the shared SQLite store
+# (FLYTAU_SESSION_DB; see session_store.py), and the flight sweeper runs as one separate
+# "python sweeper.py" process (the workers do not start it; see app.py).
+#
+# The read-heavy pages below run on the event loop with an async MySQL pool (aiodb.py),
+# so a worker keeps serving other requests while it waits for the database. They use the
+# same query steps (pages.py) and templates as the Flask app. Every other request
+# (checkout, cancellations, manager forms, /metrics...) goes to the Flask app, which runs
+# in a thread pool of the same process.
+
+ASYNC_ENDPOINTS = {
+    "flight_search": {"GET", "POST"},
+    "seat_select": {"GET"},
+    "my_orders": {"GET", "POST"},
+    "manager_flights": {"GET"},
+}
+
+
+class _SessionInterface(SessionInterface):
+    """
+    Quart adapter for the Flask app's server-side sessions: same store and cookie,
+    so a visitor keeps one session across the async and the Flask pages.
+    """
+
+    def __init__(self, interface):
+        self.interface = interface
+
+    async def open_session(self, app, request):
+        return self.interface.open_session(app, request)
+
+    async def save_session(self, app, session, response):
+        self.interface.save_session(app, session, response)
+
+
+app = Quart(__name__)
+app.secret_key = flask_app.secret_key
+app.config.update({k: v for k, v in flask_app.config.items()
+                   if k.startswith("SESSION_") or k == "PERMANENT_SESSION_LIFETIME"})
+app.session_interface = _SessionInterface(flask_app.session_interface)
+
+
+@app.before_serving
+async def _open_pool():
+    await open_pool()
+
+
+@app.after_serving
+async def _close_pool():
+    await close_pool()
+
+
+@app.route("/flights/search", methods=["GET", "POST"])
+async def flight_search():
+    """
+    Async version of the flight search page (see app.flight_search).
+    """
+    if session.get("user_type") == "manager":
+        return redirect(url_for("manager_flights"))
+
+    if session.get("user_type") is None:
+        session["user_type"] = "guest"
+        session["first_name"] = "Guest"
+        session.permanent = True
+
+    if request.method == "GET":
+        directory = await fetch_steps(route_directory_steps())
+        return await render_template("flight_results.html", flights=None,
+                                     passengers=None, origin=None, destination=None, departure_date=None,
+                                     cities=directory.cities, container_size="wide")
+
+    error, search = parse_search_form(await request.form)
+    if error:
+        await flash(error, "error")
+        return redirect(url_for("flight_search"))
+
+    page = await fetch_steps(search_page_steps(search))
+    if page["error"]:
+        await flash(page["error"], "error")
+        return redirect(url_for("flight_search"))
+    if page["notice"]:
+        await flash(page["notice"], "error")
+
+    directory = await fetch_steps(route_directory_steps())   # cached by search_page_steps
+    return await render_template("flight_results.html",
+                                 passengers=search["passengers"],
+                                 origin=search["origin"],
+                                 destination=search["destination"],
+                                 departure_date=search["departure_date"],
+                                 cities=directory.cities, container_size="wide",
+                                 **page)
+
+
+@app.route("/flight/<flight_num>/seats", methods=["GET"])
+async def seat_select(flight_num):
+    """
+    Async version of the seat map page (see app.seat_select); picking seats (POST) stays in Flask.
+    """
+    if session.get("user_type") not in ["guest", "registered"]:
+        session["user_type"] = "guest"
+        session["first_name"] = "Guest"
+        session.permanent = True
+
+    passengers = parse_passengers(request.args.get("passengers"))
+    if passengers is None:
+        await flash("Invalid passengers number.", "error")
+        return redirect(url_for("flight_search"))
+
+    page = await fetch_steps(seat_page_steps(flight_num, session.get("hold_id")))
+    if not page:
+        await flash("This flight is not active.", "error")
+        return redirect(url_for("flight_search"))
+
+    session["passengers"] = passengers
+    session["selected_flight_num"] = flight_num
+
+    seat_map = page["seat_map"]
+    return await render_template(
+        "seat_select.html",
+        flight=page["flight"],
+        rows_map=seat_map.rows_map,
+        row_numbers=seat_map.row_numbers,
+        cols_left=seat_map.cols_left,
+        cols_mid=seat_map.cols_mid,
+        cols_right=seat_map.cols_right,
+        occupied=page["occupied"],
+        passengers=passengers
+    )
+
+
+@app.route("/my_orders", methods=["GET", "POST"])
+async def my_orders():
+    """
+    Async version of the orders page (see app.my_orders).
+    """
+    user_type = session.get("user_type")
+    if user_type not in ["guest", "registered"]:
+        session["user_type"] = "guest"
+        user_type = "guest"
+
+    if user_type == "guest":
+        order = None
+
+        if request.method == "POST":
+            form = await request.form
+            order_id = form.get("order_id", "").strip()
+            email = form.get("email", "").strip().lower()
+
+            if not order_id or not email:
+                await flash("Please enter Order ID and Email.", "error")
+            else:
+                order = await fetch_steps(guest_order_steps(order_id, email))
+                if order:
+                    session["guest_order_email"] = email
+                else:
+                    await flash("Active order not found (check Order ID / Email).", "error")
+
+        return await render_template("my_orders_guest.html", order=order)
+
+    status = request.args.get("status", "").strip().upper()
+    if status not in ORDER_STATUSES:
+        status = ""
+
+    after = parse_order_cursor(request.args.get("after"))
+    before = parse_order_cursor(request.args.get("before")) if not after else None
+    page = await fetch_steps(registered_orders_steps(session.get("email"), status, after, before))
+
+    return await render_template(
+        "my_orders_registered.html",
+        selected_status=status,
+        container_size="wide",
+        **page,
+    )
+
+
+@app.route("/manager/flights", methods=["GET"])
+async def manager_flights():
+    """
+    Async version of the manager flight board (see app.manager_flights).
+    """
+    if session.get("user_type") != "manager":
+        return redirect(url_for("manager_login"))
+
+    f_date = request.args.get("date", "").strip()
+    f_status = request.args.get("status", "").strip()
+    f_origin = request.args.get("origin", "").strip()
+    f_dest = request.args.get("destination", "").strip()
+
+    directory = await fetch_steps(route_directory_steps())
+    flights = await fetch_steps(manager_flights_steps(f_date, f_status, f_origin, f_dest))
+
+    return await render_template(
+        "manager_flights.html",
+        flights=flights,
+        cities=directory.cities,
+        f_date=f_date,
+        f_status=f_status,
+        f_origin=f_origin,
+        f_dest=f_dest,
+        container_size="wide"
+    )
+
+
+@app.errorhandler(500)
+async def internal_server_error(e):
+    return await render_template("error.html", code=500), 500
+
+
+# The templates link to pages that only the Flask app serves; register their URL rules
+# (without views) so url_for() can build those links here too.
+for _rule in flask_app.url_map.iter_rules():
+    if _rule.endpoint not in app.view_functions:
+        app.add_url_rule(_rule.rule, _rule.endpoint, methods=_rule.methods, defaults=_rule.defaults)
+
+
+# The middleware buffers the whole body and answers 400 above max_body_size (64 KB by
+# default), so allow the largest body the Flask app accepts: a schedule upload.
+_flask_wsgi = AsyncioWSGIMiddleware(flask_app, max_body_size=flask_app.config["MAX_CONTENT_LENGTH"])
+_flask_routes = flask_app.url_map.bind("localhost")
+
+
+def is_async_request(method, path):
+    """
+    True if the request goes to one of the ASYNC_ENDPOINTS (matched with the Flask URL rules).
+    """
+    try:
+        endpoint, _ = _flask_routes.match(path, method)
+    except HTTPException:
+        return False
+    return method in ASYNC_ENDPOINTS.get(endpoint, ())
+
+
+async def application(scope, receive, send):
+    """
+    ASGI entry point: the async pages (and server startup/shutdown) go to the Quart app,
+    every other request to the Flask app.
+    """
+    if scope["type"] == "http" and not is_async_request(scope["method"], scope["path"]):
+        await _flask_wsgi(scope, receive, send)
+    else:
+        await app(scope, receive, send)
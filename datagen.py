@@ -0,0 +1,423 @@
+import argparse
+import csv
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from db import DB_CONFIG, db_cursor, get_db_connection
+from reports import rebuild_facts
+from scheduling import CREW_SIZE, Timeline
+from utils import mysql_time_to_timedelta, reserve_sequence_block, seat_rows
+
+
+INSERT_BATCH = 5000    # rows per multi-row INSERT
+ID_BLOCK = 10000       # flight / order numbers reserved from SEQUENCE_COUNTER at a time
+LONG_FLIGHT = timedelta(hours=6)
+
+SCALES = {
+    "small":  {"aircraft": 20,  "days_back": 60,  "days_ahead": 30, "registered": 2000,   "guests": 5000},
+    "medium": {"aircraft": 60,  "days_back": 180, "days_ahead": 60, "registered": 50000,  "guests": 100000},
+    "large":  {"aircraft": 150, "days_back": 365, "days_ahead": 90, "registered": 500000, "guests": 1000000},
+}
+
+# (manufacturer, size, business seats, economy seats, weight in the fleet)
+FLEET = [
+    ("Boeing", "BIG", 30, 250, 2),
+    ("Boeing", "SMALL", 0, 120, 4),
+    ("Airbus", "BIG", 27, 216, 2),
+    ("Airbus", "SMALL", 0, 150, 4),
+    ("Dassault", "BIG", 12, 48, 1),
+    ("Dassault", "SMALL", 0, 16, 1),
+]
+
+FLIGHT_CANCEL_RATE = 0.02     # flights cancelled by a manager (orders become SYSTEM_CANCELLED)
+ORDER_CANCEL_RATE = 0.08      # orders cancelled by the customer
+REGISTERED_SHARE = 0.6        # orders made by registered users (the rest by guests)
+QUALIFIED_SHARE = 0.3         # small-aircraft crew that is also qualified for BIG aircraft
+
+STAFF_FIRST = ["אייל", "עמית", "גיל", "נועם", "דנה", "מאיה", "יעל", "רון", "שירה", "תומר", "נועה", "איתי"]
+STAFF_LAST = ["כהן", "לוי", "בר", "פרץ", "מזרחי", "אברהם", "פרידמן", "שפירא", "דהן", "אזולאי"]
+CUSTOMER_FIRST = ["Noa", "Daniel", "Maya", "Omer", "Tamar", "Yosef", "Emma", "Liam", "Sara", "David"]
+CUSTOMER_LAST = ["Cohen", "Levi", "Smith", "Katz", "Brown", "Mizrahi", "Miller", "Friedman"]
+STAFF_CITIES = ["Tel Aviv", "Jerusalem", "Haifa", "Ramat Gan", "Holon", "Netanya"]
+
+# load order; parents come first
+TABLE_COLUMNS = {
+    "AIRCRAFT": ["AIRCRAFT_ID", "SIZE", "MANUFACTURER", "PURCHASE_DATE", "CAPACITY_BUSINESS", "CAPACITY_ECONOMY"],
+    "SEAT": ["AIRCRAFT_ID", "ROW_NUM", "COL_LETTER", "CLASS"],
+    "PILOT": ["ID_P", "H_FIRST_NAME", "H_LAST_NAME", "PHONE_NUM", "CITY", "STREET", "HOUSE_NUM",
+              "START_DATE", "IS_QUALIFIED"],
+    "FLIGHT_ATTENDANT": ["ID_A", "H_FIRST_NAME", "H_LAST_NAME", "PHONE_NUM", "CITY", "STREET", "HOUSE_NUM",
+                         "START_DATE", "IS_QUALIFIED"],
+    "REGISTER": ["R_MAIL", "R_PASSWORD", "BIRTH_DATE", "PASSPORT_NUM", "REGITER_DATE", "E_FIRST_NAME", "E_LAST_NAME"],
+    "REGISTER_PHONE": ["R_MAIL", "PHONE_NUM"],
+    "GUEST": ["G_MAIL", "E_FIRST_NAME", "E_LAST_NAME"],
+    "GUEST_PHONE": ["G_MAIL", "PHONE_NUM"],
+    "FLIGHT": ["FLIGHT_NUM", "AIRCRAFT_ID", "DURATION", "ROUTE_ID", "FLIGHT_STATUS", "DEPARTURE_DATE",
+               "DEPARTURE_TIME", "ARRIVAL_DATE", "ARRIVAL_TIME", "ECONOMY_PRICE", "BUSINESS_PRICE"],
+    "ASSIGNED_PILOT": ["ID_P", "FLIGHT_NUM"],
+    "ASSIGHNED_ATTENDANT": ["ID_A", "FLIGHT_NUM"],
+    "F_ORDER": ["O_ID", "FLIGHT_NUM", "G_MAIL", "R_MAIL", "O_STATUS", "O_DATE", "ORDER_PRICE", "USER_TYPE",
+                "CANACELATION_DATE_TIME", "DEPARTURE_DT"],
+    "ORDER_SEAT": ["O_ID", "AIRCRAFT_ID", "ROW_NUM", "COL_LETTER"],
+}
+
+
+class InsertLoader:
+    """
+    Loads rows with batched multi-row INSERTs (mysql-connector sends an executemany
+    INSERT as one statement). Foreign key checks are off while loading, because a
+    child batch can be full before its parent batch is.
+    """
+
+    def __init__(self, batch=INSERT_BATCH):
+        self.batch = batch
+        self.db = get_db_connection()
+        self.cur = self.db.cursor()
+        self.cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+        self.buffers = {t: [] for t in TABLE_COLUMNS}
+        self.counts = dict.fromkeys(TABLE_COLUMNS, 0)
+
+    def add(self, table, row):
+        buf = self.buffers[table]
+        buf.append(row)
+        if len(buf) >= self.batch:
+            self._flush(table)
+
+    def _flush(self, table):
+        rows = self.buffers[table]
+        if not rows:
+            return
+        cols = TABLE_COLUMNS[table]
+        self.cur.executemany(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})", rows
+        )
+        self.counts[table] += len(rows)
+        self.buffers[table] = []
+
+    def finish(self):
+        try:
+            for table in TABLE_COLUMNS:
+                self._flush(table)
+            self.cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+        finally:
+            self.cur.close()
+            self.db.close()
+        return self.counts
+
+
+def _csv_value(v):
+    if v is None:
+        return r"\N"
+    if isinstance(v, bool):
+        return int(v)
+    return v
+
+
+class CsvLoader:
+    """
+    Writes one CSV file per table into a directory. With load=True, finish() bulk-loads
+    them with LOAD DATA LOCAL INFILE (the server needs local_infile=ON).
+    """
+
+    def __init__(self, directory, load=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.load = load
+        self.paths = {t: os.path.join(directory, f"{t}.csv") for t in TABLE_COLUMNS}
+        self.files = {t: open(p, "w", newline="", encoding="utf-8") for t, p in self.paths.items()}
+        self.writers = {t: csv.writer(fh, lineterminator="\n") for t, fh in self.files.items()}
+        self.counts = dict.fromkeys(TABLE_COLUMNS, 0)
+
+    def add(self, table, row):
+        self.writers[table].writerow([_csv_value(v) for v in row])
+        self.counts[table] += 1
+
+    def finish(self):
+        for fh in self.files.values():
+            fh.close()
+        if not self.load:
+            return self.counts
+
+        cnx = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
+        cur = cnx.cursor()
+        try:
+            cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table, cols in TABLE_COLUMNS.items():
+                cur.execute(f"""
+                    LOAD DATA LOCAL INFILE %s
+                    INTO TABLE {table}
+                    CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                    LINES TERMINATED BY '\\n'
+                    ({', '.join(cols)})
+                """, (os.path.abspath(self.paths[table]),))
+            cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+            cnx.commit()
+        finally:
+            cur.close()
+            cnx.close()
+        return self.counts
+
+
+class _SequenceIds:
+    """
+    Hands out F123 / O123 style numbers, reserving them from SEQUENCE_COUNTER in blocks.
+    """
+
+    def __init__(self, name, letter):
+        self.name = name
+        self.letter = letter
+        self.next = 0
+        self.end = 0
+
+    def __call__(self):
+        if self.next >= self.end:
+            self.next = reserve_sequence_block(self.name, ID_BLOCK)
+            self.end = self.next + ID_BLOCK
+        n = self.next
+        self.next += 1
+        return f"{self.letter}{n}"
+
+
+def _load_routes():
+    """
+    The app's route network: {origin: [route dict]}, and the busiest origin (used as the hub).
+    """
+    with db_cursor() as (db, cur):
+        cur.execute("SELECT ROUTE_ID, DURATION, ORIGIN, DESTINATION FROM ROUTE")
+        rows = cur.fetchall()
+    routes = {}
+    for r in rows:
+        r["DURATION_TD"] = mysql_time_to_timedelta(r["DURATION"])
+        routes.setdefault(r["ORIGIN"], []).append(r)
+    if not routes:
+        raise SystemExit("The ROUTE table is empty; load sql/sql_migration.sql first.")
+    hub = max(routes, key=lambda city: len(routes[city]))
+    return routes, hub
+
+
+def _staff_row(rng, emp_id, qualified):
+    return (emp_id, rng.choice(STAFF_FIRST), rng.choice(STAFF_LAST), f"05{rng.randint(0, 99999999):08d}",
+            rng.choice(STAFF_CITIES), "Herzl", rng.randint(1, 120),
+            datetime(2015 + rng.randint(0, 9), rng.randint(1, 12), 1).date(), qualified)
+
+
+def _write_customers(loader, rng, prefix, registered, guests):
+    tag = prefix.lower()
+    for i in range(registered):
+        mail = f"{tag}.r{i}@example.com"
+        loader.add("REGISTER", (mail, "pass123", datetime(1950 + rng.randint(0, 55), rng.randint(1, 12), 1).date(),
+                                f"{prefix}{i:09d}", datetime(2020, 1, 1).date(),
+                                rng.choice(CUSTOMER_FIRST), rng.choice(CUSTOMER_LAST)))
+        loader.add("REGISTER_PHONE", (mail, f"05{rng.randint(0, 99999999):08d}"))
+    for i in range(guests):
+        mail = f"{tag}.g{i}@example.com"
+        loader.add("GUEST", (mail, rng.choice(CUSTOMER_FIRST), rng.choice(CUSTOMER_LAST)))
+        loader.add("GUEST_PHONE", (mail, f"05{rng.randint(0, 99999999):08d}"))
+
+
+def _write_orders(loader, rng, flight, seats, prefix, registered, guests, now, next_order):
+    """
+    Sells part of a flight's seats in orders of 1-4 seats, with a realistic status mix.
+    Returns how many orders were written.
+    """
+    dep = flight["DEPARTURE_DT"]
+    status = flight["FLIGHT_STATUS"]
+    if status == "COMPLETED":
+        load = rng.uniform(0.6, 0.95)
+    else:
+        days_left = max(0.0, (dep - now).total_seconds() / 86400)
+        load = rng.uniform(0.1, 0.8) * max(0.2, 1 - days_left / 120)
+
+    tag = prefix.lower()
+    prices = {"ECONOMY": flight["ECONOMY_PRICE"], "BUSINESS": flight["BUSINESS_PRICE"]}
+    orders = 0
+    for seat_class in ("BUSINESS", "ECONOMY"):
+        pool = [s for s in seats if s[3] == seat_class]
+        rng.shuffle(pool)
+        pool = pool[:int(len(pool) * load)]
+        i = 0
+        while i < len(pool):
+            group = pool[i:i + rng.choice((1, 1, 2, 2, 2, 3, 4))]
+            i += len(group)
+
+            o_id = next_order()
+            price = round(prices[seat_class] * len(group), 2)
+            ordered_at = dep - timedelta(days=rng.randint(1, 90), minutes=rng.randint(0, 1439))
+            ordered_at = min(ordered_at, now)
+            cancelled_at = None
+
+            if status == "CANCELLED":
+                o_status, price = "SYSTEM_CANCELLED", 0
+                cancelled_at = min(now, dep - timedelta(hours=72))
+                cancelled_at = max(cancelled_at, ordered_at)
+            elif rng.random() < ORDER_CANCEL_RATE and min(dep, now) > ordered_at:
+                o_status = "CUSTOMER_CANCELLED"
+                window = (min(dep, now) - ordered_at).total_seconds()
+                cancelled_at = ordered_at + timedelta(seconds=int(rng.uniform(0, window)))
+                if dep - cancelled_at > timedelta(hours=36):
+                    price = round(price * 0.05, 2)
+            else:
+                o_status = "COMPLETED" if status == "COMPLETED" else "ACTIVE"
+
+            if rng.random() < REGISTERED_SHARE and registered:
+                g_mail, r_mail, user_type = None, f"{tag}.r{rng.randrange(registered)}@example.com", "REGISTERD"
+            else:
+                g_mail, r_mail, user_type = f"{tag}.g{rng.randrange(guests)}@example.com", None, "GUEST"
+
+            loader.add("F_ORDER", (o_id, flight["FLIGHT_NUM"], g_mail, r_mail, o_status, ordered_at.date(),
+                                   price, user_type, cancelled_at, dep))
+            for aircraft_id, row_num, col, _ in group:
+                loader.add("ORDER_SEAT", (o_id, aircraft_id, row_num, col))
+            orders += 1
+    return orders
+
+
+def generate(loader, scale, rng, prefix="GEN", now=None, progress=None):
+    """
+    Generates a full data set into loader: a fleet with seats, one crew team per aircraft,
+    customers, flights and orders. Every aircraft flies a chain of routes from the ROUTE table
+    (each flight leaves from where the previous one landed, long routes only on BIG aircraft),
+    and every flight is checked with the same 4-day and 7-day rules the manager screens use.
+    Returns counters.
+    """
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    routes, hub = _load_routes()
+    next_flight = _SequenceIds("FLIGHT", "F")
+    next_order = _SequenceIds("ORDER", "O")
+    stats = {"flights": 0, "orders": 0, "rule_rejects": 0}
+
+    if scale["guests"] <= 0:
+        raise SystemExit("At least one guest customer is needed.")
+    _write_customers(loader, rng, prefix, scale["registered"], scale["guests"])
+
+    weights = [f[4] for f in FLEET]
+    start = now - timedelta(days=scale["days_back"])
+    end = now + timedelta(days=scale["days_ahead"])
+    pilots = attendants = 0
+
+    for n in range(1, scale["aircraft"] + 1):
+        manufacturer, size, cap_bus, cap_econ, _ = rng.choices(FLEET, weights)[0]
+        big = size == "BIG"
+        aircraft_id = f"{prefix}{n:05d}"
+        loader.add("AIRCRAFT", (aircraft_id, size, manufacturer, datetime(2010 + rng.randint(0, 14), 1, 1).date(),
+                                cap_bus, cap_econ))
+        seats = seat_rows(aircraft_id, manufacturer, size, cap_econ, cap_bus)
+        for s in seats:
+            loader.add("SEAT", s)
+
+        # the crew team of this aircraft flies all its flights, so it always starts where it landed
+        team_p, team_a = [], []
+        for _ in range(CREW_SIZE[big]["pilot"]):
+            pilots += 1
+            team_p.append(f"{prefix}P{pilots:06d}")
+            loader.add("PILOT", _staff_row(rng, team_p[-1], big or rng.random() < QUALIFIED_SHARE))
+        for _ in range(CREW_SIZE[big]["attendant"]):
+            attendants += 1
+            team_a.append(f"{prefix}A{attendants:06d}")
+            loader.add("FLIGHT_ATTENDANT", _staff_row(rng, team_a[-1], big or rng.random() < QUALIFIED_SHARE))
+
+        timeline = Timeline([])
+        location = hub
+        t = start + timedelta(minutes=5 * rng.randint(0, 288))
+        while True:
+            choices = [r for r in routes.get(location, []) if big or r["DURATION_TD"] <= LONG_FLIGHT]
+            if not choices:
+                break
+            r = rng.choice(choices)
+            if t.hour < 6:
+                t = t.replace(hour=6, minute=5 * rng.randint(0, 11))
+            dep = t
+            arr = dep + r["DURATION_TD"]
+            if arr > end:
+                break
+
+            cancelled = rng.random() < FLIGHT_CANCEL_RATE
+            flight = {"DEPARTURE_DT": dep, "ARRIVAL_DT": arr, "ORIGIN": r["ORIGIN"], "DESTINATION": r["DESTINATION"]}
+            if not cancelled and not (timeline.available(dep, arr, r["ORIGIN"], r["DESTINATION"])
+                                      and timeline.week_rule_ok(dep, r["ORIGIN"])):
+                stats["rule_rejects"] += 1
+                t += timedelta(hours=1)
+                continue
+
+            minutes = r["DURATION_TD"].total_seconds() / 60
+            economy = round((40 + minutes * 1.2) * rng.uniform(0.8, 1.3))
+            flight.update({
+                "FLIGHT_NUM": next_flight(),
+                "FLIGHT_STATUS": "CANCELLED" if cancelled else ("COMPLETED" if arr <= now else "ACTIVE"),
+                "ECONOMY_PRICE": economy,
+                "BUSINESS_PRICE": economy * 3 if big else 0,
+            })
+            loader.add("FLIGHT", (flight["FLIGHT_NUM"], aircraft_id, r["DURATION"], r["ROUTE_ID"],
+                                  flight["FLIGHT_STATUS"], dep.date(), dep.time(), arr.date(), arr.time(),
+                                  flight["ECONOMY_PRICE"], flight["BUSINESS_PRICE"]))
+            for p in team_p:
+                loader.add("ASSIGNED_PILOT", (p, flight["FLIGHT_NUM"]))
+            for a in team_a:
+                loader.add("ASSIGHNED_ATTENDANT", (a, flight["FLIGHT_NUM"]))
+            stats["orders"] += _write_orders(loader, rng, flight, seats, prefix,
+                                             scale["registered"], scale["guests"], now, next_order)
+            stats["flights"] += 1
+
+            if cancelled:
+                t = dep + timedelta(hours=rng.randint(2, 8))   # the aircraft stays where it is
+            else:
+                timeline.add(flight)
+                location = r["DESTINATION"]
+                t = arr + timedelta(minutes=5 * rng.randint(9, 48))   # turnaround: 45 min to 4 hours
+
+        if progress:
+            progress(n, stats)
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large, rule-consistent FLYTAU data set.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for key in SCALES["small"]:
+        parser.add_argument("--" + key.replace("_", "-"), type=int, help=f"override the scale's {key}")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--prefix", default="GEN", help="prefix of generated ids (use a new one for each run)")
+    parser.add_argument("--mode", choices=["insert", "infile", "csv"], default="insert",
+                        help="insert: batched INSERTs; infile: CSV files + LOAD DATA LOCAL INFILE; csv: files only")
+    parser.add_argument("--csv-dir", default="datagen_out")
+    parser.add_argument("--batch", type=int, default=INSERT_BATCH)
+    args = parser.parse_args()
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        value = getattr(args, key)
+        if value is not None:
+            scale[key] = value
+
+    if args.mode == "insert":
+        loader = InsertLoader(args.batch)
+    else:
+        loader = CsvLoader(args.csv_dir, load=args.mode == "infile")
+
+    started = time.monotonic()
+
+    def progress(n, stats):
+        if n % 10 == 0 or n == scale["aircraft"]:
+            print(f"aircraft {n}/{scale['aircraft']}: {stats['flights']} flights, {stats['orders']} orders, "
+                  f"{time.monotonic() - started:.0f}s")
+
+    stats = generate(loader, scale, random.Random(args.seed), args.prefix, progress=progress)
+    counts = loader.finish()
+
+    if args.mode != "csv":
+        with db_cursor() as (db, cur):
+            db.start_transaction()
+            rebuild_facts(cur)
+            db.commit()
+
+    elapsed = time.monotonic() - started
+    rows = sum(counts.values())
+    for table, count in counts.items():
+        print(f"{table:<22}{count:>12}")
+    print(f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s), {stats['rule_rejects']} rule rejects")
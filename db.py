@@ -1,11 +1,478 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
 import mysql.connector
+from mysql.connector import errors, pooling
+
+
+DB_CONFIG = {
+    "host": os.environ.get("FLYTAU_DB_HOST", "localhost"),
+    "user": os.environ.get("FLYTAU_DB_USER", "root"),
+    "password": os.environ.get("FLYTAU_DB_PASSWORD", "root"),
+    "database": os.environ.get("FLYTAU_DB_NAME", "FLYTAU"),
+    "autocommit": True,
+}
+
+# Pool settings (all can be overridden with environment variables).
+POOL_SIZE = int(os.environ.get("FLYTAU_POOL_SIZE", "10"))          # kept-open connections (max 32)
+POOL_MAX_OVERFLOW = int(os.environ.get("FLYTAU_POOL_OVERFLOW", "5"))  # extra short-lived connections
+POOL_TIMEOUT = float(os.environ.get("FLYTAU_POOL_TIMEOUT", "10"))   # seconds to wait for a free slot
+POOL_RECYCLE = float(os.environ.get("FLYTAU_POOL_RECYCLE", "3600"))  # reconnect connections older than this
+POOL_PRE_PING = os.environ.get("FLYTAU_POOL_PRE_PING", "1") != "0"   # ping before handing out
+
+# SQL instrumentation settings.
+SQL_SLOW_MS = float(os.environ.get("FLYTAU_SQL_SLOW_MS", "100"))          # statements slower than this are logged
+SQL_N_PLUS_ONE = int(os.environ.get("FLYTAU_SQL_N_PLUS_ONE", "10"))       # same statement more often = N+1 pattern
+SQL_STATEMENTS_MAX = 500                                                  # distinct statements kept in the totals
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_SIZE + POOL_MAX_OVERFLOW)
+_born = {}
+
+_seq_cnx = None                  # dedicated connection for sequence numbers (see sequence_cursor)
+_seq_cnx_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "in_use": 0,
+    "overflow_in_use": 0,
+    "waiting": 0,
+    "checkouts_total": 0,
+    "timeouts_total": 0,
+    "recycled_total": 0,
+    "wait_seconds_total": 0.0,
+    "wait_seconds_max": 0.0,
+}
+
+
+class PoolTimeoutError(errors.PoolError):
+    """
+    Raised when no connection became free within POOL_TIMEOUT seconds.
+    """
+
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS_RE = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """
+    Statement "shape" used to group queries: literals and placeholders become ?,
+    IN lists and multi-row VALUES are collapsed, and whitespace is squeezed.
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _SPACE_RE.sub(" ", sql).strip()
+    sql = sql.replace("( ", "(").replace(" )", ")").replace(" ,", ",")
+    sql = _IN_LIST_RE.sub("(?, ...)", sql)
+    sql = _ROWS_RE.sub(r"\1, ...", sql)
+    return sql
+
+
+class QueryStats:
+    """
+    Queries of one web request: count, DB time, rows fetched, and per-statement totals.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.statements = {}   # normalized sql -> [calls, seconds, max seconds]
+
+    def record(self, sql, seconds):
+        self.queries += 1
+        self.seconds += seconds
+        entry = self.statements.setdefault(sql, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def slowest(self, n=5):
+        top = sorted(self.statements.items(), key=lambda kv: kv[1][2], reverse=True)[:n]
+        return [{"sql": sql, "calls": e[0], "max_ms": round(e[2] * 1000, 2)} for sql, e in top]
+
+    def n_plus_one(self, threshold=SQL_N_PLUS_ONE):
+        """
+        Statements executed more than `threshold` times in this request (likely a query in a loop).
+        """
+        return [{"sql": sql, "calls": e[0]} for sql, e in self.statements.items() if e[0] > threshold]
+
+
+_request_stats = contextvars.ContextVar("flytau_request_sql", default=None)
+
+_sql_lock = threading.Lock()
+_sql_totals = {
+    "queries_total": 0,
+    "seconds_total": 0.0,
+    "rows_total": 0,
+    "slow_total": 0,
+    "requests_total": 0,
+    "n_plus_one_requests_total": 0,
+}
+_sql_statements = {}                   # normalized sql -> [calls, seconds, rows]
+_slow_queries = deque(maxlen=50)       # recent statements slower than SQL_SLOW_MS
+_recent_requests = deque(maxlen=50)    # summaries of the last requests
+
+
+def _record_query(sql, seconds):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(sql, seconds)
+    with _sql_lock:
+        _sql_totals["queries_total"] += 1
+        _sql_totals["seconds_total"] += seconds
+        entry = _sql_statements.get(sql)
+        if entry is None and len(_sql_statements) < SQL_STATEMENTS_MAX:
+            entry = _sql_statements[sql] = [0, 0.0, 0]
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += seconds
+        if seconds * 1000 >= SQL_SLOW_MS:
+            _sql_totals["slow_total"] += 1
+            _slow_queries.append({"sql": sql, "ms": round(seconds * 1000, 2), "at": time.time()})
+
+
+def _record_rows(sql, rows):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.rows += rows
+    with _sql_lock:
+        _sql_totals["rows_total"] += rows
+        entry = _sql_statements.get(sql)
+        if entry is not None:
+            entry[2] += rows
+
+
+class _InstrumentedCursor:
+    """
+    Cursor wrapper that times every execute and counts fetched rows.
+    Everything else is passed to the real cursor.
+    """
+
+    def __init__(self, cur):
+        self._cur = cur
+        self._sql = ""
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __iter__(self):
+        for row in self._cur:
+            _record_rows(self._sql, 1)
+            yield row
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._sql = normalize_sql(operation)
+        started = time.perf_counter()
+        try:
+            return self._cur.execute(operation, params, *args, **kwargs)
+        finally:
+            _record_query(self._sql, time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._sql = normalize_sql(operation)
+        started = time.perf_counter()
+        try:
+            return self._cur.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _record_query(self._sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            _record_rows(self._sql, 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cur.fetchmany(*args, **kwargs)
+        _record_rows(self._sql, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        _record_rows(self._sql, len(rows))
+        return rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cur.close()
+
+
+class _BorrowedConnection:
+    """
+    Thin wrapper around a pooled (or overflow) connection.
+    Behaves like a normal connection, but close() gives the slot back to the pool.
+    """
+
+    def __init__(self, cnx, overflow):
+        self._cnx = cnx
+        self._overflow = overflow
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def cursor(self, *args, **kwargs):
+        return _InstrumentedCursor(self._cnx.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._cnx.close()
+        finally:
+            with _stats_lock:
+                _stats["in_use"] -= 1
+                if self._overflow:
+                    _stats["overflow_in_use"] -= 1
+            _slots.release()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _get_pool():
+    """
+    Creates the shared connection pool the first time it is needed.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="flytau_pool",
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+def _prepare(cnx):
+    """
+    Health-checks a pooled connection before it is handed out.
+    Reconnects it when it is older than POOL_RECYCLE or the ping fails.
+    """
+    raw = getattr(cnx, "_cnx", cnx)
+    key = id(raw)
+    now = time.monotonic()
+    born = _born.setdefault(key, now)
+
+    if POOL_RECYCLE and now - born > POOL_RECYCLE:
+        cnx.reconnect(attempts=1, delay=0)
+        _born[key] = now
+        with _stats_lock:
+            _stats["recycled_total"] += 1
+    elif POOL_PRE_PING:
+        cnx.ping(reconnect=True, attempts=1, delay=0)
+
 
 def get_db_connection():
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="FLYTAU",
-        autocommit=True
-    )
-    return connection
+    """
+    Borrows a connection from the pool (waits up to POOL_TIMEOUT seconds).
+    When the pool is busy it opens an overflow connection, up to POOL_MAX_OVERFLOW.
+    Calling close() on the result returns it to the pool.
+    """
+    start = time.monotonic()
+    with _stats_lock:
+        _stats["waiting"] += 1
+    got_slot = _slots.acquire(timeout=POOL_TIMEOUT)
+    waited = time.monotonic() - start
+
+    with _stats_lock:
+        _stats["waiting"] -= 1
+        _stats["wait_seconds_total"] += waited
+        _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], waited)
+        if not got_slot:
+            _stats["timeouts_total"] += 1
+
+    if not got_slot:
+        raise PoolTimeoutError(f"No database connection available after {POOL_TIMEOUT} seconds")
+
+    overflow = False
+    try:
+        try:
+            cnx = _get_pool().get_connection()
+            try:
+                _prepare(cnx)
+            except Exception:
+                # give the broken connection back to the pool instead of leaking it
+                try:
+                    cnx.close()
+                except Exception:
+                    pass
+                raise
+        except errors.PoolError:
+            cnx = mysql.connector.connect(**DB_CONFIG)
+            overflow = True
+    except Exception:
+        _slots.release()
+        raise
+
+    with _stats_lock:
+        _stats["in_use"] += 1
+        _stats["checkouts_total"] += 1
+        if overflow:
+            _stats["overflow_in_use"] += 1
+
+    return _BorrowedConnection(cnx, overflow)
+
+
+@contextmanager
+def db_cursor(dictionary=True):
+    """
+    Context manager that gives (connection, cursor) and always closes both.
+    Rolls back if the block raises.
+    """
+    db = get_db_connection()
+    cur = db.cursor(dictionary=dictionary)
+    try:
+        yield db, cur
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+        db.close()
+
+
+@contextmanager
+def sequence_cursor():
+    """
+    Cursor on one dedicated autocommit connection, outside the pool, used to reserve
+    sequence numbers. The callers usually hold a pooled connection already; borrowing a
+    second one could wait for a slot that only another waiting request can free.
+    One user at a time; the connection is reopened when it was lost.
+    """
+    global _seq_cnx
+    with _seq_cnx_lock:
+        if _seq_cnx is None:
+            _seq_cnx = mysql.connector.connect(**DB_CONFIG)
+        else:
+            _seq_cnx.ping(reconnect=True, attempts=1, delay=0)
+        cur = _InstrumentedCursor(_seq_cnx.cursor())
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+
+def run_steps(cur, steps):
+    """
+    Runs query steps on a blocking cursor. Steps are generators (e.g. seating.seat_map_steps)
+    that yield (sql, params) and get the result rows back, so the same logic also runs
+    on the async driver (aiodb.fetch_steps). Returns the generator's result.
+    """
+    rows = None
+    while True:
+        try:
+            sql, params = steps.send(rows)
+        except StopIteration as done:
+            return done.value
+        cur.execute(sql, params)
+        rows = cur.fetchall() if cur.description else []
+
+
+def pool_stats():
+    """
+    Returns a snapshot of the pool metrics (in use, waiters, wait times...).
+    """
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot["size"] = POOL_SIZE
+    snapshot["max_overflow"] = POOL_MAX_OVERFLOW
+    return snapshot
+
+
+def start_request_stats():
+    """
+    Starts counting the queries of the current web request (call from before_request).
+    """
+    _request_stats.set(QueryStats())
+
+
+def finish_request_stats(endpoint=None, method=None, path=None):
+    """
+    Stops counting for the current request and returns its QueryStats (or None).
+    The request summary is kept for the SQL debug page; N+1 patterns are counted.
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        return None
+    _request_stats.set(None)
+
+    n_plus_one = stats.n_plus_one()
+    with _sql_lock:
+        _sql_totals["requests_total"] += 1
+        if n_plus_one:
+            _sql_totals["n_plus_one_requests_total"] += 1
+        _recent_requests.append({
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "queries": stats.queries,
+            "db_ms": round(stats.seconds * 1000, 2),
+            "rows": stats.rows,
+            "slowest": stats.slowest(3),
+            "n_plus_one": n_plus_one,
+        })
+    return stats
+
+
+def sql_stats():
+    """
+    Snapshot of the SQL totals of this process (queries, DB time, rows, slow, N+1 requests).
+    """
+    with _sql_lock:
+        return dict(_sql_totals)
+
+
+def sql_statement_stats(limit=20):
+    """
+    The statements with the most total DB time: [{"sql", "calls", "seconds", "rows"}].
+    """
+    with _sql_lock:
+        items = sorted(_sql_statements.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
+    return [{"sql": sql, "calls": e[0], "seconds": round(e[1], 6), "rows": e[2]} for sql, e in items]
+
+
+def sql_debug_snapshot():
+    """
+    Everything the SQL debug page shows: totals, top statements, slow queries, recent requests.
+    """
+    with _sql_lock:
+        slow = list(_slow_queries)
+        recent = list(_recent_requests)
+    return {
+        "totals": sql_stats(),
+        "statements": sql_statement_stats(),
+        "slow_queries": slow,
+        "recent_requests": recent,
+    }
@@ -0,0 +1,710 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+from http.cookiejar import CookieJar
+
+from db import db_cursor
+from reports import FactDeltas, refresh_facts
+from utils import create_seats_for_aircraft, reserve_sequence_block
+
+
+# Everything the load test creates is marked so "clean" can remove it again.
+PREFIX = "LT"
+USER_DOMAIN = "loadtest.flytau"
+USER_PASSWORD = "loadtest"
+INSERT_BATCH = 1000
+
+SCALES = {
+    "small":  {"cities": 6,  "aircraft": 10,  "days": 14, "flights_per_day": 20,  "users": 200,   "orders": 2000},
+    "medium": {"cities": 12, "aircraft": 60,  "days": 30, "flights_per_day": 120, "users": 5000,  "orders": 50000},
+    "large":  {"cities": 24, "aircraft": 300, "days": 60, "flights_per_day": 600, "users": 50000, "orders": 500000},
+}
+
+MANUFACTURERS = ["Boeing", "Airbus", "Dassault"]
+
+# funnel steps in order, used to print the results table
+STEPS = [
+    "flight_search", "seat_select GET", "seat_select POST", "checkout GET",
+    "checkout POST", "my_orders", "cancel_order GET", "cancel_order POST",
+]
+
+
+def _batched(cur, sql, rows):
+    for i in range(0, len(rows), INSERT_BATCH):
+        cur.executemany(sql, rows[i:i + INSERT_BATCH])
+
+
+def seed(scale, rng):
+    """
+    Writes a synthetic data set of the given scale (see SCALES): routes between made-up
+    cities, aircraft with seats from the seat_layout rules, future flights, registered
+    users and their order history. Returns the row counts.
+    """
+    cities = [f"{PREFIX} City {i:02d}" for i in range(1, scale["cities"] + 1)]
+    pairs = [(a, b) for a in cities for b in cities if a != b]
+
+    routes = []
+    for i, (origin, dest) in enumerate(pairs, start=1):
+        minutes = rng.randint(6, 24) * 30
+        routes.append((f"{PREFIX}{i}", f"{minutes // 60:02d}:{minutes % 60:02d}:00", origin, dest))
+
+    aircraft = []
+    for i in range(1, scale["aircraft"] + 1):
+        size = "BIG" if i % 3 == 0 else "SMALL"
+        manufacturer = MANUFACTURERS[i % len(MANUFACTURERS)]
+        business = rng.randint(2, 4) * 6 if size == "BIG" else 0
+        economy = rng.randint(15, 35) * 6 if size == "BIG" else rng.randint(8, 20) * 4
+        aircraft.append((f"{PREFIX}-A{i:04d}", size, manufacturer, date(2020, 1, 1), business, economy))
+    big = [a for a in aircraft if a[1] == "BIG"]
+
+    first_day = date.today() + timedelta(days=1)
+    flights = []
+    for d in range(scale["days"]):
+        day = first_day + timedelta(days=d)
+        for _ in range(scale["flights_per_day"]):
+            route_id, duration, _, _ = rng.choice(routes)
+            h, m, _ = (int(x) for x in duration.split(":"))
+            plane = rng.choice(big if h * 60 + m > 6 * 60 else aircraft)
+            dep = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(12, 92) * 15)
+            arr = dep + timedelta(hours=h, minutes=m)
+            economy_price = rng.randint(20, 180) * 5
+            business_price = economy_price * 3 if plane[1] == "BIG" else 0
+            flights.append([None, plane[0], duration, route_id, dep.date(), dep.time(), arr.date(), arr.time(),
+                            economy_price, business_price])
+
+    first = reserve_sequence_block("FLIGHT", len(flights))
+    for i, f in enumerate(flights):
+        f[0] = f"F{first + i}"
+
+    users = [(f"user{i}@{USER_DOMAIN}", USER_PASSWORD, date(1990, 1, 1), f"P{i:08d}", date.today(),
+              "Load", f"Tester{i}") for i in range(scale["users"])]
+
+    with db_cursor() as (db, cur):
+        db.start_transaction()
+        _batched(cur, "INSERT INTO ROUTE (ROUTE_ID, DURATION, ORIGIN, DESTINATION) VALUES (%s,%s,%s,%s)", routes)
+        _batched(cur, """
+            INSERT INTO AIRCRAFT (AIRCRAFT_ID, SIZE, MANUFACTURER, PURCHASE_DATE, CAPACITY_BUSINESS, CAPACITY_ECONOMY)
+            VALUES (%s,%s,%s,%s,%s,%s)
+        """, aircraft)
+        for a in aircraft:
+            create_seats_for_aircraft(cur, a[0], a[5], a[4])
+        _batched(cur, """
+            INSERT INTO FLIGHT
+            (FLIGHT_NUM, AIRCRAFT_ID, DURATION, ROUTE_ID, FLIGHT_STATUS,
+             DEPARTURE_DATE, DEPARTURE_TIME, ARRIVAL_DATE, ARRIVAL_TIME,
+             ECONOMY_PRICE, BUSINESS_PRICE)
+            VALUES (%s,%s,%s,%s,'ACTIVE',%s,%s,%s,%s,%s,%s)
+        """, [tuple(f) for f in flights])
+        refresh_facts(cur, [f[0] for f in flights])   # before the orders, which add deltas
+        _batched(cur, """
+            INSERT INTO REGISTER (R_MAIL, R_PASSWORD, BIRTH_DATE, PASSPORT_NUM, REGITER_DATE, E_FIRST_NAME, E_LAST_NAME)
+            VALUES (%s,%s,%s,%s,%s,%s,%s)
+        """, users)
+
+        cur.execute("""
+            SELECT AIRCRAFT_ID, ROW_NUM, COL_LETTER, CLASS
+            FROM SEAT
+            WHERE AIRCRAFT_ID LIKE %s
+        """, (PREFIX + "-%",))
+        seats = {}
+        for s in cur.fetchall():
+            seats.setdefault(s["AIRCRAFT_ID"], []).append(s)
+
+        orders, order_seats, taken = [], [], {}
+        facts = FactDeltas()
+        first_order = reserve_sequence_block("ORDER", scale["orders"])
+        for i in range(scale["orders"]):
+            f = rng.choice(flights)
+            free = [s for s in seats[f[1]] if (f[0], s["ROW_NUM"], s["COL_LETTER"]) not in taken]
+            picked = rng.sample(free, min(len(free), rng.randint(1, 3)))
+            if not picked:
+                continue
+            o_id = f"O{first_order + i}"
+            seat_prices = [(s["CLASS"], f[9] if s["CLASS"] == "BUSINESS" else f[8]) for s in picked]
+            price = sum(p for _, p in seat_prices)
+            o_date = date.today() - timedelta(days=rng.randint(0, 90))
+            departure = datetime.combine(f[4], f[5])
+            facts.order_placed(f[0], o_date, seat_prices)
+            if rng.random() < 0.15:
+                cancelled_at = datetime.now().replace(microsecond=0)
+                status, price = "CUSTOMER_CANCELLED", round(price * 0.05, 2)
+                hours_before = (departure - cancelled_at).total_seconds() / 3600
+                facts.order_cancelled(f[0], o_date, seat_prices, price, hours_before)
+            else:
+                status, cancelled_at = "ACTIVE", None
+                for s in picked:
+                    taken[(f[0], s["ROW_NUM"], s["COL_LETTER"])] = o_id
+            orders.append((o_id, f[0], rng.choice(users)[0], status, o_date, price, cancelled_at, departure))
+            order_seats += [(o_id, f[1], s["ROW_NUM"], s["COL_LETTER"]) for s in picked]
+
+        _batched(cur, """
+            INSERT INTO F_ORDER (O_ID, FLIGHT_NUM, G_MAIL, R_MAIL, O_STATUS, O_DATE, ORDER_PRICE, USER_TYPE,
+                                 CANACELATION_DATE_TIME, DEPARTURE_DT)
+            VALUES (%s,%s,NULL,%s,%s,%s,%s,'REGISTERD',%s,%s)
+        """, orders)
+        _batched(cur, "INSERT INTO ORDER_SEAT (O_ID, AIRCRAFT_ID, ROW_NUM, COL_LETTER) VALUES (%s,%s,%s,%s)",
+                 order_seats)
+
+        facts.write(cur)
+        db.commit()
+
+    return {"routes": len(routes), "aircraft": len(aircraft), "flights": len(flights),
+            "users": len(users), "orders": len(orders), "order_seats": len(order_seats)}
+
+
+def clean():
+    """
+    Deletes everything seed() and the load test runs created.
+    """
+    like_aircraft = PREFIX + "-%"
+    like_user = "%@" + USER_DOMAIN
+    with db_cursor() as (db, cur):
+        cur.execute("SELECT FLIGHT_NUM FROM FLIGHT WHERE AIRCRAFT_ID LIKE %s", (like_aircraft,))
+        flight_nums = [r["FLIGHT_NUM"] for r in cur.fetchall()]
+        cur.execute("""
+            SELECT o.O_ID, o.O_DATE, o.O_STATUS, o.CANACELATION_DATE_TIME, s.CLASS
+            FROM F_ORDER o
+            LEFT JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+            LEFT JOIN SEAT s
+              ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+             AND s.ROW_NUM = os.ROW_NUM
+             AND s.COL_LETTER = os.COL_LETTER
+            WHERE o.R_MAIL LIKE %s AND o.O_DATE IS NOT NULL
+        """, (like_user,))
+        removed = {}
+        for r in cur.fetchall():
+            o = removed.setdefault(r["O_ID"], (r["O_DATE"], set(), r["O_STATUS"] == "CUSTOMER_CANCELLED"
+                                               and r["CANACELATION_DATE_TIME"] is not None))
+            if r["CLASS"]:
+                o[1].add(r["CLASS"])
+        facts = FactDeltas()
+        for o_date, classes, cancelled in removed.values():
+            facts.order_removed(o_date, classes, cancelled)
+
+        db.start_transaction()
+        statements = [
+            ("DELETE os FROM ORDER_SEAT os JOIN F_ORDER o ON o.O_ID = os.O_ID WHERE o.R_MAIL LIKE %s", like_user),
+            ("DELETE FROM F_ORDER WHERE R_MAIL LIKE %s", like_user),
+            ("DELETE FROM REGISTER_PHONE WHERE R_MAIL LIKE %s", like_user),
+            ("DELETE FROM REGISTER WHERE R_MAIL LIKE %s", like_user),
+            ("DELETE h FROM SEAT_HOLD h JOIN FLIGHT f ON f.FLIGHT_NUM = h.FLIGHT_NUM WHERE f.AIRCRAFT_ID LIKE %s",
+             like_aircraft),
+            ("DELETE occ FROM FLIGHT_OCCUPANCY occ JOIN FLIGHT f ON f.FLIGHT_NUM = occ.FLIGHT_NUM "
+             "WHERE f.AIRCRAFT_ID LIKE %s", like_aircraft),
+            ("DELETE FROM AIRCRAFT_MONTH_FACT WHERE AIRCRAFT_ID LIKE %s", like_aircraft),
+            ("DELETE FROM FLIGHT WHERE AIRCRAFT_ID LIKE %s", like_aircraft),
+            ("DELETE FROM SEAT WHERE AIRCRAFT_ID LIKE %s", like_aircraft),
+            ("DELETE FROM AIRCRAFT WHERE AIRCRAFT_ID LIKE %s", like_aircraft),
+            ("DELETE FROM ROUTE WHERE ORIGIN LIKE %s", PREFIX + " City %"),
+        ]
+        for sql, param in statements:
+            cur.execute(sql, (param,))
+        refresh_facts(cur, flight_nums)
+        facts.write(cur)
+        db.commit()
+    return len(flight_nums)
+
+
+# ------------------------------------------------------------
+# Clients: the funnel runs against the app in this process
+# (Flask test client) or against a running server over HTTP.
+# ------------------------------------------------------------
+
+class _AppClient:
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, data=None):
+        if method == "GET":
+            r = self._client.get(path, query_string=data)
+        else:
+            r = self._client.post(path, data=data)
+        return r.status_code, r.headers.get("Location", ""), r.get_data(as_text=True), r.headers.get("X-DB-Queries")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _HttpClient:
+    def __init__(self, base_url):
+        self._base = base_url.rstrip("/")
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        query = urllib.parse.urlencode(data or {}, doseq=True)
+        url = self._base + path
+        body = None
+        if method == "GET" and query:
+            url += "?" + query
+        elif method == "POST":
+            body = query.encode()
+        try:
+            with self._opener.open(urllib.request.Request(url, data=body, method=method), timeout=30) as r:
+                return r.status, "", r.read().decode("utf-8", "replace"), r.headers.get("X-DB-Queries")
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Location", ""), "", e.headers.get("X-DB-Queries")
+
+
+class RunStats:
+    """
+    Latencies per funnel step and outcome counters, shared by all virtual users.
+    """
+
+    def __init__(self):
+        self.latencies = {name: [] for name in STEPS}
+        self.counters = {"funnels": 0, "orders": 0, "cancellations": 0, "errors": 0,
+                         "seat_conflicts": 0, "checkout_failed": 0}
+        self.db_queries = 0           # sum of the X-DB-Queries response headers
+        self.db_queries_counted = 0   # responses that had the header
+        self._lock = threading.Lock()
+
+    def add(self, step, seconds, db_queries=None):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            if db_queries is not None:
+                self.db_queries += int(db_queries)
+                self.db_queries_counted += 1
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def _step(client, stats, step, method, path, data=None):
+    started = time.perf_counter()
+    try:
+        status, location, body, db_queries = client.request(method, path, data)
+    except Exception:
+        stats.add(step, time.perf_counter() - started)
+        stats.count("errors")
+        return None
+    stats.add(step, time.perf_counter() - started, db_queries)
+    if status >= 500:
+        stats.count("errors")
+        return None
+    return status, location, body
+
+
+def _funnel(client, rng, targets, stats, cancel_rate, max_passengers):
+    """
+    One customer visit: search, pick seats, pay, look at the orders, maybe cancel.
+    """
+    t = rng.choice(targets)
+    passengers = rng.randint(1, max_passengers)
+
+    if not _step(client, stats, "flight_search", "POST", "/flights/search", {
+        "origin": t["ORIGIN"], "destination": t["DESTINATION"],
+        "departure_date": t["DEPARTURE_DATE"].isoformat(), "passengers": passengers,
+    }):
+        return
+    seats_path = f"/flight/{t['FLIGHT_NUM']}/seats"
+    if not _step(client, stats, "seat_select GET", "GET", seats_path, {"passengers": passengers}):
+        return
+
+    picked = rng.sample(t["seats"], min(passengers, len(t["seats"])))
+    r = _step(client, stats, "seat_select POST", "POST", seats_path, {"seat": picked})
+    if not r:
+        return
+    if "/checkout" not in r[1]:
+        stats.count("seat_conflicts")
+        return
+
+    if not _step(client, stats, "checkout GET", "GET", "/checkout"):
+        return
+    r = _step(client, stats, "checkout POST", "POST", "/checkout", {})
+    if not r:
+        return
+    m = re.search(r"Order ID: <b>(\w+)</b>", r[2])
+    if not m:
+        stats.count("checkout_failed")
+        return
+    stats.count("orders")
+
+    if not _step(client, stats, "my_orders", "GET", "/my_orders"):
+        return
+    if rng.random() < cancel_rate:
+        cancel_path = f"/orders/cancel/{m.group(1)}"
+        if _step(client, stats, "cancel_order GET", "GET", cancel_path) and \
+                _step(client, stats, "cancel_order POST", "POST", cancel_path, {}):
+            stats.count("cancellations")
+    stats.count("funnels")
+
+
+def load_targets():
+    """
+    Future ACTIVE load-test flights with the seat codes of their aircraft,
+    and the number of seeded users.
+    """
+    with db_cursor() as (db, cur):
+        cur.execute("""
+            SELECT f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, r.ORIGIN, r.DESTINATION
+            FROM FLIGHT f
+            JOIN ROUTE r ON r.ROUTE_ID = f.ROUTE_ID AND r.DURATION = f.DURATION
+            WHERE f.AIRCRAFT_ID LIKE %s
+              AND f.FLIGHT_STATUS = 'ACTIVE'
+              AND f.DEPARTURE_DT > NOW() + INTERVAL 1 DAY
+        """, (PREFIX + "-%",))
+        targets = cur.fetchall()
+        cur.execute("SELECT AIRCRAFT_ID, ROW_NUM, COL_LETTER FROM SEAT WHERE AIRCRAFT_ID LIKE %s", (PREFIX + "-%",))
+        seats = {}
+        for s in cur.fetchall():
+            seats.setdefault(s["AIRCRAFT_ID"], []).append(f"{s['ROW_NUM']}{s['COL_LETTER']}")
+        cur.execute("SELECT COUNT(*) AS n FROM `REGISTER` WHERE R_MAIL LIKE %s", ("%@" + USER_DOMAIN,))
+        user_count = cur.fetchone()["n"]
+    for t in targets:
+        t["seats"] = seats.get(t["AIRCRAFT_ID"], [])
+    return [t for t in targets if t["seats"]], user_count
+
+
+def _questions():
+    with db_cursor() as (db, cur):
+        cur.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+        return int(cur.fetchone()["Value"])
+
+
+def oversold_seats():
+    """
+    Seats that belong to more than one ACTIVE/COMPLETED order of the same flight (must be 0).
+    """
+    with db_cursor() as (db, cur):
+        cur.execute("""
+            SELECT COUNT(*) AS n FROM (
+                SELECT o.FLIGHT_NUM, os.ROW_NUM, os.COL_LETTER
+                FROM F_ORDER o
+                JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+                JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+                WHERE f.AIRCRAFT_ID LIKE %s
+                  AND o.O_STATUS IN ('ACTIVE','COMPLETED')
+                GROUP BY o.FLIGHT_NUM, os.ROW_NUM, os.COL_LETTER
+                HAVING COUNT(*) > 1
+            ) dup
+        """, (PREFIX + "-%",))
+        return cur.fetchone()["n"]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = math.ceil(p / 100 * len(sorted_values)) - 1   # nearest rank
+    return sorted_values[max(0, min(k, len(sorted_values) - 1))]
+
+
+def run(users, duration, base_url=None, seed_value=1, cancel_rate=0.3, max_passengers=3, think=0.0):
+    """
+    Runs `users` virtual users through the booking funnel for `duration` seconds.
+    Each user logs in as one of the seeded registered users and repeats the funnel.
+    Returns a summary dict (latency percentiles per step, throughput, counters).
+    """
+    targets, user_count = load_targets()
+    if not targets or not user_count:
+        raise SystemExit("No load-test flights or users found. Run: python loadtest.py seed")
+
+    if base_url:
+        make_client = lambda: _HttpClient(base_url)
+    else:
+        from app import app
+        from search import invalidate_route_directory
+        invalidate_route_directory()   # pick up the seeded routes
+        make_client = lambda: _AppClient(app)
+
+    stats = RunStats()
+    stop_at = time.monotonic() + duration
+
+    def virtual_user(n):
+        rng = random.Random(seed_value * 100003 + n)
+        client = make_client()
+        email = f"user{n % user_count}@{USER_DOMAIN}"
+        client.request("POST", "/login", {"email": email, "password": USER_PASSWORD})
+        while time.monotonic() < stop_at:
+            _funnel(client, rng, targets, stats, cancel_rate, max_passengers)
+            if think:
+                time.sleep(rng.uniform(0, 2 * think))
+
+    questions_before = _questions()
+    started = time.monotonic()
+    threads = [threading.Thread(target=virtual_user, args=(n,), daemon=True) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    questions = _questions() - questions_before
+
+    requests_total = sum(len(v) for v in stats.latencies.values())
+    if stats.db_queries_counted:
+        queries_per_request = stats.db_queries / stats.db_queries_counted
+    else:
+        # server without the X-DB-Queries header: MySQL's global counter (includes other clients)
+        queries_per_request = questions / requests_total if requests_total else 0.0
+    steps = {}
+    for name, values in stats.latencies.items():
+        values.sort()
+        steps[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round((values[-1] if values else 0.0) * 1000, 2),
+        }
+
+    return {
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "requests": requests_total,
+        "requests_per_second": round(requests_total / elapsed, 2) if elapsed else 0.0,
+        "orders_per_second": round(stats.counters["orders"] / elapsed, 2) if elapsed else 0.0,
+        "db_queries_per_request": round(queries_per_request, 2),
+        "oversold_seats": oversold_seats(),
+        **stats.counters,
+        "steps": steps,
+    }
+
+
+# ------------------------------------------------------------
+# Read-path benchmark: many concurrent keep-alive connections on
+# the read-heavy pages, to compare serving modes per CPU core
+# (e.g. gunicorn app:app against hypercorn asgi:application).
+# ------------------------------------------------------------
+
+BENCH_PAGES = ["flight_search", "seat_select GET", "my_orders", "manager_flights"]
+
+
+class _RawHttpConnection:
+    """
+    Minimal HTTP/1.1 keep-alive client on asyncio streams, with its own cookies.
+    Cheap enough that one client process can hold thousands of connections.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, data=None):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        body = urllib.parse.urlencode(data or {}, doseq=True).encode() if method == "POST" else b""
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        if method == "POST":
+            head.append("Content-Type: application/x-www-form-urlencoded")
+        if self.cookies:
+            head.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        self._writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self._reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            name, value = name.strip().lower(), value.strip()
+            if name == "set-cookie":
+                key, _, rest = value.partition("=")
+                cookie_value = rest.split(";", 1)[0]
+                if cookie_value:
+                    self.cookies[key] = cookie_value
+                else:
+                    self.cookies.pop(key, None)
+            headers[name] = value
+
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self._reader.readline()).split(b";")[0], 16)
+                await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self._reader.readexactly(int(headers.get("content-length", 0)))
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+async def _bench_connection(n, host, port, targets, user_count, manager, stop_at, latencies, counters):
+    """
+    One client connection: logs in (every 4th one as the manager, if given), then requests
+    read pages back to back until stop_at.
+    """
+    rng = random.Random(n)
+    conn = _RawHttpConnection(host, port)
+    try:
+        if manager and n % 4 == 3:
+            await conn.request("POST", "/manager/login", {"manager_id": manager[0], "password": manager[1]})
+            pages = ["manager_flights"]
+        else:
+            email = f"user{n % user_count}@{USER_DOMAIN}"
+            await conn.request("POST", "/login", {"email": email, "password": USER_PASSWORD})
+            pages = ["flight_search", "seat_select GET", "my_orders"]
+
+        while time.monotonic() < stop_at:
+            page = rng.choice(pages)
+            t = rng.choice(targets)
+            passengers = rng.randint(1, 3)
+            started = time.perf_counter()
+            if page == "flight_search":
+                status = await conn.request("POST", "/flights/search", {
+                    "origin": t["ORIGIN"], "destination": t["DESTINATION"],
+                    "departure_date": t["DEPARTURE_DATE"].isoformat(), "passengers": passengers,
+                })
+            elif page == "seat_select GET":
+                status = await conn.request("GET", f"/flight/{t['FLIGHT_NUM']}/seats?passengers={passengers}")
+            elif page == "my_orders":
+                status = await conn.request("GET", "/my_orders")
+            else:
+                status = await conn.request("GET", "/manager/flights?" + urllib.parse.urlencode(
+                    {"date": t["DEPARTURE_DATE"].isoformat()}))
+            latencies[page].append(time.perf_counter() - started)
+            if status >= 500:
+                counters["errors"] += 1
+    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+        counters["errors"] += 1
+        counters["dropped_connections"] += 1
+    finally:
+        conn.close()
+
+
+def bench(base_url, connections, duration, server_cores=1, manager=None):
+    """
+    Holds `connections` concurrent keep-alive connections on the read-heavy pages of a
+    running server for `duration` seconds. Returns throughput (total and per server core)
+    and latency percentiles per page.
+    """
+    targets, user_count = load_targets()
+    if not targets or not user_count:
+        raise SystemExit("No load-test flights or users found. Run: python loadtest.py seed")
+
+    url = urllib.parse.urlsplit(base_url)
+    latencies = {name: [] for name in BENCH_PAGES}
+    counters = {"errors": 0, "dropped_connections": 0}
+
+    async def main():
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(*[
+            _bench_connection(n, url.hostname, url.port or 80, targets, user_count, manager,
+                              stop_at, latencies, counters)
+            for n in range(connections)
+        ])
+
+    started = time.monotonic()
+    asyncio.run(main())
+    elapsed = time.monotonic() - started
+
+    requests_total = sum(len(v) for v in latencies.values())
+    rps = requests_total / elapsed if elapsed else 0.0
+    steps = {}
+    for name, values in latencies.items():
+        values.sort()
+        steps[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round((values[-1] if values else 0.0) * 1000, 2),
+        }
+    return {
+        "connections": connections,
+        "server_cores": server_cores,
+        "seconds": round(elapsed, 2),
+        "requests": requests_total,
+        "requests_per_second": round(rps, 2),
+        "requests_per_second_per_core": round(rps / server_cores, 2),
+        **counters,
+        "steps": steps,
+    }
+
+
+def print_summary(summary):
+    print(f"{'step':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in summary["steps"].items():
+        print(f"{name:<20}{s['count']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+    for key, value in summary.items():
+        if key != "steps":
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed data and load-test the booking funnel.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="write a synthetic data set")
+    p_seed.add_argument("--scale", choices=sorted(SCALES), default="small")
+    p_seed.add_argument("--seed", type=int, default=1)
+    for key in SCALES["small"]:
+        p_seed.add_argument("--" + key.replace("_", "-"), type=int, help=f"override the scale's {key}")
+
+    p_run = sub.add_parser("run", help="drive the funnel with concurrent virtual users")
+    p_run.add_argument("--users", type=int, default=20)
+    p_run.add_argument("--duration", type=float, default=60, help="seconds")
+    p_run.add_argument("--url", help="base URL of a running server (default: the app in this process)")
+    p_run.add_argument("--seed", type=int, default=1)
+    p_run.add_argument("--cancel-rate", type=float, default=0.3)
+    p_run.add_argument("--max-passengers", type=int, default=3)
+    p_run.add_argument("--think", type=float, default=0.0, help="average pause between funnels (seconds)")
+    p_run.add_argument("--json", help="also write the summary to this file")
+    p_run.add_argument("--max-p95-ms", type=float, help="exit with status 1 if any step's p95 is above this")
+
+    p_bench = sub.add_parser("bench", help="read-path throughput with many concurrent connections")
+    p_bench.add_argument("--url", required=True, help="base URL of the server under test")
+    p_bench.add_argument("--connections", type=int, default=200)
+    p_bench.add_argument("--duration", type=float, default=30, help="seconds")
+    p_bench.add_argument("--server-cores", type=int, default=1, help="CPU cores the server may use")
+    p_bench.add_argument("--manager", help="ID:PASSWORD of a manager, to include the manager flight board")
+    p_bench.add_argument("--json", help="also write the summary to this file")
+
+    sub.add_parser("clean", help="delete all load-test data")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        scale = dict(SCALES[args.scale])
+        for key in scale:
+            value = getattr(args, key)
+            if value is not None:
+                scale[key] = value
+        print(seed(scale, random.Random(args.seed)))
+
+    elif args.command == "clean":
+        print(f"Removed {clean()} load-test flights.")
+
+    elif args.command == "bench":
+        manager = args.manager.split(":", 1) if args.manager else None
+        summary = bench(args.url, args.connections, args.duration, args.server_cores, manager)
+        print_summary(summary)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(summary, fh, indent=2)
+
+    else:
+        summary = run(args.users, args.duration, args.url, args.seed,
+                      args.cancel_rate, args.max_passengers, args.think)
+        print_summary(summary)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(summary, fh, indent=2)
+
+        failed = summary["errors"] or summary["oversold_seats"]
+        if args.max_p95_ms is not None:
+            failed = failed or any(s["p95_ms"] > args.max_p95_ms for s in summary["steps"].values())
+        sys.exit(1 if failed else 0)
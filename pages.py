@@ -0,0 +1,272 @@
+from datetime import datetime
+
+from search import SEARCH_FLEX_DAYS, connecting_itineraries_steps, fare_calendar_steps, route_directory_steps
+from seating import held_by_others_steps, occupancy_steps, order_seats_steps, seat_map_steps
+
+
+# Data of the read-only pages (flight search, seat map, my orders, manager flight board)
+# as query steps (see db.run_steps), shared by the Flask app and the async app (asgi.py).
+
+ORDERS_PAGE_SIZE = 20
+ORDER_STATUSES = ("ACTIVE", "COMPLETED", "CUSTOMER_CANCELLED", "SYSTEM_CANCELLED")
+
+
+def order_cursor(order):
+    """
+    Paging cursor of an order row: its departure time and order id, e.g. '20250601103000-O12'.
+    """
+    return f"{order['DEPARTURE_DT']:%Y%m%d%H%M%S}-{order['O_ID']}"
+
+
+def parse_order_cursor(value):
+    """
+    Turns an order_cursor() string back into (departure datetime, order id), or None.
+    """
+    try:
+        stamp, o_id = (value or "").split("-", 1)
+        return datetime.strptime(stamp, "%Y%m%d%H%M%S"), o_id
+    except ValueError:
+        return None
+
+
+def parse_passengers(value):
+    """
+    Number of passengers from a form/query value, or None if it is not a positive number.
+    """
+    try:
+        passengers = int((value or "").strip())
+    except ValueError:
+        return None
+    return passengers if passengers > 0 else None
+
+
+def parse_search_form(form):
+    """
+    Checks the flight search form.
+    Returns (error message, None) or (None, values) with origin, destination, date and passengers.
+    """
+    dep_date = form.get("departure_date", "").strip()
+    origin = form.get("origin", "").strip()
+    destination = form.get("destination", "").strip()
+    passengers_raw = form.get("passengers", "").strip()
+
+    if not dep_date or not origin or not destination or not passengers_raw:
+        return "Please fill in all fields to search flights.", None
+
+    if origin.casefold() == destination.casefold():
+        return "Origin and destination must be different cities.", None
+
+    passengers = parse_passengers(passengers_raw)
+    if passengers is None:
+        return "Passengers must be a positive number.", None
+
+    try:
+        center = datetime.strptime(dep_date, "%Y-%m-%d").date()
+    except ValueError:
+        return "Invalid departure date.", None
+
+    return None, {"origin": origin, "destination": destination, "departure_date": dep_date,
+                  "center": center, "passengers": passengers}
+
+
+def search_page_steps(search):
+    """
+    Results of a checked search (see parse_search_form): the fare calendar around the date
+    for a direct route, else connecting itineraries.
+    Returns a dict for flight_results.html; "error" means redirect back to the search page,
+    "notice" is shown above the results.
+    """
+    directory = yield from route_directory_steps()
+    page = {"flights": None, "error": None, "notice": None}
+
+    if directory.route(search["origin"], search["destination"]) is None:
+        itineraries = yield from connecting_itineraries_steps(
+            search["origin"], search["destination"], search["center"], search["passengers"]
+        )
+        if not itineraries:
+            page["error"] = "No flights exist for these routes. Try other destinations."
+        page["itineraries"] = itineraries
+        return page
+
+    calendar = yield from fare_calendar_steps(
+        search["origin"], search["destination"], search["center"], SEARCH_FLEX_DAYS, search["passengers"]
+    )
+    flights = []
+    for day in calendar:
+        if day["date"] == search["center"]:
+            flights = day["flights"]
+
+    if not any(day["flights"] for day in calendar):
+        page["error"] = "No active flights on this date or the days around it. Try another date."
+    elif not flights:
+        page["notice"] = "No active flights on this date. See the nearby dates below."
+    page["flights"] = flights
+    page["calendar"] = calendar
+    return page
+
+
+def seat_page_steps(flight_num, hold_id):
+    """
+    Seat map page of an ACTIVE flight: the flight row, its SeatMap and the seats that are
+    sold or held by other buyers. Returns None if the flight cannot be booked.
+    """
+    rows = yield """
+        SELECT
+          f.FLIGHT_NUM, f.AIRCRAFT_ID, f.FLIGHT_STATUS,
+          f.DEPARTURE_DATE, f.DEPARTURE_TIME,
+          f.ARRIVAL_DATE, f.ARRIVAL_TIME,
+          f.DURATION, f.ECONOMY_PRICE, f.BUSINESS_PRICE,
+          a.SIZE AS AIRCRAFT_SIZE,
+          a.MANUFACTURER AS MANUFACTURER,
+          r.ORIGIN, r.DESTINATION
+        FROM FLIGHT f
+        JOIN AIRCRAFT a ON f.AIRCRAFT_ID = a.AIRCRAFT_ID
+        JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+        WHERE f.FLIGHT_NUM = %s
+    """, (flight_num,)
+    flight = rows[0] if rows else None
+    if not flight or flight["FLIGHT_STATUS"] != "ACTIVE":
+        return None
+
+    seat_map = yield from seat_map_steps(flight["AIRCRAFT_ID"])
+    if not seat_map:
+        return None
+
+    occupied = yield from occupancy_steps(flight_num, seat_map)
+    occupied |= yield from held_by_others_steps(flight_num, hold_id)
+    return {"flight": flight, "seat_map": seat_map, "occupied": occupied}
+
+
+def guest_order_steps(order_id, email):
+    """
+    An ACTIVE guest order with its seats, found by order id and email, or None.
+    """
+    rows = yield """
+        SELECT
+          o.O_ID, o.O_DATE, o.ORDER_PRICE, o.O_STATUS,
+          o.G_MAIL, g.E_FIRST_NAME, g.E_LAST_NAME,
+          f.FLIGHT_NUM, r.ORIGIN, r.DESTINATION,
+          f.DEPARTURE_DATE, f.DEPARTURE_TIME,
+          f.ARRIVAL_DATE, f.ARRIVAL_TIME
+        FROM F_ORDER o
+        JOIN FLIGHT f ON o.FLIGHT_NUM = f.FLIGHT_NUM
+        JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+        JOIN GUEST g ON o.G_MAIL = g.G_MAIL
+        WHERE o.O_ID=%s AND o.G_MAIL=%s AND o.O_STATUS='ACTIVE'
+        LIMIT 1
+    """, (order_id, email)
+    if not rows:
+        return None
+
+    order = rows[0]
+    seats = yield from order_seats_steps([order["O_ID"]])
+    order["seats"] = seats[order["O_ID"]]
+    return order
+
+
+def registered_orders_steps(r_mail, status, after=None, before=None):
+    """
+    One page of a registered user's orders (optionally only one status), with their seats.
+    Returns {"orders", "prev_cursor", "next_cursor"}.
+    """
+    # keyset paging on (departure, order id): ?after= / ?before= hold the edge row of the
+    # current page. F_ORDER keeps its own copy of the departure time, so the rows are read
+    # in order from IDX_ORDER_REGISTER_(STATUS_)DEPARTURE and only one page is joined;
+    # sorting on FLIGHT's column would sort the user's whole order history per page
+    q = """
+        SELECT
+          o.O_ID, o.O_DATE, o.ORDER_PRICE, o.O_STATUS,
+          reg.E_FIRST_NAME, reg.E_LAST_NAME,
+          f.FLIGHT_NUM, rt.ORIGIN, rt.DESTINATION,
+          f.DEPARTURE_DATE, f.DEPARTURE_TIME, o.DEPARTURE_DT,
+          f.ARRIVAL_DATE, f.ARRIVAL_TIME
+        FROM F_ORDER o
+        JOIN `REGISTER` reg ON o.R_MAIL = reg.R_MAIL
+        JOIN FLIGHT f ON o.FLIGHT_NUM = f.FLIGHT_NUM
+        JOIN ROUTE rt ON f.ROUTE_ID = rt.ROUTE_ID AND f.DURATION = rt.DURATION
+        WHERE o.R_MAIL=%s
+    """
+    params = [r_mail]
+
+    if status:
+        q += " AND o.O_STATUS=%s"
+        params.append(status)
+
+    if after:
+        q += " AND (o.DEPARTURE_DT > %s OR (o.DEPARTURE_DT = %s AND o.O_ID > %s))"
+        params += [after[0], after[0], after[1]]
+        q += " ORDER BY o.DEPARTURE_DT ASC, o.O_ID ASC"
+    elif before:
+        q += " AND (o.DEPARTURE_DT < %s OR (o.DEPARTURE_DT = %s AND o.O_ID < %s))"
+        params += [before[0], before[0], before[1]]
+        q += " ORDER BY o.DEPARTURE_DT DESC, o.O_ID DESC"
+    else:
+        q += " ORDER BY o.DEPARTURE_DT ASC, o.O_ID ASC"
+    q += " LIMIT %s"
+    params.append(ORDERS_PAGE_SIZE + 1)   # one extra row tells whether there is another page
+
+    orders = list((yield q, tuple(params)))
+
+    more = len(orders) > ORDERS_PAGE_SIZE
+    orders = orders[:ORDERS_PAGE_SIZE]
+    if before:
+        orders.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = bool(after), more
+
+    seats_by_order = yield from order_seats_steps([o["O_ID"] for o in orders])
+    for o in orders:
+        seats = seats_by_order[o["O_ID"]]
+        o["seats"] = seats
+        o["seat_count"] = len(seats)
+        o["seat_summary"] = ", ".join([f"{s['seat_code']} ({s['seat_class']})" for s in seats])
+
+    return {
+        "orders": orders,
+        "prev_cursor": order_cursor(orders[0]) if orders and has_prev else None,
+        "next_cursor": order_cursor(orders[-1]) if orders and has_next else None,
+    }
+
+
+def manager_flights_steps(f_date="", f_status="", f_origin="", f_dest=""):
+    """
+    Flights of the manager flight board, filtered by date/status/origin/destination.
+    """
+    where = []
+    params = []
+
+    if f_date:
+        where.append("f.DEPARTURE_DATE=%s")
+        params.append(f_date)
+    if f_status:
+        where.append("f.FLIGHT_STATUS=%s")
+        params.append(f_status)
+    if f_origin:
+        where.append("r.ORIGIN=%s")
+        params.append(f_origin)
+    if f_dest:
+        where.append("r.DESTINATION=%s")
+        params.append(f_dest)
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    flights = yield f"""
+        SELECT
+          f.FLIGHT_NUM,
+          f.AIRCRAFT_ID,
+          a.SIZE AS AIRCRAFT_SIZE,
+          f.FLIGHT_STATUS,
+          f.DEPARTURE_DATE, f.DEPARTURE_TIME,
+          f.ARRIVAL_DATE, f.ARRIVAL_TIME,
+          f.ECONOMY_PRICE,
+          f.BUSINESS_PRICE,
+          r.ORIGIN,
+          r.DESTINATION
+        FROM FLIGHT f
+        JOIN AIRCRAFT a ON f.AIRCRAFT_ID = a.AIRCRAFT_ID
+        JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+        {where_sql}
+        ORDER BY f.DEPARTURE_DATE, f.DEPARTURE_TIME
+    """, tuple(params)
+    return flights
@@ -0,0 +1,183 @@
+import argparse
+import csv
+import io
+import sys
+from datetime import date
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # optional: without pyarrow only CSV exports are offered
+    pa = None
+    pq = None
+
+from db import get_db_connection
+from reports import REPORT_QUERIES, report_filters
+
+
+EXPORT_BATCH = 2000   # rows read from the server (and written to the response) at a time
+
+# columns of each report, in SELECT order, with their type in the Parquet file
+EXPORT_COLUMNS = {
+    "r1": [("avg_occupancy", "float")],
+    "r2": [("SIZE", "string"), ("MANUFACTURER", "string"), ("CLASS", "string"), ("revenue", "float")],
+    "r3": [("employee_type", "string"), ("employee_id", "string"), ("flight_type", "string"),
+           ("total_hours", "float")],
+    "r4": [("year", "int"), ("month", "int"), ("cancel_rate_percent", "float")],
+    "r5": [("AIRCRAFT_ID", "string"), ("MANUFACTURER", "string"), ("year", "int"), ("month", "int"),
+           ("completed_flights", "int"), ("cancelled_flights", "int"), ("utilization_percent", "float"),
+           ("origin", "string"), ("destination", "string")],
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_formats():
+    """
+    The export formats this install can write (Parquet needs pyarrow).
+    """
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or pa is not None]
+
+
+def export_filename(report_id, fmt):
+    return f"flytau_{report_id}_{date.today().isoformat()}.{fmt}"
+
+
+def _row_batches(report_id, filters):
+    """
+    Runs the report query on an unbuffered cursor (rows stay on the server until read)
+    and yields them EXPORT_BATCH tuples at a time.
+    """
+    sql, params = REPORT_QUERIES[report_id](filters)
+    db = get_db_connection()
+    cur = db.cursor(buffered=False)
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            # a download stopped half-way leaves unread rows; read them off so the
+            # connection goes back to the pool clean
+            while cur.fetchmany(EXPORT_BATCH):
+                pass
+        except Exception:
+            pass
+        cur.close()
+        db.close()
+
+
+def _csv_chunks(columns, batches):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in columns])
+    for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Write-only file object for pyarrow: keeps the written bytes until take() hands them on.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_value(value, kind):
+    if value is None:
+        return None
+    if kind == "float":
+        return float(value)
+    if kind == "int":
+        return int(value)
+    return str(value)
+
+
+def _parquet_chunks(columns, batches):
+    types = {"float": pa.float64(), "int": pa.int64(), "string": pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in batches:
+            arrays = [
+                pa.array([_parquet_value(row[i], kind) for row in rows], type=types[kind])
+                for i, (_, kind) in enumerate(columns)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))   # one row group per batch
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_report(report_id, filters, fmt="csv"):
+    """
+    Streams one report (r1..r5, same filters as the reports page) as CSV or Parquet bytes.
+    Only one batch of rows is in memory at a time; the cache is not used.
+    """
+    if report_id not in REPORT_QUERIES:
+        raise ValueError(f"unknown report {report_id}")
+    if fmt not in export_formats():
+        raise ValueError(f"export format {fmt} is not available")
+
+    columns = EXPORT_COLUMNS[report_id]
+    batches = _row_batches(report_id, filters)
+    if fmt == "parquet":
+        return _parquet_chunks(columns, batches)
+    return _csv_chunks(columns, batches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export one manager report as CSV or Parquet.")
+    parser.add_argument("report", choices=sorted(REPORT_QUERIES))
+    parser.add_argument("--format", default="csv", choices=sorted(EXPORT_FORMATS))
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    parser.add_argument("filters", nargs="*", help="report filters as name=value, e.g. r2_from=2024-01-01")
+    args = parser.parse_args()
+
+    values = dict(f.split("=", 1) for f in args.filters)
+    _, filters = report_filters(values)
+    chunks = export_report(args.report, filters, args.format)
+
+    if args.output:
+        with open(args.output, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+    else:
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
@@ -0,0 +1,782 @@
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from db import db_cursor
+
+
+REPORT_CACHE_TTL = 300     # seconds a cached report stays valid
+REPORT_BOOKING_TTL = 30    # seconds a cached report stays valid once orders were placed or cancelled after it
+REPORT_CACHE_SIZE = 256    # most cached reports kept (least recently used are dropped)
+
+# filters of each report, as they arrive in the query string
+REPORT_FILTERS = {
+    "r1": ["r1_from", "r1_to"],
+    "r2": ["r2_from", "r2_to", "r2_class", "r2_manufacturer", "r2_size", "r2_sort"],
+    "r3": ["r3_role", "r3_emp", "r3_flight_type", "r3_sort"],
+    "r4": ["r4_from", "r4_to", "r4_class", "r4_sort"],
+    "r5": ["r5_from", "r5_to", "r5_aircraft", "r5_manufacturer", "r5_origin", "r5_destination"],
+}
+
+# allowed values of the choice filters; the first one is the default
+_CHOICES = {
+    "r2_class": ["", "ECONOMY", "BUSINESS"],
+    "r2_size": ["", "SMALL", "BIG"],
+    "r2_sort": ["DESC", "ASC"],
+    "r3_role": ["", "PILOT", "ATTENDANT"],
+    "r3_flight_type": ["", "SHORT", "LONG"],
+    "r3_sort": ["DESC", "ASC"],
+    "r4_class": ["", "ECONOMY", "BUSINESS"],
+    "r4_sort": ["ASC", "DESC"],
+}
+
+
+def parse_date(s):
+    if not s:
+        return None
+    try:
+        return date.fromisoformat(s)
+    except Exception:
+        return None
+
+
+def parse_month(s):
+    if not s:
+        return None
+    try:
+        y, m = s.split("-")
+        return int(y), int(m)
+    except Exception:
+        return None
+
+
+def month_start_end(ym_from, ym_to):
+    """
+    Turns a (year, month) range into first day / last day dates.
+    """
+    if not ym_from and not ym_to:
+        return None, None
+
+    if ym_from:
+        y, m = ym_from
+        start = date(y, m, 1)
+    else:
+        start = date(1900, 1, 1)
+
+    if ym_to:
+        y, m = ym_to
+
+        if m == 12:
+            end = date(y, 12, 31)
+        else:
+            end = date(y, m + 1, 1) - timedelta(days=1)
+    else:
+        end = date(2100, 12, 31)
+
+    return start, end
+
+
+def report_filters(args):
+    """
+    Reads the active report and all report filters from the query string,
+    with the choice filters (class, size, sort...) forced to allowed values.
+    """
+    active_report = (args.get("active_report", "r1") or "").strip() or "r1"
+    if active_report not in REPORT_FILTERS:
+        active_report = "r1"
+
+    filters = {}
+    for names in REPORT_FILTERS.values():
+        for name in names:
+            value = (args.get(name, "") or "").strip()
+            if name in _CHOICES:
+                value = value.upper()
+                if value not in _CHOICES[name]:
+                    value = _CHOICES[name][0]
+            filters[name] = value
+    return active_report, filters
+
+
+def _cache_key(report_id, filters):
+    """
+    Cache key of one report: only its own filters, with dates/months in one canonical form
+    (so "2025-1" and "2025-01" share an entry, and invalid dates count as empty).
+    """
+    key = [report_id]
+    for name in REPORT_FILTERS[report_id]:
+        value = filters[name]
+        if name.endswith("_from") or name.endswith("_to"):
+            if report_id in ("r1", "r2"):
+                d = parse_date(value)
+                value = d.isoformat() if d else ""
+            else:
+                ym = parse_month(value)
+                value = f"{ym[0]:04d}-{ym[1]:02d}" if ym else ""
+        key.append(value)
+    return tuple(key)
+
+
+def _query_r1(filters):
+    """
+    Average occupancy of COMPLETED flights (0..1), optionally by departure date range.
+    Reads FLIGHT_FACT (one pre-counted row per flight).
+    """
+    d1 = parse_date(filters["r1_from"])
+    d2 = parse_date(filters["r1_to"])
+
+    where = ["ff.FLIGHT_STATUS = 'COMPLETED'"]
+    params = []
+
+    if d1:
+        where.append("ff.DEPARTURE_DATE >= %s")
+        params.append(d1.isoformat())
+    if d2:
+        where.append("ff.DEPARTURE_DATE <= %s")
+        params.append(d2.isoformat())
+
+    q1 = f"""
+        SELECT AVG(ff.SEATS_COMPLETED / ff.CAPACITY) AS avg_occupancy
+        FROM FLIGHT_FACT ff
+        WHERE {" AND ".join(where)}
+    """
+    return q1, tuple(params)
+
+
+def _query_r2(filters):
+    """
+    Revenue by aircraft size, manufacturer and seat class (cancellation fees included).
+    Reads the per flight/class revenue in FLIGHT_CLASS_FACT.
+    """
+    d1 = parse_date(filters["r2_from"])
+    d2 = parse_date(filters["r2_to"])
+
+    where = ["ff.FLIGHT_STATUS <> 'CANCELLED'"]
+    params = []
+
+    if d1:
+        where.append("ff.DEPARTURE_DATE >= %s")
+        params.append(d1.isoformat())
+    if d2:
+        where.append("ff.DEPARTURE_DATE <= %s")
+        params.append(d2.isoformat())
+
+    if filters["r2_class"]:
+        where.append("c.CLASS = %s")
+        params.append(filters["r2_class"])
+
+    if filters["r2_manufacturer"]:
+        where.append("a.MANUFACTURER = %s")
+        params.append(filters["r2_manufacturer"])
+
+    if filters["r2_size"]:
+        where.append("a.SIZE = %s")
+        params.append(filters["r2_size"])
+
+    q2 = f"""
+        SELECT a.SIZE, a.MANUFACTURER, c.CLASS, SUM(c.REVENUE) AS revenue
+        FROM FLIGHT_CLASS_FACT c
+        JOIN FLIGHT_FACT ff ON ff.FLIGHT_NUM = c.FLIGHT_NUM
+        JOIN AIRCRAFT a ON a.AIRCRAFT_ID = ff.AIRCRAFT_ID
+        WHERE {" AND ".join(where)}
+        GROUP BY a.SIZE, a.MANUFACTURER, c.CLASS
+        ORDER BY revenue {filters["r2_sort"]}, a.SIZE, a.MANUFACTURER, c.CLASS
+    """
+    return q2, tuple(params)
+
+
+def _query_r3(filters):
+    """
+    Flight hours of every pilot/attendant on COMPLETED flights, split into short and long flights.
+    """
+    where_outer = ["1=1"]
+    params_outer = []
+
+    if filters["r3_role"]:
+        where_outer.append("employee_type = %s")
+        params_outer.append(filters["r3_role"])
+
+    if filters["r3_emp"]:
+        where_outer.append("employee_id = %s")
+        params_outer.append(filters["r3_emp"])
+
+    if filters["r3_flight_type"]:
+        where_outer.append("flight_type = %s")
+        params_outer.append(filters["r3_flight_type"])
+
+    q3 = f"""
+        SELECT employee_type, employee_id, flight_type,
+               ROUND(SUM(TIME_TO_SEC(duration)) / 3600, 2) AS total_hours
+        FROM (
+            SELECT
+                'PILOT' AS employee_type,
+                ap.ID_P AS employee_id,
+                CASE WHEN f.DURATION > '06:00:00' THEN 'LONG' ELSE 'SHORT' END AS flight_type,
+                f.DURATION AS duration
+            FROM ASSIGNED_PILOT ap
+            JOIN FLIGHT f ON f.FLIGHT_NUM = ap.FLIGHT_NUM
+            WHERE f.FLIGHT_STATUS = 'COMPLETED'
+
+            UNION ALL
+
+            SELECT
+                'ATTENDANT' AS employee_type,
+                aa.ID_A AS employee_id,
+                CASE WHEN f.DURATION > '06:00:00' THEN 'LONG' ELSE 'SHORT' END AS flight_type,
+                f.DURATION AS duration
+            FROM ASSIGHNED_ATTENDANT aa
+            JOIN FLIGHT f ON f.FLIGHT_NUM = aa.FLIGHT_NUM
+            WHERE f.FLIGHT_STATUS = 'COMPLETED'
+        ) AS employee_flight_hours
+        WHERE {" AND ".join(where_outer)}
+        GROUP BY employee_type, employee_id, flight_type
+        ORDER BY total_hours {filters["r3_sort"]}, employee_type, employee_id
+    """
+    return q3, tuple(params_outer)
+
+
+def _query_r4(filters):
+    """
+    Monthly customer cancellation rate (percent of orders), by order month.
+    Sums the daily counters of ORDER_DAY_FACT.
+    """
+    ym1 = parse_month(filters["r4_from"])
+    ym2 = parse_month(filters["r4_to"])
+    start_date, end_date = month_start_end(ym1, ym2)
+
+    base_where = ["d.CLASS = %s"]
+    base_params = [filters["r4_class"] or "ALL"]
+
+    if start_date:
+        base_where.append("d.O_DATE >= %s")
+        base_params.append(start_date.isoformat())
+    if end_date:
+        base_where.append("d.O_DATE <= %s")
+        base_params.append(end_date.isoformat())
+
+    q4 = f"""
+        SELECT
+            yr AS year,
+            mo AS month,
+            ROUND(100.0 * cancelled_cnt / NULLIF(total_cnt,0), 2) AS cancel_rate_percent
+        FROM (
+            SELECT
+                YEAR(d.O_DATE) AS yr,
+                MONTH(d.O_DATE) AS mo,
+                SUM(d.ORDERS) AS total_cnt,
+                SUM(d.CANCELLED_ORDERS) AS cancelled_cnt
+            FROM ORDER_DAY_FACT d
+            WHERE {" AND ".join(base_where)}
+            GROUP BY YEAR(d.O_DATE), MONTH(d.O_DATE)
+        ) t
+        ORDER BY cancel_rate_percent {filters["r4_sort"]}, year, month
+    """
+    return q4, tuple(base_params)
+
+
+def _query_r5(filters):
+    """
+    Monthly fleet summary: completed/cancelled flights, utilization and dominant route per aircraft.
+    Built from the per aircraft/month/route counters in AIRCRAFT_MONTH_FACT.
+    """
+    ym1 = parse_month(filters["r5_from"])
+    ym2 = parse_month(filters["r5_to"])
+    start_date, end_date = month_start_end(ym1, ym2)
+
+    outer_where = ["1=1"]
+    outer_params = []
+
+    if filters["r5_aircraft"]:
+        outer_where.append("x.AIRCRAFT_ID = %s")
+        outer_params.append(filters["r5_aircraft"])
+
+    if filters["r5_manufacturer"]:
+        outer_where.append("x.MANUFACTURER = %s")
+        outer_params.append(filters["r5_manufacturer"])
+
+    if filters["r5_origin"]:
+        outer_where.append("(x.origin = %s)")
+        outer_params.append(filters["r5_origin"])
+
+    if filters["r5_destination"]:
+        outer_where.append("(x.destination = %s)")
+        outer_params.append(filters["r5_destination"])
+
+    if start_date:
+        outer_where.append("STR_TO_DATE(CONCAT(x.year,'-',LPAD(x.month,2,'0'),'-01'), '%Y-%m-%d') >= %s")
+        outer_params.append(start_date.isoformat())
+    if end_date:
+        outer_where.append("STR_TO_DATE(CONCAT(x.year,'-',LPAD(x.month,2,'0'),'-01'), '%Y-%m-%d') <= %s")
+        outer_params.append(end_date.isoformat())
+
+    q5 = f"""
+        WITH
+        years AS (
+          SELECT DISTINCT F_YEAR AS year
+          FROM AIRCRAFT_MONTH_FACT
+        ),
+        months AS (
+          SELECT 1 AS month UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4
+          UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8
+          UNION ALL SELECT 9 UNION ALL SELECT 10 UNION ALL SELECT 11 UNION ALL SELECT 12
+        ),
+        skeleton AS (
+          SELECT a.AIRCRAFT_ID, a.MANUFACTURER, y.year, m.month
+          FROM AIRCRAFT a
+          CROSS JOIN years y
+          CROSS JOIN months m
+        ),
+        monthly_flights AS (
+          SELECT
+            AIRCRAFT_ID,
+            F_YEAR AS year,
+            F_MONTH AS month,
+            SUM(COMPLETED_FLIGHTS) AS completed_flights,
+            SUM(CANCELLED_FLIGHTS) AS cancelled_flights
+          FROM AIRCRAFT_MONTH_FACT
+          GROUP BY AIRCRAFT_ID, F_YEAR, F_MONTH
+        ),
+        dominant_route AS (
+          SELECT AIRCRAFT_ID, year, month, origin, destination
+          FROM (
+            SELECT
+              AIRCRAFT_ID,
+              F_YEAR AS year,
+              F_MONTH AS month,
+              ORIGIN AS origin,
+              DESTINATION AS destination,
+              ROW_NUMBER() OVER (
+                PARTITION BY AIRCRAFT_ID, F_YEAR, F_MONTH
+                ORDER BY COMPLETED_FLIGHTS DESC, ORIGIN, DESTINATION
+              ) AS rn
+            FROM AIRCRAFT_MONTH_FACT
+            WHERE COMPLETED_FLIGHTS > 0
+          ) t
+          WHERE rn = 1
+        )
+        SELECT *
+        FROM (
+          SELECT
+            s.AIRCRAFT_ID,
+            s.MANUFACTURER,
+            s.year,
+            s.month,
+
+            CASE WHEN mf.completed_flights IS NULL THEN 0 ELSE mf.completed_flights END AS completed_flights,
+            CASE WHEN mf.cancelled_flights IS NULL THEN 0 ELSE mf.cancelled_flights END AS cancelled_flights,
+
+            ROUND(
+              LEAST(
+                (CASE WHEN mf.completed_flights IS NULL THEN 0 ELSE mf.completed_flights END) / 30.0,
+                1
+              ) * 100,
+              2
+            ) AS utilization_percent,
+
+            dr.origin,
+            dr.destination
+          FROM skeleton s
+          LEFT JOIN monthly_flights mf
+            ON mf.AIRCRAFT_ID = s.AIRCRAFT_ID
+           AND mf.year = s.year
+           AND mf.month = s.month
+          LEFT JOIN dominant_route dr
+            ON dr.AIRCRAFT_ID = s.AIRCRAFT_ID
+           AND dr.year = s.year
+           AND dr.month = s.month
+        ) x
+        WHERE {" AND ".join(outer_where)}
+        ORDER BY x.AIRCRAFT_ID, x.year, x.month
+    """
+    return q5, tuple(outer_params)
+
+# ------------------------------------------------------------
+# Fact tables: pre-aggregated report data. Orders add deltas to
+# their counters (FactDeltas); flight changes recompute the rows
+# of those flights (refresh_facts).
+# ------------------------------------------------------------
+
+FACT_BATCH = 500   # flights refreshed per statement
+
+_FLIGHT_FACT_SQL = """
+    REPLACE INTO FLIGHT_FACT
+    (FLIGHT_NUM, AIRCRAFT_ID, DEPARTURE_DATE, FLIGHT_STATUS, ORIGIN, DESTINATION, CAPACITY, SEATS_COMPLETED)
+    SELECT
+        f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, f.FLIGHT_STATUS,
+        COALESCE(r.ORIGIN, ''), COALESCE(r.DESTINATION, ''),
+        COALESCE(a.CAPACITY_ECONOMY, 0) + COALESCE(a.CAPACITY_BUSINESS, 0),
+        COUNT(DISTINCT os.AIRCRAFT_ID, os.ROW_NUM, os.COL_LETTER)
+    FROM FLIGHT f
+    JOIN ROUTE r ON r.ROUTE_ID = f.ROUTE_ID AND r.DURATION = f.DURATION
+    JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
+    LEFT JOIN F_ORDER o
+        ON o.FLIGHT_NUM = f.FLIGHT_NUM
+       AND o.O_STATUS = 'COMPLETED'
+    LEFT JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+    WHERE {where}
+    GROUP BY f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, f.FLIGHT_STATUS,
+             r.ORIGIN, r.DESTINATION, a.CAPACITY_ECONOMY, a.CAPACITY_BUSINESS
+"""
+
+# Revenue per seat: full price for ACTIVE/COMPLETED orders and for late (< 36h) customer
+# cancellations, the 5% fee split over the order's seats for earlier cancellations.
+_FLIGHT_CLASS_FACT_SQL = """
+    REPLACE INTO FLIGHT_CLASS_FACT (FLIGHT_NUM, CLASS, SEATS_SOLD, REVENUE)
+    SELECT
+        f.FLIGHT_NUM, s.CLASS,
+        SUM(o.O_STATUS IN ('ACTIVE','COMPLETED')),
+        COALESCE(SUM(
+            CASE
+                WHEN o.O_STATUS IN ('ACTIVE','COMPLETED') THEN
+                    CASE
+                        WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
+                        WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
+                    END
+
+                WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+                     AND o.CANACELATION_DATE_TIME IS NOT NULL
+                     AND TIMESTAMPDIFF(HOUR, o.CANACELATION_DATE_TIME, f.DEPARTURE_DT) < 36
+                THEN
+                    CASE
+                        WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
+                        WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
+                    END
+
+                WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+                     AND o.CANACELATION_DATE_TIME IS NOT NULL
+                     AND TIMESTAMPDIFF(HOUR, o.CANACELATION_DATE_TIME, f.DEPARTURE_DT) >= 36
+                THEN
+                    (0.05 * o.ORDER_PRICE) *
+                    (1.0 / (
+                          SELECT COUNT(*)
+                          FROM ORDER_SEAT os2
+                          WHERE os2.O_ID = o.O_ID
+                    ))
+
+                ELSE 0
+            END
+        ), 0)
+    FROM FLIGHT f
+    JOIN F_ORDER o ON o.FLIGHT_NUM = f.FLIGHT_NUM
+    JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+    JOIN SEAT s
+      ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+     AND s.ROW_NUM = os.ROW_NUM
+     AND s.COL_LETTER = os.COL_LETTER
+    WHERE {where}
+    GROUP BY f.FLIGHT_NUM, s.CLASS
+"""
+
+# CLASS = 'ALL' counts every order once; the ECONOMY/BUSINESS rows count orders with a seat in that class.
+_ORDER_DAY_FACT_SQL = """
+    INSERT INTO ORDER_DAY_FACT (O_DATE, CLASS, ORDERS, CANCELLED_ORDERS)
+    SELECT
+        o.O_DATE, 'ALL',
+        COUNT(*),
+        SUM(o.O_STATUS = 'CUSTOMER_CANCELLED' AND o.CANACELATION_DATE_TIME IS NOT NULL)
+    FROM F_ORDER o
+    JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+    WHERE o.O_DATE IS NOT NULL
+    GROUP BY o.O_DATE
+
+    UNION ALL
+
+    SELECT
+        o.O_DATE, s.CLASS,
+        COUNT(DISTINCT o.O_ID),
+        COUNT(DISTINCT CASE
+            WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+             AND o.CANACELATION_DATE_TIME IS NOT NULL
+            THEN o.O_ID END
+        )
+    FROM F_ORDER o
+    JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+    JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+    JOIN SEAT s
+      ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+     AND s.ROW_NUM = os.ROW_NUM
+     AND s.COL_LETTER = os.COL_LETTER
+    WHERE o.O_DATE IS NOT NULL
+    GROUP BY o.O_DATE, s.CLASS
+"""
+
+_AIRCRAFT_MONTH_FACT_SQL = """
+    REPLACE INTO AIRCRAFT_MONTH_FACT
+    (AIRCRAFT_ID, F_YEAR, F_MONTH, ORIGIN, DESTINATION, TOTAL_FLIGHTS, COMPLETED_FLIGHTS, CANCELLED_FLIGHTS)
+    SELECT
+        AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE), ORIGIN, DESTINATION,
+        COUNT(*),
+        SUM(FLIGHT_STATUS = 'COMPLETED'),
+        SUM(FLIGHT_STATUS = 'CANCELLED')
+    FROM FLIGHT_FACT
+    WHERE DEPARTURE_DATE IS NOT NULL AND ({where})
+    GROUP BY AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE), ORIGIN, DESTINATION
+"""
+
+
+def _refresh_months(cur, keys):
+    """
+    Recomputes the AIRCRAFT_MONTH_FACT rows of the given (aircraft, year, month) keys.
+    """
+    keys = list(keys)
+    for i in range(0, len(keys), FACT_BATCH):
+        chunk = keys[i:i + FACT_BATCH]
+        delete_where, insert_where, d_params, i_params = [], [], [], []
+        for aircraft_id, y, m in chunk:
+            start, end = month_start_end((y, m), (y, m))
+            delete_where.append("(AIRCRAFT_ID = %s AND F_YEAR = %s AND F_MONTH = %s)")
+            d_params += [aircraft_id, y, m]
+            insert_where.append("(AIRCRAFT_ID = %s AND DEPARTURE_DATE BETWEEN %s AND %s)")
+            i_params += [aircraft_id, start, end]
+
+        cur.execute(f"DELETE FROM AIRCRAFT_MONTH_FACT WHERE {' OR '.join(delete_where)}", tuple(d_params))
+        cur.execute(_AIRCRAFT_MONTH_FACT_SQL.format(where=" OR ".join(insert_where)), tuple(i_params))
+
+
+def refresh_facts(cur, flight_nums):
+    """
+    Recomputes the fact rows of the given flights (their flight, class and aircraft-month
+    rows) after a flight change: a new flight, a cancellation, completed flights.
+    Call it inside the transaction of the change (db.start_transaction(); connections
+    autocommit otherwise). Rows are written with REPLACE, so two refreshes of the same
+    aircraft month do not fail on the primary key. Orders use FactDeltas instead.
+    """
+    flight_nums = sorted(set(flight_nums))
+    for i in range(0, len(flight_nums), FACT_BATCH):
+        chunk = tuple(flight_nums[i:i + FACT_BATCH])
+        ph = ",".join(["%s"] * len(chunk))
+
+        cur.execute(f"DELETE FROM FLIGHT_FACT WHERE FLIGHT_NUM IN ({ph})", chunk)
+        cur.execute(_FLIGHT_FACT_SQL.format(where=f"f.FLIGHT_NUM IN ({ph})"), chunk)
+        cur.execute(f"DELETE FROM FLIGHT_CLASS_FACT WHERE FLIGHT_NUM IN ({ph})", chunk)
+        cur.execute(_FLIGHT_CLASS_FACT_SQL.format(where=f"f.FLIGHT_NUM IN ({ph})"), chunk)
+
+        cur.execute(f"""
+            SELECT DISTINCT AIRCRAFT_ID, YEAR(DEPARTURE_DATE) AS y, MONTH(DEPARTURE_DATE) AS m
+            FROM FLIGHT_FACT
+            WHERE FLIGHT_NUM IN ({ph}) AND DEPARTURE_DATE IS NOT NULL
+        """, chunk)
+        rows = cur.fetchall()
+        _refresh_months(cur, [(r["AIRCRAFT_ID"], r["y"], r["m"]) for r in rows])
+
+
+def _add_to_fact(cur, table, key, deltas):
+    """
+    Adds deltas to the counters of one fact row, creating the row if it does not exist.
+    key and deltas are {column: value}.
+    """
+    cols = list(key) + list(deltas)
+    cur.execute(f"""
+        INSERT INTO {table} ({", ".join(cols)})
+        VALUES ({", ".join(["%s"] * len(cols))})
+        ON DUPLICATE KEY UPDATE {", ".join(f"{c} = {c} + %s" for c in deltas)}
+    """, tuple(key.values()) + tuple(deltas.values()) * 2)
+
+
+class FactDeltas:
+    """
+    Changes that orders make to FLIGHT_CLASS_FACT and ORDER_DAY_FACT, summed per fact row
+    and written by write() with one upsert per row. The deltas follow the rules of
+    _FLIGHT_CLASS_FACT_SQL and _ORDER_DAY_FACT_SQL, so rebuild_facts() gives the same rows.
+    """
+
+    def __init__(self):
+        self.flight_class = {}   # (flight, class) -> [seats sold, revenue]
+        self.order_day = {}      # (order date, class) -> [orders, cancelled orders]
+
+    def _seat(self, flight_num, seat_class, sold, revenue):
+        row = self.flight_class.setdefault((flight_num, seat_class), [0, 0.0])
+        row[0] += sold
+        row[1] += revenue
+
+    def _day(self, o_date, classes, orders, cancelled):
+        for seat_class in ["ALL"] + sorted(set(classes)):
+            row = self.order_day.setdefault((o_date, seat_class), [0, 0])
+            row[0] += orders
+            row[1] += cancelled
+
+    def order_placed(self, flight_num, o_date, seats):
+        """
+        A new ACTIVE order. seats: [(class, price)] of its seats.
+        """
+        for seat_class, price in seats:
+            self._seat(flight_num, seat_class, 1, float(price))
+        self._day(o_date, [c for c, _ in seats], 1, 0)
+
+    def order_cancelled(self, flight_num, o_date, seats, order_price, hours_before):
+        """
+        A customer cancellation of an ACTIVE order. seats: [(class, price)] of its seats,
+        order_price: its price after the cancellation, hours_before: hours from the
+        cancellation to the departure. Late cancellations (< 36 hours) keep the full seat
+        prices as revenue, earlier ones 5% of the order price spread over its seats.
+        """
+        for seat_class, price in seats:
+            kept = float(price) if hours_before < 36 else 0.05 * float(order_price) / len(seats)
+            self._seat(flight_num, seat_class, -1, kept - float(price))
+        self._day(o_date, [c for c, _ in seats], 0, 1)
+
+    def order_removed(self, o_date, classes, customer_cancelled):
+        """
+        An order deleted from F_ORDER (test data clean-up). The class rows of its flight
+        go away with the flight (refresh_facts), so only the day counters change here.
+        """
+        self._day(o_date, classes, -1, -1 if customer_cancelled else 0)
+
+    def write(self, cur):
+        """
+        Writes the summed deltas inside the caller's transaction. Rows are locked in a fixed
+        order (flight rows, then day rows, each sorted), so concurrent orders cannot deadlock
+        on them; call it right before the commit so the hot day rows stay locked briefly.
+        """
+        for (flight_num, seat_class), (sold, revenue) in sorted(self.flight_class.items()):
+            _add_to_fact(cur, "FLIGHT_CLASS_FACT", {"FLIGHT_NUM": flight_num, "CLASS": seat_class},
+                         {"SEATS_SOLD": sold, "REVENUE": round(revenue, 4)})
+        for (o_date, seat_class), (orders, cancelled) in sorted(self.order_day.items()):
+            _add_to_fact(cur, "ORDER_DAY_FACT", {"O_DATE": o_date, "CLASS": seat_class},
+                         {"ORDERS": orders, "CANCELLED_ORDERS": cancelled})
+
+
+def rebuild_facts(cur):
+    """
+    Rebuilds all fact tables from FLIGHT / F_ORDER (first setup, or after manual SQL edits).
+    """
+    for table in ("AIRCRAFT_MONTH_FACT", "ORDER_DAY_FACT", "FLIGHT_CLASS_FACT", "FLIGHT_FACT"):
+        cur.execute(f"DELETE FROM {table}")
+    cur.execute(_FLIGHT_FACT_SQL.format(where="1=1"))
+    cur.execute(_FLIGHT_CLASS_FACT_SQL.format(where="1=1"))
+    cur.execute(_ORDER_DAY_FACT_SQL)
+    cur.execute(_AIRCRAFT_MONTH_FACT_SQL.format(where="1=1"))
+
+
+# report id -> function(filters) that returns the report's (sql, params)
+REPORT_QUERIES = {
+    "r1": _query_r1,
+    "r2": _query_r2,
+    "r3": _query_r3,
+    "r4": _query_r4,
+    "r5": _query_r5,
+}
+
+
+def fetch_report(cur, report_id, filters):
+    """
+    Runs one report on cur: the average (or None) for r1, a list of rows for the others.
+    """
+    sql, params = REPORT_QUERIES[report_id](filters)
+    cur.execute(sql, params)
+    if report_id == "r1":
+        row = cur.fetchone()
+        return row["avg_occupancy"] if row and row["avg_occupancy"] is not None else None
+    return cur.fetchall()
+
+
+class ReportCache:
+    """
+    Small LRU cache of report results with a TTL.
+    Every entry remembers the data version it was built from; invalidate() bumps the
+    version, so results computed before a flight or schedule change are never served again.
+    Bookings change the facts all the time, so bookings_changed() only shortens the life of
+    the entries built before it to booking_ttl instead of dropping them.
+    """
+
+    def __init__(self, ttl=REPORT_CACHE_TTL, max_size=REPORT_CACHE_SIZE, booking_ttl=REPORT_BOOKING_TTL):
+        self.ttl = ttl
+        self.booking_ttl = booking_ttl
+        self.max_size = max_size
+        self.version = 0
+        self.booked_at = float("-inf")   # when orders were last placed or cancelled
+        self._entries = OrderedDict()   # key -> (version, stored_at, value)
+        self._lock = threading.Lock()
+        self.stats = {"hits_total": 0, "misses_total": 0, "evictions_total": 0, "invalidations_total": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, stored_at, value = entry
+                age = time.monotonic() - stored_at
+                ttl = self.booking_ttl if stored_at <= self.booked_at else self.ttl
+                if version == self.version and age < ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["hits_total"] += 1
+                    return True, value
+                del self._entries[key]
+            self.stats["misses_total"] += 1
+            return False, None
+
+    def put(self, key, version, value):
+        with self._lock:
+            if version != self.version:
+                return   # data changed while the report was running
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions_total"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self.stats["invalidations_total"] += 1
+
+    def bookings_changed(self):
+        with self._lock:
+            self.booked_at = time.monotonic()
+
+
+report_cache = ReportCache()
+
+
+def run_report(report_id, filters):
+    """
+    Returns the result of one report (r1..r5), from the cache when possible.
+    Only the requested report is computed; a cache hit does not touch the database.
+    """
+    key = _cache_key(report_id, filters)
+    found, value = report_cache.get(key)
+    if found:
+        return value
+
+    version = report_cache.version
+    with db_cursor() as (db, cur):
+        value = fetch_report(cur, report_id, filters)
+    report_cache.put(key, version, value)
+    return value
+
+
+def invalidate_reports():
+    """
+    Drops all cached reports. Call after changing flights (status, schedule) or aircraft.
+    """
+    report_cache.invalidate()
+
+
+def bookings_changed():
+    """
+    Lets cached reports go stale within REPORT_BOOKING_TTL. Call after placing or cancelling orders.
+    """
+    report_cache.bookings_changed()
+
+
+def report_cache_stats():
+    with report_cache._lock:
+        snapshot = dict(report_cache.stats)
+        snapshot["entries"] = len(report_cache._entries)
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the report fact tables.")
+    parser.add_argument("--rebuild-facts", action="store_true", help="rebuild all fact tables from scratch")
+    args = parser.parse_args()
+
+    if args.rebuild_facts:
+        with db_cursor() as (db, cur):
+            db.start_transaction()
+            rebuild_facts(cur)
+            db.commit()
+        print("Report fact tables rebuilt.")
+    else:
+        parser.print_help()
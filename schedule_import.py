@@ -0,0 +1,283 @@
+import argparse
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from db import db_cursor
+from reports import refresh_facts
+from scheduling import CREW_SIZE, WEEK, Timeline, group_timelines, load_resource_flights
+from search import get_route_directory
+from utils import combine_date_time, mysql_time_to_timedelta, reserve_sequence_block
+
+
+FIELDS = ["origin", "destination", "departure_date", "departure_time", "aircraft_id",
+          "pilots", "attendants", "economy_price", "business_price"]
+
+LONG_FLIGHT = timedelta(hours=6)   # longer flights need a BIG aircraft
+INSERT_BATCH = 1000                # rows per executemany call
+MAX_SCHEDULE_BYTES = 16 * 1024 * 1024   # largest schedule file accepted by the upload endpoint
+
+
+def read_schedule(text, fmt):
+    """
+    Parses a CSV (with a header row) or JSON (list of objects) schedule into dicts.
+    pilots/attendants may be lists or strings separated by ';'.
+    Entries that are not flights keep their row number and list why in "format_errors".
+    """
+    if fmt == "json":
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError("JSON schedule must be a list of flights.")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    out = []
+    for r in rows:
+        if not isinstance(r, dict):
+            out.append({"format_errors": ["each flight must be a JSON object"]})
+            continue
+        r = {k: r.get(k) for k in FIELDS}
+        r["format_errors"] = []
+        for key in ("pilots", "attendants"):
+            v = r[key] or []
+            if isinstance(v, str):
+                v = [x.strip() for x in v.split(";") if x.strip()]
+            elif not isinstance(v, list):
+                r["format_errors"].append(f"{key} must be a list or a ';'-separated string")
+                v = []
+            r[key] = [str(x) for x in v]
+        for key in ("origin", "destination", "departure_date", "departure_time", "aircraft_id"):
+            r[key] = str(r[key] or "").strip()
+        out.append(r)
+    return out
+
+
+def _parse_row(r, routes, aircrafts, pilots, attendants, now):
+    """
+    Checks everything about one row that does not depend on other flights.
+    Returns (flight dict, errors).
+    """
+    errors = []
+
+    route = routes.route(r["origin"], r["destination"])
+    if route is None:
+        errors.append(f"no route {r['origin']} -> {r['destination']}")
+
+    dep_time = r["departure_time"]
+    if len(dep_time) == 5:
+        dep_time += ":00"
+    try:
+        dep_dt = combine_date_time(r["departure_date"], dep_time)
+    except ValueError:
+        dep_dt = None
+        errors.append("departure_date/departure_time must be YYYY-MM-DD and HH:MM")
+    else:
+        if dep_dt <= now:
+            errors.append("departure is in the past")
+
+    aircraft = aircrafts.get(r["aircraft_id"])
+    if aircraft is None:
+        errors.append(f"unknown aircraft {r['aircraft_id']}")
+    is_big = bool(aircraft) and (aircraft["SIZE"] or "").upper() == "BIG"
+
+    try:
+        economy = float(r["economy_price"])
+        if economy <= 0:
+            raise ValueError()
+    except (TypeError, ValueError):
+        economy = None
+        errors.append("economy_price must be a positive number")
+
+    if is_big:
+        try:
+            business = float(r["business_price"])
+            if business <= 0:
+                raise ValueError()
+        except (TypeError, ValueError):
+            business = None
+            errors.append("business_price must be a positive number for a BIG aircraft")
+    else:
+        business = 0.0
+
+    for kind, ids, staff in (("pilot", r["pilots"], pilots), ("attendant", r["attendants"], attendants)):
+        needed = CREW_SIZE[is_big][kind]
+        if len(ids) != needed or len(set(ids)) != needed:
+            errors.append(f"needs exactly {needed} different {kind}s")
+        for emp_id in ids:
+            if emp_id not in staff:
+                errors.append(f"unknown {kind} {emp_id}")
+            elif is_big and not staff[emp_id]:
+                errors.append(f"{kind} {emp_id} is not qualified for a BIG aircraft")
+
+    if errors:
+        return None, errors
+
+    duration = mysql_time_to_timedelta(route["DURATION"])
+    if duration > LONG_FLIGHT and not is_big:
+        return None, ["flights longer than 6 hours need a BIG aircraft"]
+
+    return {
+        "ROUTE_ID": route["ROUTE_ID"],
+        "DURATION": route["DURATION"],
+        "ORIGIN": r["origin"],
+        "DESTINATION": r["destination"],
+        "DEPARTURE_DT": dep_dt,
+        "ARRIVAL_DT": dep_dt + duration,
+        "AIRCRAFT_ID": r["aircraft_id"],
+        "PILOTS": r["pilots"],
+        "ATTENDANTS": r["attendants"],
+        "ECONOMY_PRICE": economy,
+        "BUSINESS_PRICE": business,
+    }, []
+
+
+def validate_schedule(cur, rows):
+    """
+    Validates a whole schedule in memory: routes, aircraft, crew size and qualification,
+    prices, and the 4-day / 7-day rules against both the existing flights and the other
+    new flights of the batch (checked in departure order).
+    Returns (accepted flights with their row numbers, {row number: [errors]}).
+    """
+    routes = get_route_directory()
+    now = datetime.now()
+
+    cur.execute("SELECT AIRCRAFT_ID, SIZE FROM AIRCRAFT")
+    aircrafts = {a["AIRCRAFT_ID"]: a for a in cur.fetchall()}
+    cur.execute("SELECT ID_P, IS_QUALIFIED FROM PILOT")
+    pilots = {p["ID_P"]: p["IS_QUALIFIED"] for p in cur.fetchall()}
+    cur.execute("SELECT ID_A, IS_QUALIFIED FROM FLIGHT_ATTENDANT")
+    attendants = {a["ID_A"]: a["IS_QUALIFIED"] for a in cur.fetchall()}
+
+    errors = {}
+    parsed = []
+    for n, r in enumerate(rows, start=1):
+        if r["format_errors"]:
+            errors[n] = r["format_errors"]
+            continue
+        flight, row_errors = _parse_row(r, routes, aircrafts, pilots, attendants, now)
+        if row_errors:
+            errors[n] = row_errors
+        else:
+            parsed.append((n, flight))
+
+    if not parsed:
+        return [], errors
+
+    first_dep = min(f["DEPARTURE_DT"] for _, f in parsed)
+    last_arr = max(f["ARRIVAL_DT"] for _, f in parsed)
+    timelines = {
+        kind: group_timelines(load_resource_flights(cur, kind, first_dep, last_arr, lookback=WEEK))
+        for kind in ("aircraft", "pilot", "attendant")
+    }
+
+    accepted = []
+    for n, f in sorted(parsed, key=lambda x: x[1]["DEPARTURE_DT"]):
+        resources = [("aircraft", f["AIRCRAFT_ID"])]
+        resources += [("pilot", p) for p in f["PILOTS"]]
+        resources += [("attendant", a) for a in f["ATTENDANTS"]]
+
+        row_errors = []
+        for kind, res_id in resources:
+            t = timelines[kind].get(res_id)
+            if t is None:
+                continue
+            if not t.available(f["DEPARTURE_DT"], f["ARRIVAL_DT"], f["ORIGIN"], f["DESTINATION"]):
+                row_errors.append(f"{kind} {res_id} is busy or not at {f['ORIGIN']} (4-day rule)")
+            elif kind != "aircraft" and not t.week_rule_ok(f["DEPARTURE_DT"], f["ORIGIN"]):
+                row_errors.append(f"{kind} {res_id} last landed elsewhere in the past 7 days")
+
+        if row_errors:
+            errors[n] = row_errors
+            continue
+
+        for kind, res_id in resources:
+            timelines[kind].setdefault(res_id, Timeline([])).add(f)
+        accepted.append((n, f))
+
+    return accepted, errors
+
+
+def write_schedule(db, cur, accepted):
+    """
+    Inserts the accepted flights and their crews in one transaction,
+    using batched executemany inserts. Returns the new flight numbers.
+    """
+    if not accepted:
+        return []
+
+    first = reserve_sequence_block("FLIGHT", len(accepted))
+    flight_rows, pilot_rows, attendant_rows, numbers = [], [], [], []
+    for i, (_, f) in enumerate(accepted):
+        flight_num = f"F{first + i}"
+        numbers.append(flight_num)
+        dep, arr = f["DEPARTURE_DT"], f["ARRIVAL_DT"]
+        flight_rows.append((flight_num, f["AIRCRAFT_ID"], f["DURATION"], f["ROUTE_ID"],
+                            dep.date(), dep.time(), arr.date(), arr.time(),
+                            f["ECONOMY_PRICE"], f["BUSINESS_PRICE"]))
+        pilot_rows += [(p, flight_num) for p in f["PILOTS"]]
+        attendant_rows += [(a, flight_num) for a in f["ATTENDANTS"]]
+
+    statements = [
+        ("""
+            INSERT INTO FLIGHT
+            (FLIGHT_NUM, AIRCRAFT_ID, DURATION, ROUTE_ID, FLIGHT_STATUS,
+             DEPARTURE_DATE, DEPARTURE_TIME, ARRIVAL_DATE, ARRIVAL_TIME,
+             ECONOMY_PRICE, BUSINESS_PRICE)
+            VALUES (%s,%s,%s,%s,'ACTIVE',%s,%s,%s,%s,%s,%s)
+        """, flight_rows),
+        ("INSERT INTO ASSIGNED_PILOT (ID_P, FLIGHT_NUM) VALUES (%s,%s)", pilot_rows),
+        ("INSERT INTO ASSIGHNED_ATTENDANT (ID_A, FLIGHT_NUM) VALUES (%s,%s)", attendant_rows),
+    ]
+
+    db.start_transaction()
+    try:
+        for sql, rows in statements:
+            for i in range(0, len(rows), INSERT_BATCH):
+                cur.executemany(sql, rows[i:i + INSERT_BATCH])
+        refresh_facts(cur, numbers)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return numbers
+
+
+def import_schedule(text, fmt="csv", skip_invalid=False, dry_run=False):
+    """
+    Validates and imports a schedule. Nothing is written if any row is invalid,
+    unless skip_invalid is set (then only the valid rows are imported).
+    Returns a report: {"total", "valid", "imported", "flight_nums", "errors": [{"row", "errors"}]}.
+    """
+    rows = read_schedule(text, fmt)
+    with db_cursor() as (db, cur):
+        accepted, errors = validate_schedule(cur, rows)
+
+        flight_nums = []
+        if not dry_run and (skip_invalid or not errors):
+            flight_nums = write_schedule(db, cur, accepted)
+
+    return {
+        "total": len(rows),
+        "valid": len(accepted),
+        "imported": len(flight_nums),
+        "flight_nums": flight_nums,
+        "errors": [{"row": n, "errors": errors[n]} for n in sorted(errors)],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a season schedule (flights with crew).")
+    parser.add_argument("file", help="CSV with a header row, or JSON list (.json)")
+    parser.add_argument("--skip-invalid", action="store_true", help="import the valid rows even if others fail")
+    parser.add_argument("--dry-run", action="store_true", help="only validate, write nothing")
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8") as fh:
+        text = fh.read()
+    fmt = "json" if args.file.lower().endswith(".json") else "csv"
+
+    report = import_schedule(text, fmt, skip_invalid=args.skip_invalid, dry_run=args.dry_run)
+    for e in report["errors"]:
+        print(f"row {e['row']}: " + "; ".join(e["errors"]))
+    print(f"{report['valid']}/{report['total']} rows valid, {report['imported']} flights imported.")
@@ -0,0 +1,372 @@
+import argparse
+import random
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:   # optional: without NumPy every resource is checked with its Timeline
+    np = None
+
+from utils import FOUR_DAYS, combine_date_time, four_day_availability_ok
+
+
+# kind -> (assignment table, employee id column); aircraft read FLIGHT directly
+RESOURCE_TABLES = {
+    "aircraft": (None, "AIRCRAFT_ID"),
+    "pilot": ("ASSIGNED_PILOT", "ID_P"),
+    "attendant": ("ASSIGHNED_ATTENDANT", "ID_A"),
+}
+
+WEEK = timedelta(days=7)
+
+# crew needed per aircraft size: BIG -> 6 attendants + 3 pilots, otherwise 3 + 2
+CREW_SIZE = {
+    True: {"attendant": 6, "pilot": 3},
+    False: {"attendant": 3, "pilot": 2},
+}
+
+
+class Timeline:
+    """
+    Non-cancelled flights of one aircraft, pilot or attendant, kept sorted by time
+    so the 4-day chaining rule is answered with binary searches instead of full scans.
+    """
+
+    def __init__(self, flights):
+        by_dep = sorted(flights, key=lambda f: f["DEPARTURE_DT"])
+        self.by_dep = by_dep
+        self.deps = [f["DEPARTURE_DT"] for f in by_dep]
+        # latest arrival among the first i+1 flights (by departure), for the overlap test
+        self.max_arr = list(accumulate((f["ARRIVAL_DT"] for f in by_dep), max))
+
+        self.by_arr = sorted(flights, key=lambda f: f["ARRIVAL_DT"])
+        self.arrs = [f["ARRIVAL_DT"] for f in self.by_arr]
+
+    def add(self, flight):
+        """
+        Inserts one more flight (used while validating a batch of new flights).
+        """
+        i = bisect_right(self.deps, flight["DEPARTURE_DT"])
+        self.by_dep.insert(i, flight)
+        self.deps.insert(i, flight["DEPARTURE_DT"])
+        prev = self.max_arr[i - 1] if i > 0 else flight["ARRIVAL_DT"]
+        self.max_arr[i:] = list(accumulate((f["ARRIVAL_DT"] for f in self.by_dep[i:]), max, initial=prev))[1:]
+
+        j = bisect_right(self.arrs, flight["ARRIVAL_DT"])
+        self.by_arr.insert(j, flight)
+        self.arrs.insert(j, flight["ARRIVAL_DT"])
+
+    def overlaps(self, start, end):
+        """
+        True if any flight of the timeline overlaps the window [start, end).
+        """
+        i = bisect_left(self.deps, end) - 1
+        return i >= 0 and self.max_arr[i] > start
+
+    def nearest_before(self, start):
+        """
+        The flight that landed last at or before start, or None.
+        """
+        i = bisect_right(self.arrs, start) - 1
+        return self.by_arr[i] if i >= 0 else None
+
+    def nearest_after(self, end):
+        """
+        The first flight that departs at or after end, or None.
+        """
+        i = bisect_left(self.deps, end)
+        return self.by_dep[i] if i < len(self.by_dep) else None
+
+    def available(self, dep_dt, arr_dt, origin, destination):
+        """
+        Same rule as utils.four_day_availability_ok: no overlap, the nearest flight before
+        (within 4 days) must land in origin and the nearest flight after must leave from destination.
+        """
+        if self.overlaps(dep_dt, arr_dt):
+            return False
+
+        before = self.nearest_before(dep_dt)
+        if before is not None and dep_dt - before["ARRIVAL_DT"] <= FOUR_DAYS:
+            if before["DESTINATION"] != origin:
+                return False
+
+        after = self.nearest_after(arr_dt)
+        if after is not None and after["DEPARTURE_DT"] - arr_dt <= FOUR_DAYS:
+            if after["ORIGIN"] != destination:
+                return False
+
+        return True
+
+    def week_rule_ok(self, dep_dt, origin):
+        """
+        Same rule as utils.crew_week_rule_ok: if the last flight landed within 7 days
+        before dep_dt, it must have landed in origin.
+        """
+        before = self.nearest_before(dep_dt)
+        if before is None or dep_dt - before["ARRIVAL_DT"] > WEEK:
+            return True
+        return before["DESTINATION"] == origin
+
+
+EMPTY_TIMELINE = Timeline([])
+
+
+def load_resource_flights(cur, kind, dep_dt, arr_dt, lookback=FOUR_DAYS):
+    """
+    Loads, with one query, every non-cancelled flight of the given resource kind
+    ("aircraft", "pilot" or "attendant") that can matter for a flight from dep_dt to arr_dt:
+    flights landing after dep_dt - lookback and leaving before arr_dt + 4 days.
+    Returns the rows; RES_ID is the aircraft/employee id.
+    """
+    table, id_col = RESOURCE_TABLES[kind]
+    if table is None:
+        res_col, join = f"f.{id_col}", ""
+    else:
+        res_col, join = f"j.{id_col}", f"JOIN {table} j ON j.FLIGHT_NUM = f.FLIGHT_NUM"
+
+    cur.execute(f"""
+        SELECT
+          {res_col} AS RES_ID,
+          f.DEPARTURE_DT, f.ARRIVAL_DT,
+          r.ORIGIN, r.DESTINATION
+        FROM FLIGHT f
+        {join}
+        JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+        WHERE f.FLIGHT_STATUS <> 'CANCELLED'
+          AND f.ARRIVAL_DT >= %s
+          AND f.DEPARTURE_DT <= %s
+    """, (dep_dt - lookback, arr_dt + FOUR_DAYS))
+
+    return cur.fetchall()
+
+
+def group_timelines(rows):
+    """
+    Groups flight rows (with RES_ID) into {resource_id: Timeline}.
+    """
+    grouped = {}
+    for f in rows:
+        grouped.setdefault(f["RES_ID"], []).append(f)
+    return {res_id: Timeline(flights) for res_id, flights in grouped.items()}
+
+
+def flight_columns(rows, resource_ids):
+    """
+    Turns flight rows (with RES_ID) into the column arrays four_day_available_batch() takes:
+    resource index, departure/arrival as epoch seconds, and origin/destination as city codes.
+    Returns (columns, city_codes).
+    """
+    res_pos = {r: i for i, r in enumerate(resource_ids)}
+    city_codes = {}
+    res_idx, deps, arrs, origins, dests = [], [], [], [], []
+    for f in rows:
+        pos = res_pos.get(f["RES_ID"])
+        if pos is None:
+            continue
+        res_idx.append(pos)
+        deps.append(f["DEPARTURE_DT"].timestamp())
+        arrs.append(f["ARRIVAL_DT"].timestamp())
+        origins.append(city_codes.setdefault(f["ORIGIN"], len(city_codes)))
+        dests.append(city_codes.setdefault(f["DESTINATION"], len(city_codes)))
+    return (res_idx, deps, arrs, origins, dests), city_codes
+
+
+def _nearest_per_resource(res, key, rows, last):
+    """
+    Of the given row indexes, keeps one per resource: the one with the largest key
+    (last=True) or the smallest key (last=False).
+    """
+    order = rows[np.lexsort((key[rows], res[rows]))]
+    r = res[order]
+    if last:
+        keep = np.append(r[1:] != r[:-1], True)
+    else:
+        keep = np.insert(r[1:] != r[:-1], 0, True)
+    return order[keep]
+
+
+def four_day_available_batch(columns, n_resources, dep_ts, arr_ts, origin_code, dest_code):
+    """
+    Vectorized four_day_availability_ok for many resources at once (needs NumPy).
+    columns = (resource index, departure, arrival, origin code, destination code) per flight,
+    times in epoch seconds. Returns a bool array with one entry per resource.
+    """
+    res, dep, arr, org, dst = (np.asarray(c) for c in columns)
+    ok = np.ones(n_resources, dtype=bool)
+    if res.size == 0:
+        return ok
+
+    window = FOUR_DAYS.total_seconds()
+
+    overlap = (dep < arr_ts) & (arr > dep_ts)
+    ok[res[overlap]] = False
+
+    before = np.flatnonzero((arr <= dep_ts) & (dep_ts - arr <= window))
+    if before.size:
+        nearest = _nearest_per_resource(res, arr, before, last=True)
+        ok[res[nearest[dst[nearest] != origin_code]]] = False
+
+    after = np.flatnonzero((dep >= arr_ts) & (dep - arr_ts <= window))
+    if after.size:
+        nearest = _nearest_per_resource(res, dep, after, last=False)
+        ok[res[nearest[org[nearest] != dest_code]]] = False
+
+    return ok
+
+
+def available_resources(cur, kind, candidates, id_key, dep_dt, arr_dt, origin, destination):
+    """
+    Filters candidates (rows of AIRCRAFT, PILOT or FLIGHT_ATTENDANT) down to the ones that
+    pass the 4-day chaining rule for the new flight, using one query for all of them.
+    """
+    rows = load_resource_flights(cur, kind, dep_dt, arr_dt)
+
+    if np is not None:
+        ids = [c[id_key] for c in candidates]
+        columns, city_codes = flight_columns(rows, ids)
+        ok = four_day_available_batch(
+            columns, len(ids), dep_dt.timestamp(), arr_dt.timestamp(),
+            city_codes.get(origin, -1), city_codes.get(destination, -1)
+        )
+        return [c for c, good in zip(candidates, ok) if good]
+
+    timelines = group_timelines(rows)
+    return [
+        c for c in candidates
+        if timelines.get(c[id_key], EMPTY_TIMELINE).available(dep_dt, arr_dt, origin, destination)
+    ]
+
+
+def flown_seconds(cur, kind):
+    """
+    Total flight time (seconds) of every pilot or attendant over their non-cancelled flights.
+    """
+    table, id_col = RESOURCE_TABLES[kind]
+    cur.execute(f"""
+        SELECT j.{id_col} AS EMP_ID, SUM(TIME_TO_SEC(f.DURATION)) AS SECS
+        FROM {table} j
+        JOIN FLIGHT f ON j.FLIGHT_NUM = f.FLIGHT_NUM
+        WHERE f.FLIGHT_STATUS <> 'CANCELLED'
+        GROUP BY j.{id_col}
+    """)
+    return {r["EMP_ID"]: int(r["SECS"] or 0) for r in cur.fetchall()}
+
+
+def pick_crew(cur, kind, is_big, dep_dt, arr_dt, origin, destination):
+    """
+    Chooses the crew of one kind for a new flight: only employees that pass the 4-day and
+    7-day rules (and IS_QUALIFIED for BIG aircraft), least flown hours first.
+    Returns the chosen ids, or None if there are not enough legal employees.
+    """
+    table, id_col = ("PILOT", "ID_P") if kind == "pilot" else ("FLIGHT_ATTENDANT", "ID_A")
+    if is_big:
+        cur.execute(f"SELECT {id_col} FROM {table} WHERE IS_QUALIFIED=1")
+    else:
+        cur.execute(f"SELECT {id_col} FROM {table}")
+    candidates = [r[id_col] for r in cur.fetchall()]
+
+    timelines = group_timelines(load_resource_flights(cur, kind, dep_dt, arr_dt, lookback=WEEK))
+    hours = flown_seconds(cur, kind)
+
+    legal = []
+    for emp_id in candidates:
+        t = timelines.get(emp_id, EMPTY_TIMELINE)
+        if t.available(dep_dt, arr_dt, origin, destination) and t.week_rule_ok(dep_dt, origin):
+            legal.append(emp_id)
+
+    needed = CREW_SIZE[is_big][kind]
+    if len(legal) < needed:
+        return None
+    legal.sort(key=lambda emp_id: (hours.get(emp_id, 0), emp_id))
+    return legal[:needed]
+
+
+def auto_assign_crew(cur, nf):
+    """
+    Picks attendants and pilots for the new-flight draft (session["new_flight"]).
+    Returns (attendants, pilots), or raises ValueError when a legal crew cannot be formed.
+    """
+    is_big = (nf.get("aircraft_size") or "").upper() == "BIG"
+    dep_dt = combine_date_time(nf["departure_date"], nf["departure_time"])
+    arr_dt = combine_date_time(nf["arrival_date"], nf["arrival_time"])
+
+    attendants = pick_crew(cur, "attendant", is_big, dep_dt, arr_dt, nf["origin"], nf["destination"])
+    if attendants is None:
+        raise ValueError(f"Not enough available attendants (need {CREW_SIZE[is_big]['attendant']}).")
+
+    pilots = pick_crew(cur, "pilot", is_big, dep_dt, arr_dt, nf["origin"], nf["destination"])
+    if pilots is None:
+        raise ValueError(f"Not enough available pilots (need {CREW_SIZE[is_big]['pilot']}).")
+
+    return attendants, pilots
+
+
+def _fake_flights(n_resources, per_resource, cities):
+    """
+    Random, non-overlapping flight rows for the benchmark below.
+    """
+    start = datetime(2026, 1, 1)
+    rows = []
+    for r in range(n_resources):
+        t = start + timedelta(hours=random.randint(0, 48))
+        for _ in range(per_resource):
+            t += timedelta(hours=random.randint(6, 96))
+            d = timedelta(hours=random.randint(1, 12))
+            rows.append({
+                "RES_ID": r,
+                "DEPARTURE_DT": t, "ARRIVAL_DT": t + d,
+                "DEPARTURE_DATE": t.date(), "DEPARTURE_TIME": t.time(),
+                "ARRIVAL_DATE": (t + d).date(), "ARRIVAL_TIME": (t + d).time(),
+                "ORIGIN": random.choice(cities), "DESTINATION": random.choice(cities),
+            })
+            t += d
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the 4-day availability check.")
+    parser.add_argument("--resources", type=int, default=10000)
+    parser.add_argument("--flights", type=int, default=20, help="flights per resource")
+    parser.add_argument("--seed", type=int, default=33)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    cities = ["Tel Aviv", "London", "Paris", "Rome", "New York", "Athens"]
+    rows = _fake_flights(args.resources, args.flights, cities)
+    ids = list(range(args.resources))
+    dep_dt = datetime(2026, 1, 20, 10, 0)
+    arr_dt = dep_dt + timedelta(hours=5)
+    origin, destination = "Tel Aviv", "London"
+
+    by_res = {}
+    for f in rows:
+        by_res.setdefault(f["RES_ID"], []).append(f)
+
+    t0 = time.perf_counter()
+    scalar = [four_day_availability_ok(by_res.get(r, []), dep_dt, arr_dt, origin, destination) for r in ids]
+    t_scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    timelines = group_timelines(rows)
+    sorted_ok = [timelines.get(r, EMPTY_TIMELINE).available(dep_dt, arr_dt, origin, destination) for r in ids]
+    t_sorted = time.perf_counter() - t0
+
+    print(f"{args.resources} resources x {args.flights} flights")
+    print(f"scalar four_day_availability_ok: {t_scalar * 1000:9.1f} ms")
+    print(f"Timeline (binary search):       {t_sorted * 1000:9.1f} ms  same={sorted_ok == scalar}")
+
+    if np is None:
+        print("NumPy is not installed; skipping the vectorized check.")
+    else:
+        t0 = time.perf_counter()
+        columns, codes = flight_columns(rows, ids)
+        t_columns = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        batch = four_day_available_batch(columns, len(ids), dep_dt.timestamp(), arr_dt.timestamp(),
+                                         codes.get(origin, -1), codes.get(destination, -1))
+        t_batch = time.perf_counter() - t0
+        print(f"NumPy batch:                    {t_batch * 1000:9.1f} ms  "
+              f"(+{t_columns * 1000:.1f} ms building columns)  same={batch.tolist() == scalar}")
@@ -0,0 +1,328 @@
+import threading
+import time
+from bisect import bisect_left
+from datetime import date, timedelta
+
+from db import db_cursor, run_steps
+from seating import free_seats_by_class, occupancy_bitmap_steps, seat_map_steps
+
+
+ROUTE_DIRECTORY_TTL = 300   # seconds; also picks up ROUTE changes made outside the app
+
+
+class RouteDirectory:
+    """
+    In-memory copy of the ROUTE table: the city list, origin -> destinations,
+    and the ROUTE_ID/DURATION of every origin/destination pair.
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.routes = {}
+        self.destinations = {}
+
+        for r in rows:
+            key = (r["ORIGIN"], r["DESTINATION"])
+            if key not in self.routes:
+                self.routes[key] = {"ROUTE_ID": r["ROUTE_ID"], "DURATION": r["DURATION"]}
+                self.destinations.setdefault(r["ORIGIN"], []).append(r["DESTINATION"])
+
+        for dests in self.destinations.values():
+            dests.sort()
+
+        cities = set()
+        for origin, dest in self.routes:
+            cities.add(origin)
+            cities.add(dest)
+        self.cities = sorted(cities)
+
+    def route(self, origin, destination):
+        """
+        Returns {"ROUTE_ID", "DURATION"} of a direct route, or None if there is none.
+        """
+        return self.routes.get((origin, destination))
+
+    def paths(self, origin, destination, max_stops):
+        """
+        All city paths [origin, ..., destination] with at most max_stops stops in between,
+        without visiting a city twice. Built from the origin -> destinations adjacency.
+        A trip back to the origin is not a path (round trips are two searches).
+        """
+        found = []
+        if origin == destination:
+            return found
+        stack = [[origin]]
+        while stack:
+            path = stack.pop()
+            for nxt in self.destinations.get(path[-1], []):
+                if nxt == destination:
+                    found.append(path + [nxt])
+                elif nxt not in path and len(path) <= max_stops:
+                    stack.append(path + [nxt])
+        found.sort(key=len)
+        return found
+
+
+_directory = None
+_directory_version = 0
+_directory_lock = threading.Lock()
+
+
+def _cached_directory():
+    d = _directory
+    if d is not None and d.version == _directory_version and time.monotonic() - d.loaded_at < ROUTE_DIRECTORY_TTL:
+        return d
+    return None
+
+
+def get_route_directory():
+    """
+    Returns the route directory of this process, loading ROUTE only when the
+    cached copy is missing, invalidated or older than ROUTE_DIRECTORY_TTL.
+    """
+    d = _cached_directory()
+    if d is not None:
+        return d
+
+    with _directory_lock:
+        d = _cached_directory()
+        if d is not None:
+            return d
+        with db_cursor() as (db, cur):
+            return run_steps(cur, route_directory_steps())
+
+
+def route_directory_steps():
+    """
+    Query steps of get_route_directory(), for callers that bring their own cursor
+    (see db.run_steps). Only queries ROUTE when the cached copy is stale.
+    """
+    global _directory
+    d = _cached_directory()
+    if d is not None:
+        return d
+
+    version = _directory_version
+    rows = yield """
+        SELECT ROUTE_ID, DURATION, ORIGIN, DESTINATION
+        FROM ROUTE
+        ORDER BY ROUTE_ID
+    """, ()
+    _directory = RouteDirectory(rows, version)
+    return _directory
+
+
+def invalidate_route_directory():
+    """
+    Marks the route directory as stale (call after changing the ROUTE table).
+    """
+    global _directory_version
+    with _directory_lock:
+        _directory_version += 1
+
+
+CALENDAR_MAX_DAYS = 7   # widest +/- window the calendar search accepts
+SEARCH_FLEX_DAYS = 3    # +/- days shown around the date picked on the search page
+
+
+def fare_calendar(cur, origin, destination, center_date, days=3, passengers=1):
+    """
+    Flights from origin to destination between center_date - days and center_date + days,
+    read with one range query on DEPARTURE_DATE.
+    Returns one entry per date: its flights (with free seats per class), the cheapest
+    economy price and whether `passengers` seats can still be booked that day.
+    """
+    return run_steps(cur, fare_calendar_steps(origin, destination, center_date, days, passengers))
+
+
+def fare_calendar_steps(origin, destination, center_date, days=3, passengers=1):
+    """
+    Query steps of fare_calendar() (see db.run_steps).
+    """
+    days = max(0, min(int(days), CALENDAR_MAX_DAYS))
+    start = max(center_date - timedelta(days=days), date.today())
+    end = center_date + timedelta(days=days)
+
+    calendar = []
+    if end < start:
+        return calendar
+
+    rows = yield """
+        SELECT
+            f.FLIGHT_NUM,
+            f.AIRCRAFT_ID,
+            r.ORIGIN,
+            r.DESTINATION,
+            f.DEPARTURE_DATE,
+            f.DEPARTURE_TIME,
+            f.ARRIVAL_DATE,
+            f.ARRIVAL_TIME,
+            f.DURATION,
+            f.ECONOMY_PRICE,
+            f.BUSINESS_PRICE,
+            occ.SEAT_BITMAP
+        FROM ROUTE r
+        JOIN FLIGHT f
+          ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+        LEFT JOIN FLIGHT_OCCUPANCY occ ON occ.FLIGHT_NUM = f.FLIGHT_NUM
+        WHERE r.ORIGIN = %s
+          AND r.DESTINATION = %s
+          AND f.DEPARTURE_DATE BETWEEN %s AND %s
+          AND f.FLIGHT_STATUS = 'ACTIVE'
+          AND f.DEPARTURE_DT > NOW()
+        ORDER BY f.DEPARTURE_DT
+    """, (origin, destination, start, end)
+
+    by_date = {}
+    for f in rows:
+        seat_map = yield from seat_map_steps(f["AIRCRAFT_ID"])
+        bitmap = f.pop("SEAT_BITMAP")
+        if seat_map is None:
+            free = {"ECONOMY": 0, "BUSINESS": 0}
+        else:
+            if bitmap is None:
+                # first time this flight is looked at: build its occupancy row once
+                bitmap = yield from occupancy_bitmap_steps(f["FLIGHT_NUM"], seat_map)
+            free = free_seats_by_class(seat_map, bitmap)
+
+        f["FREE_ECONOMY"] = free["ECONOMY"]
+        f["FREE_BUSINESS"] = free["BUSINESS"]
+        f["BOOKABLE"] = free["ECONOMY"] + free["BUSINESS"] >= passengers
+        by_date.setdefault(f["DEPARTURE_DATE"], []).append(f)
+
+    day = start
+    while day <= end:
+        flights = by_date.get(day, [])
+        bookable = [f for f in flights if f["BOOKABLE"]]
+        calendar.append({
+            "date": day,
+            "flights": flights,
+            "min_economy_price": min((f["ECONOMY_PRICE"] for f in bookable if f["ECONOMY_PRICE"] is not None), default=None),
+            "free_economy": sum(f["FREE_ECONOMY"] for f in flights),
+            "free_business": sum(f["FREE_BUSINESS"] for f in flights),
+            "available": bool(bookable),
+        })
+        day += timedelta(days=1)
+
+    return calendar
+
+
+MIN_CONNECTION = timedelta(minutes=60)   # shortest allowed time between landing and the next departure
+MAX_CONNECTION = timedelta(hours=24)     # longest wait at a connecting airport
+MAX_STOPS = 2
+MAX_ITINERARIES = 500                    # stop collecting candidates after this many
+
+
+def _connection_flights_steps(pairs, first_day, passengers):
+    """
+    Loads the ACTIVE flights of every (origin, destination) leg in pairs that leave between
+    first_day and the end of the connection window, with one query.
+    Returns {(origin, destination): flights sorted by DEPARTURE_DT}.
+    """
+    cities = sorted({c for pair in pairs for c in pair})
+    placeholders = ",".join(["%s"] * len(cities))
+    last_day = first_day + timedelta(days=1) + MAX_CONNECTION * MAX_STOPS   # date + whole days
+
+    rows = yield f"""
+        SELECT
+            f.FLIGHT_NUM,
+            r.ORIGIN,
+            r.DESTINATION,
+            f.DEPARTURE_DATE,
+            f.DEPARTURE_TIME,
+            f.DEPARTURE_DT,
+            f.ARRIVAL_DT,
+            f.DURATION,
+            f.ECONOMY_PRICE,
+            a.CAPACITY_ECONOMY + a.CAPACITY_BUSINESS - COALESCE(occ.SEATS_TAKEN, 0) AS FREE_SEATS
+        FROM ROUTE r
+        JOIN FLIGHT f
+          ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+        JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
+        LEFT JOIN FLIGHT_OCCUPANCY occ ON occ.FLIGHT_NUM = f.FLIGHT_NUM
+        WHERE r.ORIGIN IN ({placeholders})
+          AND r.DESTINATION IN ({placeholders})
+          AND f.DEPARTURE_DATE BETWEEN %s AND %s
+          AND f.FLIGHT_STATUS = 'ACTIVE'
+          AND f.DEPARTURE_DT > NOW()
+        ORDER BY f.DEPARTURE_DT
+    """, tuple(cities) + tuple(cities) + (first_day, last_day)
+
+    legs = {pair: [] for pair in pairs}
+    for f in rows:
+        key = (f["ORIGIN"], f["DESTINATION"])
+        if key in legs and f["FREE_SEATS"] >= passengers:
+            legs[key].append(f)
+    return legs
+
+
+def connecting_itineraries(cur, origin, destination, dep_date, passengers=1,
+                           max_stops=MAX_STOPS, sort="duration", limit=20):
+    """
+    Finds itineraries from origin to destination that leave on dep_date, with up to
+    max_stops connections of MIN_CONNECTION..MAX_CONNECTION each.
+    City paths come from the route directory; flights of all their legs are read in one
+    query and each next leg is found with a binary search on departure time.
+    Returns the best `limit` itineraries, ranked by total duration or by price.
+    """
+    return run_steps(cur, connecting_itineraries_steps(origin, destination, dep_date, passengers,
+                                                       max_stops, sort, limit))
+
+
+def connecting_itineraries_steps(origin, destination, dep_date, passengers=1,
+                                 max_stops=MAX_STOPS, sort="duration", limit=20):
+    """
+    Query steps of connecting_itineraries() (see db.run_steps).
+    """
+    max_stops = max(0, min(int(max_stops), MAX_STOPS))
+    directory = yield from route_directory_steps()
+    paths = directory.paths(origin, destination, max_stops)
+    if not paths:
+        return []
+
+    pairs = {(p[i], p[i + 1]) for p in paths for i in range(len(p) - 1)}
+    legs = yield from _connection_flights_steps(pairs, dep_date, passengers)
+    departures = {pair: [f["DEPARTURE_DT"] for f in flights] for pair, flights in legs.items()}
+
+    found = []
+
+    def extend(path, chain):
+        if len(found) >= MAX_ITINERARIES:
+            return
+        if len(chain) == len(path) - 1:
+            found.append(list(chain))
+            return
+        pair = (path[len(chain)], path[len(chain) + 1])
+        earliest = chain[-1]["ARRIVAL_DT"] + MIN_CONNECTION
+        latest = chain[-1]["ARRIVAL_DT"] + MAX_CONNECTION
+        flights = legs[pair]
+        i = bisect_left(departures[pair], earliest)
+        while i < len(flights) and flights[i]["DEPARTURE_DT"] <= latest:
+            chain.append(flights[i])
+            extend(path, chain)
+            chain.pop()
+            i += 1
+
+    for path in paths:
+        for first in legs[(path[0], path[1])]:
+            if first["DEPARTURE_DATE"] == dep_date:
+                extend(path, [first])
+
+    itineraries = []
+    for chain in found:
+        prices = [f["ECONOMY_PRICE"] for f in chain]
+        itineraries.append({
+            "legs": chain,
+            "stops": len(chain) - 1,
+            "departure": chain[0]["DEPARTURE_DT"],
+            "arrival": chain[-1]["ARRIVAL_DT"],
+            "duration": chain[-1]["ARRIVAL_DT"] - chain[0]["DEPARTURE_DT"],
+            "price": sum(prices) if None not in prices else None,
+        })
+
+    if sort == "price":
+        itineraries.sort(key=lambda it: (it["price"] is None, it["price"] or 0, it["duration"]))
+    else:
+        itineraries.sort(key=lambda it: (it["duration"], it["price"] is None, it["price"] or 0))
+    return itineraries[:limit]
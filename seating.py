@@ -0,0 +1,608 @@
+import argparse
+import threading
+import time
+from dataclasses import dataclass, field
+
+from mysql.connector import errors
+
+from db import db_cursor, run_steps
+from utils import create_seats_for_aircraft, seat_layout
+
+
+SEAT_MAP_TTL = 300   # seconds; also picks up SEAT changes made by other processes (e.g. --backfill)
+
+
+@dataclass
+class SeatQuote:
+    """
+    Result of pricing a seat selection for one flight.
+    seats holds the valid seats (code/row/col/class/price); taken and invalid hold bad codes.
+    """
+    flight_num: str
+    aircraft_id: str
+    economy_price: float
+    business_price: float
+    seats: list = field(default_factory=list)
+    taken: list = field(default_factory=list)
+    invalid: list = field(default_factory=list)
+
+    @property
+    def total_price(self):
+        return round(sum(s["price"] for s in self.seats), 2)
+
+    @property
+    def ok(self):
+        return bool(self.seats) and not self.taken and not self.invalid
+
+    def to_session(self):
+        """
+        Plain dict version of the quote, safe to keep in the Flask session.
+        """
+        return {
+            "flight_num": self.flight_num,
+            "aircraft_id": self.aircraft_id,
+            "economy_price": self.economy_price,
+            "business_price": self.business_price,
+            "seats": self.seats,
+        }
+
+    @classmethod
+    def from_session(cls, data):
+        if not data:
+            return None
+        return cls(
+            flight_num=data["flight_num"],
+            aircraft_id=data["aircraft_id"],
+            economy_price=float(data["economy_price"]),
+            business_price=float(data["business_price"]),
+            seats=list(data["seats"]),
+        )
+
+
+def parse_seat_code(code):
+    """
+    Turns a seat code like '12C' into (12, 'C').
+    Returns None if the code is not a row number followed by one letter.
+    """
+    code = (code or "").strip().upper()
+    if len(code) < 2 or not code[:-1].isdigit() or not code[-1].isalpha():
+        return None
+    return int(code[:-1]), code[-1]
+
+
+def quote_seats(cur, flight_num, seat_codes):
+    """
+    Prices a whole seat selection with ONE query: seat classes, flight prices and
+    the flight occupancy bitmap (to see which seats are already sold).
+    Returns a SeatQuote, or None if the flight does not exist.
+    """
+    wanted = []
+    invalid = []
+    for code in seat_codes:
+        parsed = parse_seat_code(code)
+        if parsed is None:
+            invalid.append((code or "").strip().upper())
+        elif parsed not in wanted:
+            wanted.append(parsed)
+
+    if wanted:
+        seat_filter = "(s.ROW_NUM, s.COL_LETTER) IN (" + ",".join(["(%s,%s)"] * len(wanted)) + ")"
+        params = [x for pair in wanted for x in pair]
+    else:
+        seat_filter = "FALSE"
+        params = []
+
+    cur.execute(f"""
+        SELECT
+          f.AIRCRAFT_ID, f.ECONOMY_PRICE, f.BUSINESS_PRICE,
+          s.ROW_NUM, s.COL_LETTER, s.CLASS,
+          occ.SEAT_BITMAP
+        FROM FLIGHT f
+        LEFT JOIN SEAT s
+          ON s.AIRCRAFT_ID = f.AIRCRAFT_ID
+         AND {seat_filter}
+        LEFT JOIN FLIGHT_OCCUPANCY occ
+          ON occ.FLIGHT_NUM = f.FLIGHT_NUM
+        WHERE f.FLIGHT_NUM = %s
+    """, tuple(params) + (flight_num,))
+    rows = cur.fetchall()
+
+    if not rows:
+        return None
+
+    first = rows[0]
+    quote = SeatQuote(
+        flight_num=flight_num,
+        aircraft_id=first["AIRCRAFT_ID"],
+        economy_price=float(first["ECONOMY_PRICE"] or 0),
+        business_price=float(first["BUSINESS_PRICE"] or 0),
+        invalid=invalid,
+    )
+
+    found = {}
+    for r in rows:
+        if r["ROW_NUM"] is not None:
+            found[(r["ROW_NUM"], r["COL_LETTER"])] = r
+
+    taken = set()
+    if found:
+        seat_map = get_seat_map(cur, quote.aircraft_id)
+        if first["SEAT_BITMAP"] is None:
+            taken = load_occupancy(cur, flight_num, seat_map)
+        else:
+            taken = seats_from_mask(seat_map, first["SEAT_BITMAP"])
+
+    for row_num, col in wanted:
+        code = f"{row_num}{col}"
+        r = found.get((row_num, col))
+        if r is None:
+            quote.invalid.append(code)
+            continue
+        if (row_num, col) in taken:
+            quote.taken.append(code)
+            continue
+
+        seat_class = r["CLASS"]
+        price = quote.business_price if seat_class == "BUSINESS" else quote.economy_price
+        quote.seats.append({"code": code, "row": row_num, "col": col, "class": seat_class, "price": price})
+
+    return quote
+
+
+def order_seats(cur, order_ids):
+    """
+    Seats of many orders with one query.
+    Returns {O_ID: [{"seat_code", "seat_class"}, ...]} sorted by row and column.
+    """
+    return run_steps(cur, order_seats_steps(order_ids))
+
+
+def order_seats_steps(order_ids):
+    """
+    Query steps of order_seats() (see db.run_steps).
+    """
+    seats = {o_id: [] for o_id in order_ids}
+    if not seats:
+        return seats
+
+    placeholders = ",".join(["%s"] * len(seats))
+    rows = yield f"""
+        SELECT os.O_ID, CONCAT(os.ROW_NUM, os.COL_LETTER) AS seat_code, s.CLASS AS seat_class
+        FROM ORDER_SEAT os
+        JOIN SEAT s
+          ON s.AIRCRAFT_ID=os.AIRCRAFT_ID
+         AND s.ROW_NUM=os.ROW_NUM
+         AND s.COL_LETTER=os.COL_LETTER
+        WHERE os.O_ID IN ({placeholders})
+        ORDER BY os.O_ID, os.ROW_NUM, os.COL_LETTER
+    """, tuple(seats)
+    for r in rows:
+        seats[r.pop("O_ID")].append(r)
+    return seats
+
+
+class SeatMap:
+    """
+    Seat grid of one aircraft: the left/middle/right columns and the class of every seat.
+    Classes are kept in one bytearray (row-major, b'B'/b'E', b'.' = no seat).
+    """
+
+    CODES = {"BUSINESS": ord("B"), "ECONOMY": ord("E")}
+    NAMES = {ord("B"): "BUSINESS", ord("E"): "ECONOMY"}
+    EMPTY = ord(".")
+
+    def __init__(self, aircraft_id, cols_left, cols_mid, cols_right, seats):
+        self.aircraft_id = aircraft_id
+        self.cols_left = cols_left
+        self.cols_mid = cols_mid
+        self.cols_right = cols_right
+        self.cols = cols_left + cols_mid + cols_right
+        self._col_pos = {c: i for i, c in enumerate(self.cols)}
+
+        self.row_numbers = sorted({s["ROW_NUM"] for s in seats})
+        self._row_pos = {r: i for i, r in enumerate(self.row_numbers)}
+
+        self.grid = bytearray([self.EMPTY]) * (len(self.row_numbers) * len(self.cols))
+        for s in seats:
+            idx = self.index(s["ROW_NUM"], s["COL_LETTER"])
+            if idx is not None:
+                self.grid[idx] = self.CODES.get(s["CLASS"], self.EMPTY)
+
+        self.seat_count = sum(1 for b in self.grid if b != self.EMPTY)
+        self.loaded_at = time.monotonic()
+        self._rows_map = None
+
+    def index(self, row_num, col):
+        """
+        Position of a seat inside the grid, or None if it is not part of this layout.
+        """
+        r = self._row_pos.get(row_num)
+        c = self._col_pos.get(col)
+        if r is None or c is None:
+            return None
+        return r * len(self.cols) + c
+
+    def seat_class(self, row_num, col):
+        idx = self.index(row_num, col)
+        if idx is None:
+            return None
+        return self.NAMES.get(self.grid[idx])
+
+    @property
+    def rows_map(self):
+        """
+        {row: {col: class}} view used by the seat_select template (built once).
+        """
+        if self._rows_map is None:
+            rows_map = {}
+            width = len(self.cols)
+            for r_i, r in enumerate(self.row_numbers):
+                row = {}
+                for c_i, c in enumerate(self.cols):
+                    name = self.NAMES.get(self.grid[r_i * width + c_i])
+                    if name:
+                        row[c] = name
+                rows_map[r] = row
+            self._rows_map = rows_map
+        return self._rows_map
+
+
+_seat_maps = {}
+_seat_maps_lock = threading.Lock()
+
+
+def get_seat_map(cur, aircraft_id):
+    """
+    Returns the cached SeatMap of an aircraft, loading it from SEAT on the first call.
+    A seat grid normally never changes after the aircraft is created, so it stays cached
+    until invalidate_seat_map() is called or it is older than SEAT_MAP_TTL (older aircraft
+    without seats are fixed with `python seating.py --backfill`, from another process).
+    """
+    return run_steps(cur, seat_map_steps(aircraft_id))
+
+
+def seat_map_steps(aircraft_id):
+    """
+    Query steps of get_seat_map() (see db.run_steps).
+    """
+    with _seat_maps_lock:
+        seat_map = _seat_maps.get(aircraft_id)
+    if seat_map is not None and time.monotonic() - seat_map.loaded_at < SEAT_MAP_TTL:
+        return seat_map
+
+    rows = yield """
+        SELECT MANUFACTURER, SIZE, CAPACITY_ECONOMY, CAPACITY_BUSINESS
+        FROM AIRCRAFT
+        WHERE AIRCRAFT_ID=%s
+        LIMIT 1
+    """, (aircraft_id,)
+    if not rows:
+        return None
+    a = rows[0]
+
+    seats = yield """
+        SELECT ROW_NUM, COL_LETTER, CLASS
+        FROM SEAT
+        WHERE AIRCRAFT_ID=%s
+        ORDER BY ROW_NUM, COL_LETTER
+    """, (aircraft_id,)
+
+    cols_left, cols_mid, cols_right = seat_layout(a["MANUFACTURER"], a["SIZE"])
+    seat_map = SeatMap(aircraft_id, cols_left, cols_mid, cols_right, seats)
+
+    if seats:
+        with _seat_maps_lock:
+            _seat_maps[aircraft_id] = seat_map
+    return seat_map
+
+
+def invalidate_seat_map(aircraft_id=None):
+    """
+    Drops one aircraft (or every aircraft, if None) from the seat-map cache.
+    """
+    with _seat_maps_lock:
+        if aircraft_id is None:
+            _seat_maps.clear()
+        else:
+            _seat_maps.pop(aircraft_id, None)
+
+
+def seats_mask(seat_map, seats):
+    """
+    Builds a bitmap (bytes) with one bit set for every (row, col) in seats.
+    Bit i matches position i of seat_map.grid.
+    """
+    bits = bytearray((len(seat_map.grid) + 7) // 8)
+    for row_num, col in seats:
+        idx = seat_map.index(row_num, col)
+        if idx is not None:
+            bits[idx // 8] |= 1 << (idx % 8)
+    return bytes(bits)
+
+
+def seats_from_mask(seat_map, bitmap):
+    """
+    Turns a bitmap back into a set of (row, col) seats.
+    """
+    width = len(seat_map.cols)
+    seats = set()
+    for byte_i, byte in enumerate(bitmap or b""):
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte & (1 << bit):
+                idx = byte_i * 8 + bit
+                if idx < len(seat_map.grid):
+                    seats.add((seat_map.row_numbers[idx // width], seat_map.cols[idx % width]))
+    return seats
+
+
+def free_seats_by_class(seat_map, bitmap):
+    """
+    Counts the free seats of each class, given the occupancy bitmap of a flight.
+    """
+    free = {"ECONOMY": 0, "BUSINESS": 0}
+    bitmap = bitmap or b""
+    for idx, code in enumerate(seat_map.grid):
+        if code == SeatMap.EMPTY:
+            continue
+        byte_i = idx // 8
+        if byte_i < len(bitmap) and bitmap[byte_i] & (1 << (idx % 8)):
+            continue
+        free[SeatMap.NAMES[code]] += 1
+    return free
+
+
+def _build_occupancy_steps(flight_num, seat_map):
+    """
+    Creates the FLIGHT_OCCUPANCY row of a flight from its ACTIVE orders.
+    Only runs once per flight; after that the row is updated incrementally.
+    """
+    rows = yield """
+        SELECT os.ROW_NUM, os.COL_LETTER
+        FROM ORDER_SEAT os
+        JOIN F_ORDER o ON os.O_ID = o.O_ID
+        WHERE o.FLIGHT_NUM=%s AND o.O_STATUS='ACTIVE'
+    """, (flight_num,)
+    taken = set((x["ROW_NUM"], x["COL_LETTER"]) for x in rows)
+
+    yield """
+        INSERT IGNORE INTO FLIGHT_OCCUPANCY (FLIGHT_NUM, SEAT_BITMAP, SEATS_TAKEN)
+        VALUES (%s,%s,%s)
+    """, (flight_num, seats_mask(seat_map, taken), len(taken))
+
+
+def _build_occupancy(cur, flight_num, seat_map):
+    run_steps(cur, _build_occupancy_steps(flight_num, seat_map))
+
+
+def load_occupancy(cur, flight_num, seat_map):
+    """
+    Returns the set of taken (row, col) seats of a flight, read from its occupancy bitmap.
+    """
+    return run_steps(cur, occupancy_steps(flight_num, seat_map))
+
+
+def occupancy_bitmap_steps(flight_num, seat_map):
+    """
+    Query steps that return the occupancy bitmap of a flight, building it on first use.
+    """
+    sql = "SELECT SEAT_BITMAP FROM FLIGHT_OCCUPANCY WHERE FLIGHT_NUM=%s"
+    rows = yield sql, (flight_num,)
+    if not rows:
+        yield from _build_occupancy_steps(flight_num, seat_map)
+        rows = yield sql, (flight_num,)
+    return rows[0]["SEAT_BITMAP"] if rows else b""
+
+
+def occupancy_steps(flight_num, seat_map):
+    """
+    Query steps of load_occupancy() (see db.run_steps).
+    """
+    bitmap = yield from occupancy_bitmap_steps(flight_num, seat_map)
+    return seats_from_mask(seat_map, bitmap)
+
+
+def _mask_size(seat_map):
+    return (len(seat_map.grid) + 7) // 8
+
+
+def _ensure_occupancy(cur, flight_num, seat_map):
+    """
+    Makes sure the flight has an occupancy row laid out for the current seat grid, and
+    returns that grid. On a length mismatch the cached seat map may be the stale one (the
+    row was rebuilt by a process that saw newer seats), so it is reloaded first; a row that
+    still does not fit is rebuilt from the orders: bitwise operations need equal lengths.
+    """
+    cur.execute("SELECT LENGTH(SEAT_BITMAP) AS SIZE FROM FLIGHT_OCCUPANCY WHERE FLIGHT_NUM=%s", (flight_num,))
+    row = cur.fetchone()
+    if row and row["SIZE"] == _mask_size(seat_map):
+        return seat_map
+    if row:
+        invalidate_seat_map(seat_map.aircraft_id)
+        seat_map = get_seat_map(cur, seat_map.aircraft_id) or seat_map
+        if row["SIZE"] == _mask_size(seat_map):
+            return seat_map
+        drop_occupancy(cur, flight_num)
+    _build_occupancy(cur, flight_num, seat_map)
+    return seat_map
+
+
+def occupy_seats(cur, flight_num, seat_map, seats):
+    """
+    Marks seats as taken with one atomic UPDATE (test-and-set on the bitmap).
+    Returns False, and changes nothing, if any of the seats is already taken.
+    Raises ValueError for a seat that is not part of the aircraft's seat grid.
+    """
+    seat_map = _ensure_occupancy(cur, flight_num, seat_map)
+
+    unknown = [f"{r}{c}" for r, c in seats if seat_map.index(r, c) is None]
+    if unknown:
+        raise ValueError(f"Unknown seats: {', '.join(unknown)}")
+
+    # the masks are sent as binary strings, so & and | work on the bytes, not on numbers;
+    # SEATS_TAKEN grows by the bits really set (a seat listed twice counts once)
+    mask = seats_mask(seat_map, seats)
+    cur.execute("""
+        UPDATE FLIGHT_OCCUPANCY
+        SET SEAT_BITMAP = SEAT_BITMAP | CAST(%s AS BINARY),
+            SEATS_TAKEN = SEATS_TAKEN + %s
+        WHERE FLIGHT_NUM=%s
+          AND BIT_COUNT(SEAT_BITMAP & CAST(%s AS BINARY)) = 0
+    """, (mask, sum(bin(b).count("1") for b in mask), flight_num, mask))
+    return cur.rowcount == 1
+
+
+def release_seats(cur, flight_num, seat_map, seats):
+    """
+    Frees seats in the occupancy bitmap (after an order is cancelled).
+    """
+    seat_map = _ensure_occupancy(cur, flight_num, seat_map)
+
+    mask = seats_mask(seat_map, seats)
+    cur.execute("""
+        UPDATE FLIGHT_OCCUPANCY
+        SET SEATS_TAKEN = SEATS_TAKEN - BIT_COUNT(SEAT_BITMAP & CAST(%s AS BINARY)),
+            SEAT_BITMAP = SEAT_BITMAP & ~CAST(%s AS BINARY)
+        WHERE FLIGHT_NUM=%s
+    """, (mask, mask, flight_num))
+
+
+def drop_occupancy(cur, flight_num):
+    """
+    Removes the occupancy row of a flight (used when the flight is cancelled).
+    """
+    cur.execute("DELETE FROM FLIGHT_OCCUPANCY WHERE FLIGHT_NUM=%s", (flight_num,))
+
+
+HOLD_TTL_SECONDS = 10 * 60   # how long selected seats stay reserved before checkout
+
+
+def hold_seats(cur, flight_num, hold_id, seats):
+    """
+    Reserves seats for one buyer (hold_id) for HOLD_TTL_SECONDS.
+    All seats are inserted in one statement, so either every seat is held or none is.
+    Returns False if another buyer already holds one of them.
+    """
+    seats = sorted(set(seats))
+    pairs = ",".join(["(%s,%s)"] * len(seats))
+    flat = [x for pair in seats for x in pair]
+
+    # A buyer only holds one selection at a time; expired holds of other buyers are dropped.
+    cur.execute("DELETE FROM SEAT_HOLD WHERE HOLD_ID=%s", (hold_id,))
+    cur.execute(f"""
+        DELETE FROM SEAT_HOLD
+        WHERE FLIGHT_NUM=%s
+          AND EXPIRES_AT <= NOW()
+          AND (ROW_NUM, COL_LETTER) IN ({pairs})
+    """, (flight_num, *flat))
+
+    values = ",".join(["(%s,%s,%s,%s, NOW() + INTERVAL %s SECOND)"] * len(seats))
+    params = []
+    for row_num, col in seats:
+        params += [flight_num, row_num, col, hold_id, HOLD_TTL_SECONDS]
+
+    try:
+        cur.execute(f"""
+            INSERT INTO SEAT_HOLD (FLIGHT_NUM, ROW_NUM, COL_LETTER, HOLD_ID, EXPIRES_AT)
+            VALUES {values}
+        """, tuple(params))
+    except errors.DatabaseError as e:
+        # 1062 = seat already held, 1213/1205 = lost a race with another buyer
+        if e.errno in (1062, 1213, 1205):
+            return False
+        raise
+    return True
+
+
+def held_by_others(cur, flight_num, hold_id):
+    """
+    Returns the (row, col) seats of a flight that other buyers are holding right now.
+    """
+    return run_steps(cur, held_by_others_steps(flight_num, hold_id))
+
+
+def held_by_others_steps(flight_num, hold_id):
+    """
+    Query steps of held_by_others() (see db.run_steps).
+    """
+    rows = yield """
+        SELECT ROW_NUM, COL_LETTER
+        FROM SEAT_HOLD
+        WHERE FLIGHT_NUM=%s
+          AND EXPIRES_AT > NOW()
+          AND HOLD_ID <> %s
+    """, (flight_num, hold_id or "")
+    return set((x["ROW_NUM"], x["COL_LETTER"]) for x in rows)
+
+
+def hold_is_valid(cur, flight_num, hold_id, seats):
+    """
+    Checks that the buyer still holds every one of the given seats (hold not expired).
+    """
+    if not hold_id:
+        return False
+    cur.execute("""
+        SELECT ROW_NUM, COL_LETTER
+        FROM SEAT_HOLD
+        WHERE FLIGHT_NUM=%s
+          AND HOLD_ID=%s
+          AND EXPIRES_AT > NOW()
+    """, (flight_num, hold_id))
+    held = set((x["ROW_NUM"], x["COL_LETTER"]) for x in cur.fetchall())
+    return set(seats) <= held
+
+
+def release_hold(cur, hold_id):
+    """
+    Removes every seat held by a buyer (after checkout or when starting over).
+    """
+    cur.execute("DELETE FROM SEAT_HOLD WHERE HOLD_ID=%s", (hold_id,))
+
+
+def purge_expired_holds(cur, limit=1000):
+    """
+    Deletes up to `limit` expired holds. Returns how many rows were removed.
+    """
+    cur.execute("DELETE FROM SEAT_HOLD WHERE EXPIRES_AT <= NOW() LIMIT %s", (limit,))
+    return cur.rowcount
+
+
+def backfill_seats(cur):
+    """
+    Creates the missing SEAT rows of every aircraft that has fewer seats than its capacity.
+    Returns {aircraft_id: seats added}.
+    """
+    cur.execute("""
+        SELECT a.AIRCRAFT_ID, a.CAPACITY_ECONOMY, a.CAPACITY_BUSINESS
+        FROM AIRCRAFT a
+        LEFT JOIN SEAT s ON s.AIRCRAFT_ID = a.AIRCRAFT_ID
+        GROUP BY a.AIRCRAFT_ID, a.CAPACITY_ECONOMY, a.CAPACITY_BUSINESS
+        HAVING COUNT(s.AIRCRAFT_ID) < COALESCE(a.CAPACITY_ECONOMY, 0) + COALESCE(a.CAPACITY_BUSINESS, 0)
+    """)
+    added = {}
+    for a in cur.fetchall():
+        added[a["AIRCRAFT_ID"]] = create_seats_for_aircraft(
+            cur, a["AIRCRAFT_ID"], int(a["CAPACITY_ECONOMY"] or 0), int(a["CAPACITY_BUSINESS"] or 0)
+        )
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seat grid maintenance.")
+    parser.add_argument("--backfill", action="store_true", help="create missing seats of existing aircraft")
+    args = parser.parse_args()
+
+    if args.backfill:
+        with db_cursor() as (db, cur):
+            db.start_transaction()
+            added = backfill_seats(cur)
+            db.commit()
+        for aircraft_id, count in added.items():
+            print(f"{aircraft_id}: {count} seats added")
+        print(f"{len(added)} aircraft backfilled.")
+        if added:
+            print(f"Running web workers load the new seat grids within {SEAT_MAP_TTL} seconds "
+                  "(restart them to use them at once).")
+    else:
+        parser.print_help()
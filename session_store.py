@@ -0,0 +1,261 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+
+
+SESSION_TTL = float(os.environ.get("FLYTAU_SESSION_TTL", "86400"))         # idle seconds before a session expires
+SESSION_MAX_ENTRIES = int(os.environ.get("FLYTAU_SESSION_MAX", "10000"))   # in-process store size (LRU)
+SESSION_DB = os.environ.get("FLYTAU_SESSION_DB", "")   # SQLite file shared by all workers; empty = in-process store
+WORKERS = int(os.environ.get("WEB_CONCURRENCY", "1"))   # worker processes (gunicorn reads the same variable)
+SQLITE_PURGE_EVERY = 500                                # writes between deletes of expired rows
+
+_serializer = TaggedJSONSerializer()   # same format as Flask's cookie sessions (dates, tuples...)
+
+
+class MemorySessionStore:
+    """
+    Sessions of this process in an LRU dict: sid -> (serialized data, last used).
+    Fastest option, but sessions are lost on restart and not shared between workers.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits_total": 0, "misses_total": 0, "writes_total": 0,
+                      "deletes_total": 0, "evictions_total": 0}
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            now = time.monotonic()
+            if entry is None or now - entry[1] > self.ttl:
+                self._entries.pop(sid, None)
+                self.stats["misses_total"] += 1
+                return None
+            self._entries[sid] = (entry[0], now)
+            self._entries.move_to_end(sid)
+            self.stats["hits_total"] += 1
+            return entry[0]
+
+    def set(self, sid, data):
+        with self._lock:
+            self._entries[sid] = (data, time.monotonic())
+            self._entries.move_to_end(sid)
+            self.stats["writes_total"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions_total"] += 1
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+            self.stats["deletes_total"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats)
+            out["entries"] = len(self._entries)
+        return out
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a local SQLite file, so every worker process on the host shares them
+    and they survive restarts. Each thread keeps its own connection.
+    """
+
+    def __init__(self, path, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"hits_total": 0, "misses_total": 0, "writes_total": 0,
+                      "deletes_total": 0, "evictions_total": 0}
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS FLYTAU_SESSION (
+                SID TEXT PRIMARY KEY,
+                DATA TEXT NOT NULL,
+                EXPIRES REAL NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        cnx = getattr(self._local, "cnx", None)
+        if cnx is None:
+            cnx = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            cnx.execute("PRAGMA journal_mode=WAL")
+            self._local.cnx = cnx
+        return cnx
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def get(self, sid):
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT DATA, EXPIRES FROM FLYTAU_SESSION WHERE SID = ?", (sid,)
+        ).fetchone()
+        if row is None or row[1] < now:
+            self._count("misses_total")
+            return None
+        if row[1] - now < self.ttl / 2:
+            # push the expiry forward now and then, not on every read
+            self._conn().execute("UPDATE FLYTAU_SESSION SET EXPIRES = ? WHERE SID = ?", (now + self.ttl, sid))
+        self._count("hits_total")
+        return row[0]
+
+    def set(self, sid, data):
+        now = time.time()
+        cnx = self._conn()
+        cnx.execute(
+            "INSERT OR REPLACE INTO FLYTAU_SESSION (SID, DATA, EXPIRES) VALUES (?, ?, ?)",
+            (sid, data, now + self.ttl),
+        )
+        with self._lock:
+            self.stats["writes_total"] += 1
+            self._writes += 1
+            purge = self._writes % SQLITE_PURGE_EVERY == 0
+        if purge:
+            n = cnx.execute("DELETE FROM FLYTAU_SESSION WHERE EXPIRES < ?", (now,)).rowcount
+            self._count("evictions_total", n)
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM FLYTAU_SESSION WHERE SID = ?", (sid,))
+        self._count("deletes_total")
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats)
+        out["entries"] = self._conn().execute("SELECT COUNT(*) FROM FLYTAU_SESSION").fetchone()[0]
+        return out
+
+
+class ServerSession(SessionMixin):
+    """
+    Session whose data lives in a session store; the cookie only holds its id.
+    The data is read from the store the first time the request touches the session.
+    """
+
+    def __init__(self, store, sid=None):
+        self.store = store
+        self.sid = sid
+        self.cookie_sid = sid     # id the browser sent (None = no cookie yet)
+        self.loaded = None        # serialized data as read from the store
+        self._data = None if sid else {}
+        self.modified = False
+        self.accessed = False
+
+    @property
+    def data(self):
+        self.accessed = True
+        if self._data is None:
+            self.loaded = self.store.get(self.sid)
+            if self.loaded is None:
+                self.sid = None   # expired or unknown id: start a new session
+                self._data = {}
+            else:
+                self._data = _serializer.loads(self.loaded)
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        """
+        Empties the session and drops its id: the old entry is deleted from the store
+        and new data gets a fresh id (so logging in never keeps a pre-login id).
+        """
+        if self.sid:
+            self.store.delete(self.sid)
+        self.sid = None
+        self.loaded = None
+        self.accessed = True
+        self._data = {}
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask session backend that keeps sessions in a store and only a random id in the cookie.
+    The store is written once at the end of a request, and only if the data really changed
+    (session.modified alone does not cause a write); the cookie is only sent for new ids.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        return ServerSession(self.store, sid or None)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session._data is None:
+            return   # the request never looked at the session
+
+        if not session._data:
+            if session.sid:
+                self.store.delete(session.sid)
+            if session.cookie_sid:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        data = _serializer.dumps(session._data)
+        if data != session.loaded:
+            if session.sid is None:
+                session.sid = secrets.token_urlsafe(32)
+            self.store.set(session.sid, data)
+
+        if session.sid != session.cookie_sid:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def make_session_interface():
+    """
+    Session backend of this process: SQLite when FLYTAU_SESSION_DB is set, else in-process.
+    With more than one worker process (WEB_CONCURRENCY > 1) FLYTAU_SESSION_DB is required:
+    an in-process store would only know the sessions its own worker created.
+    """
+    if not SESSION_DB and WORKERS > 1:
+        raise RuntimeError("FLYTAU_SESSION_DB must be set when running more than one worker "
+                           "(the in-process session store is not shared between workers).")
+    store = SQLiteSessionStore(SESSION_DB) if SESSION_DB else MemorySessionStore()
+    return ServerSessionInterface(store)
@@ -0,0 +1,35 @@
+-- ============================================================
+-- Upgrade for an existing FLYTAU database:
+-- indexed departure/arrival datetime columns on FLIGHT.
+-- (A fresh install from sql_migration.sql already has them.)
+-- ============================================================
+
+USE FLYTAU;
+
+ALTER TABLE FLIGHT
+  ADD COLUMN DEPARTURE_DT DATETIME AS (TIMESTAMP(DEPARTURE_DATE, DEPARTURE_TIME)) STORED,
+  ADD COLUMN ARRIVAL_DT DATETIME AS (TIMESTAMP(ARRIVAL_DATE, ARRIVAL_TIME)) STORED;
+
+ALTER TABLE FLIGHT
+  ADD INDEX IDX_FLIGHT_STATUS_ARRIVAL (FLIGHT_STATUS, ARRIVAL_DT),
+  ADD INDEX IDX_FLIGHT_AIRCRAFT_DEPARTURE (AIRCRAFT_ID, DEPARTURE_DT),
+  ADD INDEX IDX_FLIGHT_ROUTE_DATE_STATUS (ROUTE_ID, DEPARTURE_DATE, FLIGHT_STATUS);
+
+-- ------------------------------------------------------------
+-- Check the plans (type should be "range"/"ref", not "ALL"):
+-- ------------------------------------------------------------
+-- Flight sweeper (status + arrival):
+EXPLAIN SELECT FLIGHT_NUM FROM FLIGHT
+WHERE FLIGHT_STATUS IN ('ACTIVE','FULL') AND ARRIVAL_DT <= NOW();
+
+-- aircraft_available (aircraft + departure):
+EXPLAIN SELECT 1 FROM FLIGHT
+WHERE AIRCRAFT_ID = 'AC001' AND FLIGHT_STATUS <> 'CANCELLED'
+  AND DEPARTURE_DT < '2026-02-01 12:00:00' AND ARRIVAL_DT > '2026-02-01 08:00:00'
+LIMIT 1;
+
+-- flight_search (route + date + status):
+EXPLAIN SELECT f.FLIGHT_NUM FROM FLIGHT f
+JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
+WHERE f.FLIGHT_STATUS = 'ACTIVE' AND r.ORIGIN = 'TLV' AND r.DESTINATION = 'LCA'
+  AND f.DEPARTURE_DATE = '2026-01-12' AND f.DEPARTURE_DT > NOW();
@@ -0,0 +1,17 @@
+-- ============================================================
+-- Upgrade for an existing FLYTAU database:
+-- per-flight seat occupancy bitmap.
+-- (A fresh install from sql_migration.sql already has it.)
+-- Rows are created by the app the first time a flight's seats are used,
+-- so no backfill is needed here.
+-- ============================================================
+
+USE FLYTAU;
+
+CREATE TABLE IF NOT EXISTS FLIGHT_OCCUPANCY (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+SEAT_BITMAP VARBINARY(1024) NOT NULL,
+SEATS_TAKEN INT NOT NULL DEFAULT 0,
+PRIMARY KEY (FLIGHT_NUM),
+FOREIGN KEY (FLIGHT_NUM) REFERENCES FLIGHT(FLIGHT_NUM)
+);
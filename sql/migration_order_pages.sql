@@ -0,0 +1,33 @@
+-- ============================================================
+-- Upgrade for an existing FLYTAU database:
+-- the flight's departure time copied into F_ORDER, and indexes for the
+-- registered customer's orders page (by email, optionally status, then departure).
+-- (A fresh install from sql_migration.sql already has them.)
+-- ============================================================
+
+USE FLYTAU;
+
+ALTER TABLE F_ORDER
+  ADD COLUMN DEPARTURE_DT DATETIME NULL;
+
+UPDATE F_ORDER o
+JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+SET o.DEPARTURE_DT = f.DEPARTURE_DT;
+
+ALTER TABLE F_ORDER
+  ADD INDEX IDX_ORDER_REGISTER_STATUS_DEPARTURE (R_MAIL, O_STATUS, DEPARTURE_DT, O_ID),
+  ADD INDEX IDX_ORDER_REGISTER_DEPARTURE (R_MAIL, DEPARTURE_DT, O_ID);
+
+-- ------------------------------------------------------------
+-- Check the plans (type should be "ref"/"range" and no "Using filesort"):
+-- ------------------------------------------------------------
+EXPLAIN SELECT O_ID FROM F_ORDER
+WHERE R_MAIL = 'roni@mail.com' AND O_STATUS = 'ACTIVE'
+  AND (DEPARTURE_DT > '2026-01-01 08:00:00' OR (DEPARTURE_DT = '2026-01-01 08:00:00' AND O_ID > 'O400'))
+ORDER BY DEPARTURE_DT, O_ID
+LIMIT 11;
+
+EXPLAIN SELECT O_ID FROM F_ORDER
+WHERE R_MAIL = 'roni@mail.com'
+ORDER BY DEPARTURE_DT, O_ID
+LIMIT 11;
@@ -0,0 +1,161 @@
+-- ============================================================
+-- Upgrade for an existing FLYTAU database:
+-- pre-aggregated fact tables read by the manager reports,
+-- and the F_ORDER index used to refresh them by order date.
+-- (A fresh install from sql_migration.sql already has them.)
+-- Run once; afterwards the app keeps the facts up to date.
+-- To rebuild them later: python reports.py --rebuild-facts
+-- ============================================================
+
+USE FLYTAU;
+
+CREATE TABLE IF NOT EXISTS FLIGHT_FACT (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+AIRCRAFT_ID VARCHAR(45) NOT NULL,
+DEPARTURE_DATE DATE,
+FLIGHT_STATUS VARCHAR(20),
+ORIGIN VARCHAR(45) NOT NULL,
+DESTINATION VARCHAR(45) NOT NULL,
+CAPACITY INT NOT NULL,
+SEATS_COMPLETED INT NOT NULL DEFAULT 0,
+PRIMARY KEY (FLIGHT_NUM),
+INDEX IDX_FLIGHT_FACT_STATUS_DATE (FLIGHT_STATUS, DEPARTURE_DATE),
+INDEX IDX_FLIGHT_FACT_AIRCRAFT_DATE (AIRCRAFT_ID, DEPARTURE_DATE)
+);
+
+CREATE TABLE IF NOT EXISTS FLIGHT_CLASS_FACT (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+CLASS VARCHAR(10) NOT NULL,
+SEATS_SOLD INT NOT NULL DEFAULT 0,
+REVENUE DECIMAL(14,4) NOT NULL DEFAULT 0,
+PRIMARY KEY (FLIGHT_NUM, CLASS)
+);
+
+CREATE TABLE IF NOT EXISTS ORDER_DAY_FACT (
+O_DATE DATE NOT NULL,
+CLASS VARCHAR(10) NOT NULL,
+ORDERS INT NOT NULL DEFAULT 0,
+CANCELLED_ORDERS INT NOT NULL DEFAULT 0,
+PRIMARY KEY (CLASS, O_DATE)
+);
+
+CREATE TABLE IF NOT EXISTS AIRCRAFT_MONTH_FACT (
+AIRCRAFT_ID VARCHAR(45) NOT NULL,
+F_YEAR INT NOT NULL,
+F_MONTH INT NOT NULL,
+ORIGIN VARCHAR(45) NOT NULL,
+DESTINATION VARCHAR(45) NOT NULL,
+TOTAL_FLIGHTS INT NOT NULL DEFAULT 0,
+COMPLETED_FLIGHTS INT NOT NULL DEFAULT 0,
+CANCELLED_FLIGHTS INT NOT NULL DEFAULT 0,
+PRIMARY KEY (AIRCRAFT_ID, F_YEAR, F_MONTH, ORIGIN, DESTINATION)
+);
+
+ALTER TABLE F_ORDER ADD INDEX IDX_ORDER_DATE (O_DATE);
+
+DELETE FROM AIRCRAFT_MONTH_FACT;
+DELETE FROM ORDER_DAY_FACT;
+DELETE FROM FLIGHT_CLASS_FACT;
+DELETE FROM FLIGHT_FACT;
+
+INSERT INTO FLIGHT_FACT
+(FLIGHT_NUM, AIRCRAFT_ID, DEPARTURE_DATE, FLIGHT_STATUS, ORIGIN, DESTINATION, CAPACITY, SEATS_COMPLETED)
+SELECT
+    f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, f.FLIGHT_STATUS,
+    COALESCE(r.ORIGIN, ''), COALESCE(r.DESTINATION, ''),
+    COALESCE(a.CAPACITY_ECONOMY, 0) + COALESCE(a.CAPACITY_BUSINESS, 0),
+    COUNT(DISTINCT os.AIRCRAFT_ID, os.ROW_NUM, os.COL_LETTER)
+FROM FLIGHT f
+JOIN ROUTE r ON r.ROUTE_ID = f.ROUTE_ID AND r.DURATION = f.DURATION
+JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
+LEFT JOIN F_ORDER o
+    ON o.FLIGHT_NUM = f.FLIGHT_NUM
+   AND o.O_STATUS = 'COMPLETED'
+LEFT JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+GROUP BY f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, f.FLIGHT_STATUS,
+         r.ORIGIN, r.DESTINATION, a.CAPACITY_ECONOMY, a.CAPACITY_BUSINESS;
+
+INSERT INTO FLIGHT_CLASS_FACT (FLIGHT_NUM, CLASS, SEATS_SOLD, REVENUE)
+SELECT
+    f.FLIGHT_NUM, s.CLASS,
+    SUM(o.O_STATUS IN ('ACTIVE','COMPLETED')),
+    COALESCE(SUM(
+        CASE
+            WHEN o.O_STATUS IN ('ACTIVE','COMPLETED') THEN
+                CASE
+                    WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
+                    WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
+                END
+
+            WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+                 AND o.CANACELATION_DATE_TIME IS NOT NULL
+                 AND TIMESTAMPDIFF(HOUR, o.CANACELATION_DATE_TIME, f.DEPARTURE_DT) < 36
+            THEN
+                CASE
+                    WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
+                    WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
+                END
+
+            WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+                 AND o.CANACELATION_DATE_TIME IS NOT NULL
+                 AND TIMESTAMPDIFF(HOUR, o.CANACELATION_DATE_TIME, f.DEPARTURE_DT) >= 36
+            THEN
+                (0.05 * o.ORDER_PRICE) *
+                (1.0 / (
+                      SELECT COUNT(*)
+                      FROM ORDER_SEAT os2
+                      WHERE os2.O_ID = o.O_ID
+                ))
+
+            ELSE 0
+        END
+    ), 0)
+FROM FLIGHT f
+JOIN F_ORDER o ON o.FLIGHT_NUM = f.FLIGHT_NUM
+JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+JOIN SEAT s
+  ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+ AND s.ROW_NUM = os.ROW_NUM
+ AND s.COL_LETTER = os.COL_LETTER
+GROUP BY f.FLIGHT_NUM, s.CLASS;
+
+INSERT INTO ORDER_DAY_FACT (O_DATE, CLASS, ORDERS, CANCELLED_ORDERS)
+SELECT
+    o.O_DATE, 'ALL',
+    COUNT(*),
+    SUM(o.O_STATUS = 'CUSTOMER_CANCELLED' AND o.CANACELATION_DATE_TIME IS NOT NULL)
+FROM F_ORDER o
+JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+WHERE o.O_DATE IS NOT NULL
+GROUP BY o.O_DATE
+
+UNION ALL
+
+SELECT
+    o.O_DATE, s.CLASS,
+    COUNT(DISTINCT o.O_ID),
+    COUNT(DISTINCT CASE
+        WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+         AND o.CANACELATION_DATE_TIME IS NOT NULL
+        THEN o.O_ID END
+    )
+FROM F_ORDER o
+JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+JOIN SEAT s
+  ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+ AND s.ROW_NUM = os.ROW_NUM
+ AND s.COL_LETTER = os.COL_LETTER
+WHERE o.O_DATE IS NOT NULL
+GROUP BY o.O_DATE, s.CLASS;
+
+INSERT INTO AIRCRAFT_MONTH_FACT
+(AIRCRAFT_ID, F_YEAR, F_MONTH, ORIGIN, DESTINATION, TOTAL_FLIGHTS, COMPLETED_FLIGHTS, CANCELLED_FLIGHTS)
+SELECT
+    AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE), ORIGIN, DESTINATION,
+    COUNT(*),
+    SUM(FLIGHT_STATUS = 'COMPLETED'),
+    SUM(FLIGHT_STATUS = 'CANCELLED')
+FROM FLIGHT_FACT
+WHERE DEPARTURE_DATE IS NOT NULL
+GROUP BY AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE), ORIGIN, DESTINATION;
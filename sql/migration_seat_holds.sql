@@ -0,0 +1,19 @@
+-- ============================================================
+-- Upgrade for an existing FLYTAU database:
+-- short-lived seat holds between seat selection and checkout.
+-- (A fresh install from sql_migration.sql already has it.)
+-- ============================================================
+
+USE FLYTAU;
+
+CREATE TABLE IF NOT EXISTS SEAT_HOLD (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+ROW_NUM INT NOT NULL,
+COL_LETTER CHAR(1) NOT NULL,
+HOLD_ID VARCHAR(45) NOT NULL,
+EXPIRES_AT DATETIME NOT NULL,
+PRIMARY KEY (FLIGHT_NUM, ROW_NUM, COL_LETTER),
+INDEX IDX_SEAT_HOLD_HOLD (HOLD_ID),
+INDEX IDX_SEAT_HOLD_EXPIRES (EXPIRES_AT),
+FOREIGN KEY (FLIGHT_NUM) REFERENCES FLIGHT(FLIGHT_NUM)
+);
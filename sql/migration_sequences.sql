@@ -0,0 +1,24 @@
+-- ============================================================
+-- Upgrade for an existing FLYTAU database:
+-- counter table for order IDs / flight numbers.
+-- (A fresh install from sql_migration.sql already has it.)
+-- ============================================================
+
+USE FLYTAU;
+
+CREATE TABLE IF NOT EXISTS SEQUENCE_COUNTER (
+SEQ_NAME VARCHAR(45) NOT NULL,
+SEQ_VALUE INT NOT NULL,
+PRIMARY KEY (SEQ_NAME)
+);
+
+-- Start each counter after the highest ID that already exists.
+INSERT IGNORE INTO SEQUENCE_COUNTER (SEQ_NAME, SEQ_VALUE)
+SELECT 'FLIGHT', GREATEST(599, IFNULL(MAX(CAST(SUBSTRING(FLIGHT_NUM, 2) AS UNSIGNED)), 0))
+FROM FLIGHT
+WHERE FLIGHT_NUM LIKE 'F%';
+
+INSERT IGNORE INTO SEQUENCE_COUNTER (SEQ_NAME, SEQ_VALUE)
+SELECT 'ORDER', GREATEST(499, IFNULL(MAX(CAST(SUBSTRING(O_ID, 2) AS UNSIGNED)), 0))
+FROM F_ORDER
+WHERE O_ID LIKE 'O%';
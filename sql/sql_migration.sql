@@ -103,7 +103,12 @@ ARRIVAL_DATE DATE,
 ARRIVAL_TIME TIME,
 ECONOMY_PRICE DECIMAL(10,2),
 BUSINESS_PRICE DECIMAL(10,2),
+DEPARTURE_DT DATETIME AS (TIMESTAMP(DEPARTURE_DATE, DEPARTURE_TIME)) STORED,
+ARRIVAL_DT DATETIME AS (TIMESTAMP(ARRIVAL_DATE, ARRIVAL_TIME)) STORED,
 PRIMARY KEY (FLIGHT_NUM),
+INDEX IDX_FLIGHT_STATUS_ARRIVAL (FLIGHT_STATUS, ARRIVAL_DT),
+INDEX IDX_FLIGHT_AIRCRAFT_DEPARTURE (AIRCRAFT_ID, DEPARTURE_DT),
+INDEX IDX_FLIGHT_ROUTE_DATE_STATUS (ROUTE_ID, DEPARTURE_DATE, FLIGHT_STATUS),
 FOREIGN KEY (AIRCRAFT_ID) REFERENCES AIRCRAFT(AIRCRAFT_ID),
 FOREIGN KEY (ROUTE_ID, DURATION) REFERENCES ROUTE(ROUTE_ID, DURATION)
 );
@@ -118,7 +123,11 @@ O_DATE DATE,
 ORDER_PRICE DECIMAL(10,2),
 USER_TYPE ENUM("REGISTERD", "GUEST"),
 CANACELATION_DATE_TIME DATETIME NULL,
+DEPARTURE_DT DATETIME NULL,
 PRIMARY KEY (O_ID),
+INDEX IDX_ORDER_REGISTER_STATUS_DEPARTURE (R_MAIL, O_STATUS, DEPARTURE_DT, O_ID),
+INDEX IDX_ORDER_REGISTER_DEPARTURE (R_MAIL, DEPARTURE_DT, O_ID),
+INDEX IDX_ORDER_DATE (O_DATE),
 FOREIGN KEY (FLIGHT_NUM) REFERENCES FLIGHT(FLIGHT_NUM),
 FOREIGN KEY (G_MAIL) REFERENCES GUEST(G_MAIL),
 FOREIGN KEY (R_MAIL) REFERENCES REGISTER(R_MAIL)
@@ -160,6 +169,74 @@ CREATE TABLE ASSIGHNED_ATTENDANT (
   FOREIGN KEY (FLIGHT_NUM) REFERENCES FLIGHT(FLIGHT_NUM)
   );
 
+CREATE TABLE FLIGHT_OCCUPANCY (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+SEAT_BITMAP VARBINARY(1024) NOT NULL,
+SEATS_TAKEN INT NOT NULL DEFAULT 0,
+PRIMARY KEY (FLIGHT_NUM),
+FOREIGN KEY (FLIGHT_NUM) REFERENCES FLIGHT(FLIGHT_NUM)
+);
+
+CREATE TABLE SEAT_HOLD (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+ROW_NUM INT NOT NULL,
+COL_LETTER CHAR(1) NOT NULL,
+HOLD_ID VARCHAR(45) NOT NULL,
+EXPIRES_AT DATETIME NOT NULL,
+PRIMARY KEY (FLIGHT_NUM, ROW_NUM, COL_LETTER),
+INDEX IDX_SEAT_HOLD_HOLD (HOLD_ID),
+INDEX IDX_SEAT_HOLD_EXPIRES (EXPIRES_AT),
+FOREIGN KEY (FLIGHT_NUM) REFERENCES FLIGHT(FLIGHT_NUM)
+);
+
+CREATE TABLE SEQUENCE_COUNTER (
+SEQ_NAME VARCHAR(45) NOT NULL,
+SEQ_VALUE INT NOT NULL,
+PRIMARY KEY (SEQ_NAME)
+);
+
+CREATE TABLE FLIGHT_FACT (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+AIRCRAFT_ID VARCHAR(45) NOT NULL,
+DEPARTURE_DATE DATE,
+FLIGHT_STATUS VARCHAR(20),
+ORIGIN VARCHAR(45) NOT NULL,
+DESTINATION VARCHAR(45) NOT NULL,
+CAPACITY INT NOT NULL,
+SEATS_COMPLETED INT NOT NULL DEFAULT 0,
+PRIMARY KEY (FLIGHT_NUM),
+INDEX IDX_FLIGHT_FACT_STATUS_DATE (FLIGHT_STATUS, DEPARTURE_DATE),
+INDEX IDX_FLIGHT_FACT_AIRCRAFT_DATE (AIRCRAFT_ID, DEPARTURE_DATE)
+);
+
+CREATE TABLE FLIGHT_CLASS_FACT (
+FLIGHT_NUM VARCHAR(45) NOT NULL,
+CLASS VARCHAR(10) NOT NULL,
+SEATS_SOLD INT NOT NULL DEFAULT 0,
+REVENUE DECIMAL(14,4) NOT NULL DEFAULT 0,
+PRIMARY KEY (FLIGHT_NUM, CLASS)
+);
+
+CREATE TABLE ORDER_DAY_FACT (
+O_DATE DATE NOT NULL,
+CLASS VARCHAR(10) NOT NULL,
+ORDERS INT NOT NULL DEFAULT 0,
+CANCELLED_ORDERS INT NOT NULL DEFAULT 0,
+PRIMARY KEY (CLASS, O_DATE)
+);
+
+CREATE TABLE AIRCRAFT_MONTH_FACT (
+AIRCRAFT_ID VARCHAR(45) NOT NULL,
+F_YEAR INT NOT NULL,
+F_MONTH INT NOT NULL,
+ORIGIN VARCHAR(45) NOT NULL,
+DESTINATION VARCHAR(45) NOT NULL,
+TOTAL_FLIGHTS INT NOT NULL DEFAULT 0,
+COMPLETED_FLIGHTS INT NOT NULL DEFAULT 0,
+CANCELLED_FLIGHTS INT NOT NULL DEFAULT 0,
+PRIMARY KEY (AIRCRAFT_ID, F_YEAR, F_MONTH, ORIGIN, DESTINATION)
+);
+
 
 
 
@@ -554,6 +631,11 @@ VALUES
 ('O418','F402','guest1@mail.com',NULL,'COMPLETED','2026-02-02',1480.00,'GUEST',NULL),
 ('O419','F507','guest2@mail.com',NULL,'CUSTOMER_CANCELLED','2026-02-03',0.00,'GUEST','2026-02-10 09:00:00');
 
+-- the order keeps its flight's departure time (for paging the orders page)
+UPDATE F_ORDER o
+JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+SET o.DEPARTURE_DT = f.DEPARTURE_DT;
+
 -- ============================================================
 -- 4) ORDER_SEAT
 -- כלל: אנחנו מכניסים מושבים רק להזמנות COMPLETED (כמו אצלך)
@@ -617,6 +699,119 @@ INSERT INTO ORDER_SEAT (O_ID, AIRCRAFT_ID, ROW_NUM, COL_LETTER) VALUES
 ('O418','AC002',3,'A'),
 ('O418','AC002',3,'B');
 
+-- ============================================================
+-- 5) SEQUENCE_COUNTER (next IDs: F600..., O500...)
+-- ============================================================
+INSERT INTO SEQUENCE_COUNTER (SEQ_NAME, SEQ_VALUE) VALUES
+('FLIGHT',599),
+('ORDER',499);
+
+-- ============================================================
+-- 6) REPORT FACT TABLES (built from the flights/orders above;
+--    the app keeps them up to date, see reports.py)
+-- ============================================================
+INSERT INTO FLIGHT_FACT
+(FLIGHT_NUM, AIRCRAFT_ID, DEPARTURE_DATE, FLIGHT_STATUS, ORIGIN, DESTINATION, CAPACITY, SEATS_COMPLETED)
+SELECT
+    f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, f.FLIGHT_STATUS,
+    COALESCE(r.ORIGIN, ''), COALESCE(r.DESTINATION, ''),
+    COALESCE(a.CAPACITY_ECONOMY, 0) + COALESCE(a.CAPACITY_BUSINESS, 0),
+    COUNT(DISTINCT os.AIRCRAFT_ID, os.ROW_NUM, os.COL_LETTER)
+FROM FLIGHT f
+JOIN ROUTE r ON r.ROUTE_ID = f.ROUTE_ID AND r.DURATION = f.DURATION
+JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
+LEFT JOIN F_ORDER o
+    ON o.FLIGHT_NUM = f.FLIGHT_NUM
+   AND o.O_STATUS = 'COMPLETED'
+LEFT JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+GROUP BY f.FLIGHT_NUM, f.AIRCRAFT_ID, f.DEPARTURE_DATE, f.FLIGHT_STATUS,
+         r.ORIGIN, r.DESTINATION, a.CAPACITY_ECONOMY, a.CAPACITY_BUSINESS;
+
+INSERT INTO FLIGHT_CLASS_FACT (FLIGHT_NUM, CLASS, SEATS_SOLD, REVENUE)
+SELECT
+    f.FLIGHT_NUM, s.CLASS,
+    SUM(o.O_STATUS IN ('ACTIVE','COMPLETED')),
+    COALESCE(SUM(
+        CASE
+            WHEN o.O_STATUS IN ('ACTIVE','COMPLETED') THEN
+                CASE
+                    WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
+                    WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
+                END
+
+            WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+                 AND o.CANACELATION_DATE_TIME IS NOT NULL
+                 AND TIMESTAMPDIFF(HOUR, o.CANACELATION_DATE_TIME, f.DEPARTURE_DT) < 36
+            THEN
+                CASE
+                    WHEN s.CLASS = 'ECONOMY'  THEN f.ECONOMY_PRICE
+                    WHEN s.CLASS = 'BUSINESS' THEN f.BUSINESS_PRICE
+                END
+
+            WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+                 AND o.CANACELATION_DATE_TIME IS NOT NULL
+                 AND TIMESTAMPDIFF(HOUR, o.CANACELATION_DATE_TIME, f.DEPARTURE_DT) >= 36
+            THEN
+                (0.05 * o.ORDER_PRICE) *
+                (1.0 / (
+                      SELECT COUNT(*)
+                      FROM ORDER_SEAT os2
+                      WHERE os2.O_ID = o.O_ID
+                ))
+
+            ELSE 0
+        END
+    ), 0)
+FROM FLIGHT f
+JOIN F_ORDER o ON o.FLIGHT_NUM = f.FLIGHT_NUM
+JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+JOIN SEAT s
+  ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+ AND s.ROW_NUM = os.ROW_NUM
+ AND s.COL_LETTER = os.COL_LETTER
+GROUP BY f.FLIGHT_NUM, s.CLASS;
+
+INSERT INTO ORDER_DAY_FACT (O_DATE, CLASS, ORDERS, CANCELLED_ORDERS)
+SELECT
+    o.O_DATE, 'ALL',
+    COUNT(*),
+    SUM(o.O_STATUS = 'CUSTOMER_CANCELLED' AND o.CANACELATION_DATE_TIME IS NOT NULL)
+FROM F_ORDER o
+JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+WHERE o.O_DATE IS NOT NULL
+GROUP BY o.O_DATE
+
+UNION ALL
+
+SELECT
+    o.O_DATE, s.CLASS,
+    COUNT(DISTINCT o.O_ID),
+    COUNT(DISTINCT CASE
+        WHEN o.O_STATUS = 'CUSTOMER_CANCELLED'
+         AND o.CANACELATION_DATE_TIME IS NOT NULL
+        THEN o.O_ID END
+    )
+FROM F_ORDER o
+JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+JOIN ORDER_SEAT os ON os.O_ID = o.O_ID
+JOIN SEAT s
+  ON s.AIRCRAFT_ID = os.AIRCRAFT_ID
+ AND s.ROW_NUM = os.ROW_NUM
+ AND s.COL_LETTER = os.COL_LETTER
+WHERE o.O_DATE IS NOT NULL
+GROUP BY o.O_DATE, s.CLASS;
+
+INSERT INTO AIRCRAFT_MONTH_FACT
+(AIRCRAFT_ID, F_YEAR, F_MONTH, ORIGIN, DESTINATION, TOTAL_FLIGHTS, COMPLETED_FLIGHTS, CANCELLED_FLIGHTS)
+SELECT
+    AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE), ORIGIN, DESTINATION,
+    COUNT(*),
+    SUM(FLIGHT_STATUS = 'COMPLETED'),
+    SUM(FLIGHT_STATUS = 'CANCELLED')
+FROM FLIGHT_FACT
+WHERE DEPARTURE_DATE IS NOT NULL
+GROUP BY AIRCRAFT_ID, YEAR(DEPARTURE_DATE), MONTH(DEPARTURE_DATE), ORIGIN, DESTINATION;
+
 
 -- =========================
 -- MANAGER (2)
@@ -0,0 +1,247 @@
+import argparse
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from db import db_cursor
+from reports import invalidate_reports, refresh_facts
+from seating import purge_expired_holds
+
+
+SWEEP_INTERVAL = float(os.environ.get("FLYTAU_SWEEP_INTERVAL", "30"))  # max seconds between wake-ups
+QUEUE_HORIZON = timedelta(minutes=10)   # flights landing within this window are queued in memory
+FLIGHT_BATCH = 200                      # flights completed per UPDATE
+ORDER_BATCH = 500                       # orders completed per UPDATE
+
+
+class FlightSweeper:
+    """
+    Marks flights as COMPLETED when they land, and then completes their ACTIVE orders.
+    Keeps a small in-memory queue (heap) of the next flights to land, so it wakes up
+    exactly at arrival time instead of scanning the FLIGHT table on every web request.
+    """
+
+    def __init__(self):
+        self._queue = []          # heap of (arrival_dt, flight_num)
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._caught_up = False
+        self.stats = {
+            "runs_total": 0,
+            "errors_total": 0,
+            "flights_completed_total": 0,
+            "orders_completed_total": 0,
+            "holds_expired_total": 0,
+            "queue_size": 0,
+            "last_run_at": None,
+            "last_run_seconds": 0.0,
+            "lag_seconds": 0.0,
+            "last_error": None,
+        }
+
+    def schedule(self, flight_num, arrival_dt):
+        """
+        Adds one flight to the in-memory queue (if it lands soon).
+        """
+        if arrival_dt - datetime.now() > QUEUE_HORIZON:
+            return
+        with self._lock:
+            if flight_num not in self._queued:
+                self._queued.add(flight_num)
+                heapq.heappush(self._queue, (arrival_dt, flight_num))
+
+    def _refresh_queue(self, cur):
+        """
+        Loads flights that are still ACTIVE/FULL and land before now + QUEUE_HORIZON.
+        """
+        cur.execute("""
+            SELECT FLIGHT_NUM, ARRIVAL_DT AS arr_dt
+            FROM FLIGHT
+            WHERE FLIGHT_STATUS IN ('ACTIVE','FULL')
+              AND ARRIVAL_DT <= %s
+        """, (datetime.now() + QUEUE_HORIZON,))
+        for row in cur.fetchall():
+            self.schedule(row["FLIGHT_NUM"], row["arr_dt"])
+
+    def _pop_due(self, now):
+        """
+        Removes and returns all queued flights whose arrival time already passed.
+        """
+        due = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                arr_dt, flight_num = heapq.heappop(self._queue)
+                self._queued.discard(flight_num)
+                due.append((arr_dt, flight_num))
+        return due
+
+    def _complete_orders(self, cur, flight_nums):
+        """
+        Completes ACTIVE orders of the given flights, ORDER_BATCH rows per statement.
+        """
+        total = 0
+        placeholders = ",".join(["%s"] * len(flight_nums))
+        while True:
+            cur.execute(f"""
+                UPDATE F_ORDER
+                SET O_STATUS = 'COMPLETED'
+                WHERE FLIGHT_NUM IN ({placeholders})
+                  AND O_STATUS = 'ACTIVE'
+                LIMIT %s
+            """, tuple(flight_nums) + (ORDER_BATCH,))
+            total += cur.rowcount
+            if cur.rowcount < ORDER_BATCH:
+                return total
+
+    def _catch_up(self, db, cur):
+        """
+        One-time fix for flights that were completed while their orders stayed ACTIVE.
+        """
+        cur.execute("""
+            SELECT DISTINCT o.FLIGHT_NUM
+            FROM F_ORDER o
+            JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
+            WHERE o.O_STATUS = 'ACTIVE'
+              AND f.FLIGHT_STATUS = 'COMPLETED'
+        """)
+        flight_nums = [r["FLIGHT_NUM"] for r in cur.fetchall()]
+        orders = 0
+        for i in range(0, len(flight_nums), FLIGHT_BATCH):
+            db.start_transaction()
+            orders += self._complete_orders(cur, flight_nums[i:i + FLIGHT_BATCH])
+            refresh_facts(cur, flight_nums[i:i + FLIGHT_BATCH])
+            db.commit()
+        self._caught_up = True
+        return orders
+
+    def run_once(self):
+        """
+        Runs one sweep: refreshes the queue, completes every flight that already landed
+        and deletes expired seat holds.
+        Returns how many flights were completed.
+        """
+        started = time.monotonic()
+        now = datetime.now()
+        flights_done = 0
+        orders_done = 0
+        lag = 0.0
+
+        with db_cursor() as (db, cur):
+            if not self._caught_up:
+                orders_done += self._catch_up(db, cur)
+
+            self._refresh_queue(cur)
+            due = self._pop_due(now)
+
+            for i in range(0, len(due), FLIGHT_BATCH):
+                batch = due[i:i + FLIGHT_BATCH]
+                flight_nums = [fn for _, fn in batch]
+                placeholders = ",".join(["%s"] * len(flight_nums))
+
+                db.start_transaction()
+                cur.execute(f"""
+                    UPDATE FLIGHT
+                    SET FLIGHT_STATUS = 'COMPLETED'
+                    WHERE FLIGHT_NUM IN ({placeholders})
+                      AND FLIGHT_STATUS IN ('ACTIVE','FULL')
+                """, tuple(flight_nums))
+                flights_done += cur.rowcount
+                orders_done += self._complete_orders(cur, flight_nums)
+                refresh_facts(cur, flight_nums)
+                db.commit()
+
+                lag = max(lag, max((now - arr_dt).total_seconds() for arr_dt, _ in batch))
+
+            holds_purged = purge_expired_holds(cur)
+
+        if flights_done or orders_done:
+            invalidate_reports()
+
+        with self._lock:
+            self.stats["runs_total"] += 1
+            self.stats["flights_completed_total"] += flights_done
+            self.stats["orders_completed_total"] += orders_done
+            self.stats["holds_expired_total"] += holds_purged
+            self.stats["queue_size"] = len(self._queue)
+            self.stats["last_run_at"] = now.isoformat(timespec="seconds")
+            self.stats["last_run_seconds"] = round(time.monotonic() - started, 4)
+            self.stats["lag_seconds"] = round(lag, 3)
+
+        return flights_done
+
+    def _seconds_until_next(self):
+        """
+        How long to sleep: until the next queued arrival, but never more than SWEEP_INTERVAL.
+        """
+        with self._lock:
+            if not self._queue:
+                return SWEEP_INTERVAL
+            wait = (self._queue[0][0] - datetime.now()).total_seconds()
+        return min(max(wait, 0.5), SWEEP_INTERVAL)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors_total"] += 1
+                    self.stats["last_error"] = str(e)
+                self._stop.wait(SWEEP_INTERVAL)
+                continue
+            self._stop.wait(self._seconds_until_next())
+
+    def start(self):
+        """
+        Starts the sweeper in a background daemon thread (only once).
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="flight-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+flight_sweeper = FlightSweeper()
+
+
+def start_sweeper():
+    """
+    Starts the shared sweeper thread for this process.
+    """
+    flight_sweeper.start()
+
+
+def sweeper_stats():
+    """
+    Returns a copy of the sweeper metrics (last run, lag, totals...).
+    """
+    with flight_sweeper._lock:
+        return dict(flight_sweeper.stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Complete landed flights and their orders.")
+    parser.add_argument("--once", action="store_true", help="run one sweep and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        done = flight_sweeper.run_once()
+        print(f"Completed {done} flights.", sweeper_stats())
+    else:
+        flight_sweeper.start()
+        try:
+            while True:
+                time.sleep(60)
+                print(sweeper_stats())
+        except KeyboardInterrupt:
+            flight_sweeper.stop()
@@ -0,0 +1,108 @@
+from datetime import date
+
+import pytest
+
+import reports
+from reports import FactDeltas
+
+
+class UpsertCursor:
+    """
+    Fake cursor that plays the fact upserts of reports.py against in-memory tables.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.order = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        assert sql.startswith("INSERT INTO") and "ON DUPLICATE KEY UPDATE" in sql
+        table = sql.split()[2]
+        cols = sql[sql.index("(") + 1:sql.index(")")].split(", ")
+        n_keys = len(cols) - sql.count("+ %s")
+        values = params[:len(cols)]
+        assert params[len(cols):] == values[n_keys:]   # each counter is added as it is inserted
+        key = tuple(values[:n_keys])
+        self.order.append((table, key))
+        row = self.tables.setdefault(table, {}).setdefault(key, [0] * (len(cols) - n_keys))
+        for i, delta in enumerate(values[n_keys:]):
+            row[i] += delta
+
+
+DAY = date(2026, 3, 1)
+SEATS = [("BUSINESS", 250), ("ECONOMY", 100), ("ECONOMY", 100)]
+
+
+def placed_and_cancelled(hours_before):
+    cur = UpsertCursor()
+    placed = FactDeltas()
+    placed.order_placed("F1", DAY, SEATS)
+    placed.write(cur)
+    cancelled = FactDeltas()
+    cancelled.order_cancelled("F1", DAY, SEATS, round(450 * 0.05, 2), hours_before)
+    cancelled.write(cur)
+    return cur.tables
+
+
+def test_order_placed_counts_seats_and_day():
+    cur = UpsertCursor()
+    facts = FactDeltas()
+    facts.order_placed("F1", DAY, SEATS)
+    facts.write(cur)
+
+    assert cur.tables["FLIGHT_CLASS_FACT"] == {("F1", "BUSINESS"): [1, 250], ("F1", "ECONOMY"): [2, 200]}
+    assert cur.tables["ORDER_DAY_FACT"] == {
+        (DAY, "ALL"): [1, 0], (DAY, "BUSINESS"): [1, 0], (DAY, "ECONOMY"): [1, 0],
+    }
+
+
+def test_late_cancellation_keeps_seat_prices():
+    tables = placed_and_cancelled(hours_before=20)
+
+    assert tables["FLIGHT_CLASS_FACT"] == {("F1", "BUSINESS"): [0, 250], ("F1", "ECONOMY"): [0, 200]}
+    assert tables["ORDER_DAY_FACT"][(DAY, "ALL")] == [1, 1]
+    assert tables["ORDER_DAY_FACT"][(DAY, "ECONOMY")] == [1, 1]
+
+
+def test_early_cancellation_keeps_the_fee_spread_over_seats():
+    tables = placed_and_cancelled(hours_before=72)
+    fee = 0.05 * 22.5 / 3   # 5% of the order price left after the cancellation, per seat
+
+    sold, revenue = tables["FLIGHT_CLASS_FACT"][("F1", "BUSINESS")]
+    assert sold == 0 and revenue == pytest.approx(fee, abs=1e-4)
+    sold, revenue = tables["FLIGHT_CLASS_FACT"][("F1", "ECONOMY")]
+    assert sold == 0 and revenue == pytest.approx(2 * fee, abs=1e-4)
+
+
+def test_write_locks_rows_in_a_fixed_order():
+    cur = UpsertCursor()
+    facts = FactDeltas()
+    facts.order_placed("F2", DAY, [("ECONOMY", 100)])
+    facts.order_placed("F1", DAY, [("BUSINESS", 250)])
+    facts.write(cur)
+
+    assert cur.order == [
+        ("FLIGHT_CLASS_FACT", ("F1", "BUSINESS")), ("FLIGHT_CLASS_FACT", ("F2", "ECONOMY")),
+        ("ORDER_DAY_FACT", (DAY, "ALL")), ("ORDER_DAY_FACT", (DAY, "BUSINESS")),
+        ("ORDER_DAY_FACT", (DAY, "ECONOMY")),
+    ]
+
+
+def test_bookings_shorten_the_life_of_cached_reports(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(reports.time, "monotonic", lambda: now[0])
+    cache = reports.ReportCache(ttl=300, booking_ttl=30)
+    cache.put("r1", cache.version, 42)
+
+    cache.bookings_changed()
+    now[0] += 10
+    assert cache.get("r1") == (True, 42)   # still within the booking TTL
+    cache.put("r2", cache.version, 7)
+
+    now[0] += 25
+    assert cache.get("r1") == (False, None)
+    assert cache.get("r2") == (True, 7)    # built after the last booking: full TTL
+
+    cache.invalidate()
+    assert cache.get("r2") == (False, None)
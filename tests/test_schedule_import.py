@@ -0,0 +1,15 @@
+import json
+
+from schedule_import import read_schedule
+
+
+def test_json_entries_that_are_not_flights_become_row_errors():
+    flight = {"origin": "TLV", "destination": "ATH", "departure_date": "2026-01-01",
+              "departure_time": "10:00", "aircraft_id": "A1", "pilots": "P1;P2", "attendants": ["A1"]}
+    rows = read_schedule(json.dumps([flight, 7, "TLV", [flight], dict(flight, pilots=5)]), "json")
+
+    assert len(rows) == 5
+    assert rows[0]["format_errors"] == [] and rows[0]["pilots"] == ["P1", "P2"]
+    for r in rows[1:4]:
+        assert r["format_errors"] == ["each flight must be a JSON object"]
+    assert rows[4]["format_errors"] == ["pilots must be a list or a ';'-separated string"]
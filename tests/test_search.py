@@ -0,0 +1,24 @@
+from pages import parse_search_form
+from search import RouteDirectory
+
+
+def make_directory(pairs):
+    return RouteDirectory([{"ORIGIN": o, "DESTINATION": d, "ROUTE_ID": f"R{i}", "DURATION": 60}
+                           for i, (o, d) in enumerate(pairs)], version=0)
+
+
+def test_paths_never_return_to_the_origin():
+    directory = make_directory([("TLV", "ATH"), ("ATH", "TLV"), ("ATH", "ROM"), ("ROM", "TLV")])
+
+    assert directory.paths("TLV", "TLV", 2) == []
+    assert directory.paths("TLV", "ROM", 2) == [["TLV", "ATH", "ROM"]]
+
+
+def test_search_form_rejects_same_city():
+    error, values = parse_search_form({"origin": "TLV", "destination": "tlv ",
+                                       "departure_date": "2026-01-01", "passengers": "1"})
+    assert error and values is None
+
+    error, values = parse_search_form({"origin": "TLV", "destination": "ATH",
+                                       "departure_date": "2026-01-01", "passengers": "2"})
+    assert error is None and values["passengers"] == 2
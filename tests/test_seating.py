@@ -0,0 +1,214 @@
+import pytest
+
+import seating
+from seating import SeatMap, occupy_seats, quote_seats, release_seats, seats_from_mask, seats_mask
+
+
+class CountingCursor:
+    """
+    Fake dictionary cursor: returns canned rows and counts the statements it runs.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+def make_seat_map(aircraft_id="A1"):
+    seats = [
+        {"ROW_NUM": 1, "COL_LETTER": "A", "CLASS": "BUSINESS"},
+        {"ROW_NUM": 1, "COL_LETTER": "B", "CLASS": "BUSINESS"},
+        {"ROW_NUM": 2, "COL_LETTER": "A", "CLASS": "ECONOMY"},
+        {"ROW_NUM": 2, "COL_LETTER": "B", "CLASS": "ECONOMY"},
+    ]
+    return SeatMap(aircraft_id, ["A"], [], ["B"], seats)
+
+
+@pytest.fixture
+def seat_map():
+    seat_map = make_seat_map()
+    seating._seat_maps[seat_map.aircraft_id] = seat_map
+    yield seat_map
+    seating.invalidate_seat_map(seat_map.aircraft_id)
+
+
+def quote_row(seat_map, row_num, col, seat_class, taken=()):
+    return {
+        "AIRCRAFT_ID": seat_map.aircraft_id, "ECONOMY_PRICE": 100, "BUSINESS_PRICE": 250,
+        "ROW_NUM": row_num, "COL_LETTER": col, "CLASS": seat_class,
+        "SEAT_BITMAP": seats_mask(seat_map, taken),
+    }
+
+
+def test_quote_seats_runs_one_query(seat_map):
+    cur = CountingCursor([
+        quote_row(seat_map, 1, "A", "BUSINESS", taken=[(2, "B")]),
+        quote_row(seat_map, 2, "A", "ECONOMY", taken=[(2, "B")]),
+        quote_row(seat_map, 2, "B", "ECONOMY", taken=[(2, "B")]),
+    ])
+
+    quote = quote_seats(cur, "F1", ["1A", "2a", "2B", "9Z", "x"])
+
+    assert len(cur.executed) == 1
+    assert [s["code"] for s in quote.seats] == ["1A", "2A"]
+    assert quote.total_price == 350
+    assert quote.taken == ["2B"]
+    assert quote.invalid == ["X", "9Z"]
+    assert not quote.ok
+
+
+def test_quote_seats_unknown_flight(seat_map):
+    cur = CountingCursor([])
+    assert quote_seats(cur, "NOPE", ["1A"]) is None
+    assert len(cur.executed) == 1
+
+
+class OccupancyCursor:
+    """
+    Fake dictionary cursor that plays the FLIGHT_OCCUPANCY statements of seating.py
+    against an in-memory row, with MySQL's rules for bitwise operations on binary strings.
+    """
+
+    def __init__(self, order_seats=(), bitmap=None, seats_taken=0):
+        self.order_seats = list(order_seats)   # seats of the ACTIVE orders of the flight
+        self.row = None if bitmap is None else {"SEAT_BITMAP": bitmap, "SEATS_TAKEN": seats_taken}
+        self.result = []
+        self.description = None
+        self.rowcount = 0
+
+    def _check_masks(self, sql, mask):
+        # the masks must be sent as binary strings (else & and | work on numbers)
+        assert sql.count("CAST(%s AS BINARY)") == 2
+        if len(mask) != len(self.row["SEAT_BITMAP"]):
+            raise AssertionError("3513: Binary operands of bitwise operators must be of equal length")
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.result, self.description, self.rowcount = [], None, 0
+
+        if sql.startswith("SELECT LENGTH(SEAT_BITMAP)"):
+            self.description = [("SIZE",)]
+            if self.row:
+                self.result = [{"SIZE": len(self.row["SEAT_BITMAP"])}]
+        elif sql.startswith("DELETE FROM FLIGHT_OCCUPANCY"):
+            self.rowcount = 1 if self.row else 0
+            self.row = None
+        elif "FROM ORDER_SEAT" in sql:
+            self.description = [("ROW_NUM",), ("COL_LETTER",)]
+            self.result = [{"ROW_NUM": r, "COL_LETTER": c} for r, c in self.order_seats]
+        elif sql.startswith("INSERT IGNORE INTO FLIGHT_OCCUPANCY"):
+            if self.row is None:
+                self.row = {"SEAT_BITMAP": params[1], "SEATS_TAKEN": params[2]}
+                self.rowcount = 1
+        elif sql.startswith("UPDATE FLIGHT_OCCUPANCY SET SEAT_BITMAP"):
+            mask, count, _, test = params
+            self._check_masks(sql, mask)
+            bitmap = self.row["SEAT_BITMAP"]
+            if not any(a & b for a, b in zip(bitmap, test)):
+                self.row = {"SEAT_BITMAP": bytes(a | b for a, b in zip(bitmap, mask)),
+                            "SEATS_TAKEN": self.row["SEATS_TAKEN"] + count}
+                self.rowcount = 1
+        elif sql.startswith("UPDATE FLIGHT_OCCUPANCY SET SEATS_TAKEN"):
+            mask = params[0]
+            self._check_masks(sql, mask)
+            bitmap = self.row["SEAT_BITMAP"]
+            freed = sum(bin(a & b).count("1") for a, b in zip(bitmap, mask))
+            self.row = {"SEAT_BITMAP": bytes(a & ~b & 0xFF for a, b in zip(bitmap, mask)),
+                        "SEATS_TAKEN": self.row["SEATS_TAKEN"] - freed}
+            self.rowcount = 1
+        else:
+            raise AssertionError(f"unexpected statement: {sql}")
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+    def taken(self, seat_map):
+        return seats_from_mask(seat_map, self.row["SEAT_BITMAP"])
+
+
+def test_occupy_seats_claims_free_seats():
+    seat_map = make_seat_map()
+    cur = OccupancyCursor(order_seats=[(1, "A")])   # no occupancy row yet: built from the orders
+
+    assert occupy_seats(cur, "F1", seat_map, [(2, "A"), (2, "B")])
+    assert cur.taken(seat_map) == {(1, "A"), (2, "A"), (2, "B")}
+    assert cur.row["SEATS_TAKEN"] == 3
+
+
+def test_occupy_seats_conflict_changes_nothing():
+    seat_map = make_seat_map()
+    cur = OccupancyCursor(bitmap=seats_mask(seat_map, [(1, "B")]), seats_taken=1)
+
+    assert not occupy_seats(cur, "F1", seat_map, [(1, "A"), (1, "B")])
+    assert cur.taken(seat_map) == {(1, "B")}
+    assert cur.row["SEATS_TAKEN"] == 1
+
+
+def test_release_seats_frees_only_taken_seats():
+    seat_map = make_seat_map()
+    cur = OccupancyCursor(bitmap=seats_mask(seat_map, [(1, "A"), (2, "B")]), seats_taken=2)
+
+    release_seats(cur, "F1", seat_map, [(2, "B"), (2, "A")])
+    assert cur.taken(seat_map) == {(1, "A")}
+    assert cur.row["SEATS_TAKEN"] == 1
+
+
+def test_occupancy_of_another_seat_grid_is_rebuilt(monkeypatch):
+    seat_map = make_seat_map()
+    monkeypatch.setattr(seating, "get_seat_map", lambda cur, aircraft_id: seat_map)
+    # row built for another seat grid (e.g. before a seat backfill): two bytes instead of one
+    cur = OccupancyCursor(order_seats=[(2, "A")], bitmap=b"\x00\x00", seats_taken=0)
+
+    assert occupy_seats(cur, "F1", seat_map, [(1, "A")])
+    assert len(cur.row["SEAT_BITMAP"]) == len(seats_mask(seat_map, []))
+    assert cur.taken(seat_map) == {(1, "A"), (2, "A")}
+    assert cur.row["SEATS_TAKEN"] == 2
+
+
+def test_stale_seat_map_is_reloaded_before_rebuilding(monkeypatch):
+    stale = make_seat_map()
+    fresh = SeatMap("A1", ["A"], ["B"], ["C"], [
+        {"ROW_NUM": r, "COL_LETTER": c, "CLASS": "ECONOMY"} for r in (1, 2, 3) for c in "ABC"
+    ])
+    monkeypatch.setattr(seating, "get_seat_map", lambda cur, aircraft_id: fresh)
+    # another worker already rebuilt the row for the backfilled (9-seat, two-byte) grid
+    cur = OccupancyCursor(bitmap=seats_mask(fresh, [(3, "C")]), seats_taken=1)
+
+    assert occupy_seats(cur, "F1", stale, [(1, "A")])
+    assert cur.taken(fresh) == {(1, "A"), (3, "C")}
+    assert cur.row["SEATS_TAKEN"] == 2
+
+
+def test_cached_seat_map_expires(seat_map, monkeypatch):
+    assert seating.get_seat_map(None, seat_map.aircraft_id) is seat_map
+
+    monkeypatch.setattr(seat_map, "loaded_at", seat_map.loaded_at - seating.SEAT_MAP_TTL - 1)
+    monkeypatch.setattr(seating, "run_steps", lambda cur, steps: next(steps))
+    sql, params = seating.get_seat_map(None, seat_map.aircraft_id)   # first query of a reload
+    assert "FROM AIRCRAFT" in sql and params == (seat_map.aircraft_id,)
+
+
+def test_occupy_seats_counts_each_seat_once():
+    seat_map = make_seat_map()
+    cur = OccupancyCursor(bitmap=seats_mask(seat_map, []), seats_taken=0)
+
+    assert occupy_seats(cur, "F1", seat_map, [(1, "A"), (1, "A"), (2, "B")])
+    assert cur.row["SEATS_TAKEN"] == 2
+
+
+def test_occupy_seats_rejects_unknown_seats():
+    seat_map = make_seat_map()
+    cur = OccupancyCursor(bitmap=seats_mask(seat_map, []), seats_taken=0)
+
+    with pytest.raises(ValueError):
+        occupy_seats(cur, "F1", seat_map, [(1, "A"), (9, "Z")])
+    assert cur.row["SEATS_TAKEN"] == 0
@@ -0,0 +1,59 @@
+from flask import Flask, session
+
+from session_store import MemorySessionStore, ServerSessionInterface
+
+
+def make_app(store):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.route("/visit")
+    def visit():
+        session["user_type"] = "guest"
+        return "ok"
+
+    @app.route("/login")
+    def login():
+        session.clear()
+        session["user_type"] = "registered"
+        return "ok"
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        return "ok"
+
+    return app
+
+
+def session_cookie(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def test_login_rotates_the_session_id():
+    store = MemorySessionStore()
+    client = make_app(store).test_client()
+
+    client.get("/visit")
+    guest_sid = session_cookie(client)
+    assert store.get(guest_sid) is not None
+
+    client.get("/login")
+    user_sid = session_cookie(client)
+    assert user_sid and user_sid != guest_sid
+    assert store.get(guest_sid) is None
+    assert store.get(user_sid) is not None
+
+
+def test_logout_deletes_the_session():
+    store = MemorySessionStore()
+    client = make_app(store).test_client()
+
+    client.get("/login")
+    sid = session_cookie(client)
+    client.get("/logout")
+
+    assert session_cookie(client) is None
+    assert store.get(sid) is None
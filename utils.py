@@ -1,7 +1,8 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session
 from datetime import datetime, timedelta, date
-from db import get_db_connection
+from db import db_cursor, sequence_cursor
 import re
+import threading
 
 def parse_phones(raw_text):
     """
@@ -93,21 +94,80 @@ def require_manager():
     return session.get("user_type") == "manager"
 
 
-def next_flight_num(cur):
+# name -> (table, id column, prefix, first value - 1, how many ids one worker reserves at a time)
+SEQUENCES = {
+    "FLIGHT": ("FLIGHT", "FLIGHT_NUM", "F", 599, 1),
+    "ORDER": ("F_ORDER", "O_ID", "O", 499, 20),
+}
+
+_seq_lock = threading.Lock()
+_seq_blocks = {}
+
+
+def _seed_sequence(cur, name):
     """
-    Creates the next flight number like F600, F601, etc.
-    Looks at existing flight numbers in the database and adds 1.
+    Creates the SEQUENCE_COUNTER row for a sequence, starting after the highest existing ID.
+    Only needed once, for databases that were created before the counter table existed.
+    """
+    table, col, prefix, floor, _ = SEQUENCES[name]
+    cur.execute(f"""
+        INSERT IGNORE INTO SEQUENCE_COUNTER (SEQ_NAME, SEQ_VALUE)
+        SELECT %s, GREATEST(%s, IFNULL(MAX(CAST(SUBSTRING({col}, 2) AS UNSIGNED)), 0))
+        FROM {table}
+        WHERE {col} LIKE %s
+    """, (name, floor, prefix + "%"))
+
+
+def next_sequence_value(name):
+    """
+    Returns the next number of a sequence (ORDER / FLIGHT) in O(1), without scanning the table.
+    Each worker reserves a block of numbers with one atomic UPDATE and hands them out from memory,
+    so concurrent workers never get the same number (unused numbers are simply skipped).
     """
-    cur.execute("SELECT FLIGHT_NUM FROM FLIGHT WHERE FLIGHT_NUM LIKE 'F%'")
-    rows = cur.fetchall()
+    with _seq_lock:
+        nxt, last = _seq_blocks.get(name, (1, 0))
+        if nxt <= last:
+            _seq_blocks[name] = (nxt + 1, last)
+            return nxt
 
-    mx = 599
-    for r in rows:
-        fn = r["FLIGHT_NUM"] if isinstance(r, dict) else r[0]
-        m = re.match(r"F(\d+)", str(fn))
-        if m:
-            mx = max(mx, int(m.group(1)))
-    return f"F{mx+1}"
+        block = SEQUENCES[name][4]
+        first = reserve_sequence_block(name, block)
+        _seq_blocks[name] = (first + 1, first + block - 1)
+        return first
+
+
+def reserve_sequence_block(name, count):
+    """
+    Reserves `count` consecutive numbers of a sequence with one atomic UPDATE.
+    Returns the first number; the caller owns first .. first + count - 1.
+    """
+    # Own autocommit connection, not the caller's and not a second pooled one: the reserved
+    # block is kept even if the caller rolls back, and a full pool cannot block it.
+    with sequence_cursor() as cur:
+        cur.execute("""
+            UPDATE SEQUENCE_COUNTER
+            SET SEQ_VALUE = LAST_INSERT_ID(SEQ_VALUE + %s)
+            WHERE SEQ_NAME=%s
+        """, (count, name))
+        if cur.rowcount == 0:
+            _seed_sequence(cur, name)
+            cur.execute("""
+                UPDATE SEQUENCE_COUNTER
+                SET SEQ_VALUE = LAST_INSERT_ID(SEQ_VALUE + %s)
+                WHERE SEQ_NAME=%s
+            """, (count, name))
+        cur.execute("SELECT LAST_INSERT_ID()")
+        last = int(cur.fetchone()[0])
+
+    return last - count + 1
+
+
+def next_flight_num():
+    """
+    Creates the next flight number like F600, F601, etc.
+    Takes the number from the FLIGHT sequence.
+    """
+    return f"F{next_sequence_value('FLIGHT')}"
 
 
 
@@ -119,19 +179,10 @@ def any_phone_belongs_to_manager(phone_list):
     if not phone_list:
         return False
 
-    db = get_db_connection()
-    cur = db.cursor()
-
-    for phone in phone_list:
-        cur.execute("SELECT 1 FROM MANAGER WHERE PHONE_NUM=%s", (phone,))
-        if cur.fetchone():
-            cur.close()
-            db.close()
-            return True
-
-    cur.close()
-    db.close()
-    return False
+    placeholders = ",".join(["%s"] * len(phone_list))
+    with db_cursor(dictionary=False) as (db, cur):
+        cur.execute(f"SELECT 1 FROM MANAGER WHERE PHONE_NUM IN ({placeholders}) LIMIT 1", tuple(phone_list))
+        return cur.fetchone() is not None
 
 
 def is_valid_name(name):
@@ -230,28 +281,19 @@ def aircraft_available(cur, aircraft_id, cand_start, cand_end):
       FROM FLIGHT
       WHERE AIRCRAFT_ID=%s
         AND FLIGHT_STATUS <> 'CANCELLED'
-        AND TIMESTAMP(DEPARTURE_DATE, DEPARTURE_TIME) < %s
-        AND TIMESTAMP(ARRIVAL_DATE, ARRIVAL_TIME) > %s
+        AND DEPARTURE_DT < %s
+        AND ARRIVAL_DT > %s
       LIMIT 1
     """, (aircraft_id, cand_end, cand_start))
     return cur.fetchone() is None
 
 
-def next_order_id(cur):
+def next_order_id():
     """
     Creates the next order ID like O500, O501, etc.
-    Looks at existing orders in the database and adds 1.
+    Takes the number from the ORDER sequence.
     """
-    cur.execute("SELECT O_ID FROM F_ORDER WHERE O_ID LIKE 'O%'")
-    rows = cur.fetchall()
-
-    mx = 499
-    for r in rows:
-        oid = r["O_ID"] if isinstance(r, dict) else r[0]
-        m = re.match(r"O(\d+)", str(oid))
-        if m:
-            mx = max(mx, int(m.group(1)))
-    return f"O{mx+1}"
+    return f"O{next_sequence_value('ORDER')}"
 
 
 def is_valid_hebrew_name(name: str) -> bool:
@@ -279,14 +321,14 @@ def crew_week_rule_ok(cur, role: str, emp_id: str, cand_start: datetime, cand_or
     cur.execute(f"""
         SELECT
           r.DESTINATION,
-          TIMESTAMP(f.ARRIVAL_DATE, f.ARRIVAL_TIME) AS arr_dt
+          f.ARRIVAL_DT AS arr_dt
         FROM {join_table} j
         JOIN FLIGHT f ON j.FLIGHT_NUM = f.FLIGHT_NUM
         JOIN ROUTE r ON f.ROUTE_ID = r.ROUTE_ID AND f.DURATION = r.DURATION
         WHERE j.{id_col}=%s
           AND f.FLIGHT_STATUS <> 'CANCELLED'
-          AND TIMESTAMP(f.ARRIVAL_DATE, f.ARRIVAL_TIME) <= %s
-          AND TIMESTAMP(f.ARRIVAL_DATE, f.ARRIVAL_TIME) >= %s
+          AND f.ARRIVAL_DT <= %s
+          AND f.ARRIVAL_DT >= %s
         ORDER BY arr_dt DESC
         LIMIT 1
     """, (emp_id, cand_start, seven_days_ago))
@@ -328,22 +370,14 @@ def seat_layout(manufacturer: str, size: str):
     return (["A","B","C"], [], ["D","E","F"])
 
 
-def create_seats_for_aircraft(cur, aircraft_id, cap_econ, cap_bus):
-    """
-    Creates seat rows/columns in the SEAT table for an aircraft.
-    Uses the aircraft layout and fills business seats first, then economy.
-    """
-    cur.execute("""
-        SELECT MANUFACTURER, SIZE
-        FROM AIRCRAFT
-        WHERE AIRCRAFT_ID=%s
-        LIMIT 1
-    """, (aircraft_id,))
-    a = cur.fetchone()
+SEAT_BATCH = 500   # seats per INSERT in create_seats_for_aircraft
 
-    manufacturer = a["MANUFACTURER"] if a and isinstance(a, dict) else (a[0] if a else "")
-    size = a["SIZE"] if a and isinstance(a, dict) else (a[1] if a else "SMALL")
 
+def seat_rows(aircraft_id, manufacturer, size, cap_econ, cap_bus):
+    """
+    Builds the SEAT rows (aircraft, row, column, class) of an aircraft from its layout.
+    Business seats come first, then economy, filling each row from left to right.
+    """
     cols_left, cols_mid, cols_right = seat_layout(manufacturer, size)
     cols = cols_left + cols_mid + cols_right
     seats_per_row = len(cols)
@@ -368,22 +402,51 @@ def create_seats_for_aircraft(cur, aircraft_id, cap_econ, cap_bus):
         if ((total_bus + i) % seats_per_row) == (seats_per_row - 1):
             row += 1
 
-    for s in seats:
-        cur.execute("""
+    return seats
+
+
+def create_seats_for_aircraft(cur, aircraft_id, cap_econ, cap_bus):
+    """
+    Creates seat rows/columns in the SEAT table for an aircraft.
+    Uses the aircraft layout and fills business seats first, then economy.
+    Seats go in with one executemany per SEAT_BATCH rows (the connector sends each batch
+    as a single multi-row INSERT); existing seats are kept.
+    Returns how many seats were added.
+    """
+    cur.execute("""
+        SELECT MANUFACTURER, SIZE
+        FROM AIRCRAFT
+        WHERE AIRCRAFT_ID=%s
+        LIMIT 1
+    """, (aircraft_id,))
+    a = cur.fetchone()
+
+    manufacturer = a["MANUFACTURER"] if a and isinstance(a, dict) else (a[0] if a else "")
+    size = a["SIZE"] if a and isinstance(a, dict) else (a[1] if a else "SMALL")
+
+    seats = seat_rows(aircraft_id, manufacturer, size, cap_econ, cap_bus)
+    added = 0
+    for i in range(0, len(seats), SEAT_BATCH):
+        cur.executemany("""
             INSERT IGNORE INTO SEAT (AIRCRAFT_ID, ROW_NUM, COL_LETTER, CLASS)
             VALUES (%s,%s,%s,%s)
-        """, s)
+        """, seats[i:i + SEAT_BATCH])
+        added += cur.rowcount
+    return added
 
 def update_flight_full_status(cur, flight_num: str):
     """
     Updates flight status to FULL when all seats are taken, otherwise ACTIVE.
+    Reads the taken-seat counter from FLIGHT_OCCUPANCY (falls back to counting orders).
     Does nothing for CANCELLED or COMPLETED flights.
     """
     cur.execute("""
         SELECT f.FLIGHT_STATUS,
-               (a.CAPACITY_ECONOMY + a.CAPACITY_BUSINESS) AS total_seats
+               (a.CAPACITY_ECONOMY + a.CAPACITY_BUSINESS) AS total_seats,
+               occ.SEATS_TAKEN
         FROM FLIGHT f
         JOIN AIRCRAFT a ON a.AIRCRAFT_ID = f.AIRCRAFT_ID
+        LEFT JOIN FLIGHT_OCCUPANCY occ ON occ.FLIGHT_NUM = f.FLIGHT_NUM
         WHERE f.FLIGHT_NUM = %s
         LIMIT 1
     """, (flight_num,))
@@ -400,14 +463,17 @@ def update_flight_full_status(cur, flight_num: str):
         return
 
 
-    cur.execute("""
-        SELECT COUNT(*) AS taken
-        FROM ORDER_SEAT os
-        JOIN F_ORDER o ON o.O_ID = os.O_ID
-        WHERE o.FLIGHT_NUM = %s
-          AND o.O_STATUS = 'ACTIVE'
-    """, (flight_num,))
-    taken = int(cur.fetchone()["taken"] or 0)
+    if row["SEATS_TAKEN"] is not None:
+        taken = int(row["SEATS_TAKEN"])
+    else:
+        cur.execute("""
+            SELECT COUNT(*) AS taken
+            FROM ORDER_SEAT os
+            JOIN F_ORDER o ON o.O_ID = os.O_ID
+            WHERE o.FLIGHT_NUM = %s
+              AND o.O_STATUS = 'ACTIVE'
+        """, (flight_num,))
+        taken = int(cur.fetchone()["taken"] or 0)
 
 
     if total_seats > 0 and taken >= total_seats:
@@ -423,36 +489,6 @@ def update_flight_full_status(cur, flight_num: str):
         """, (new_status, flight_num))
 
 
-def auto_complete_flights():
-    """
-    Automatically marks flights as COMPLETED when arrival time already passed.
-    Also marks their ACTIVE orders as COMPLETED.
-    """
-    db = get_db_connection()
-    cur = db.cursor(dictionary=True)
-    try:
-
-        cur.execute("""
-            UPDATE FLIGHT
-            SET FLIGHT_STATUS = 'COMPLETED'
-            WHERE FLIGHT_STATUS IN ('ACTIVE','FULL')
-              AND TIMESTAMP(ARRIVAL_DATE, ARRIVAL_TIME) <= NOW()
-        """)
-
-
-        cur.execute("""
-            UPDATE F_ORDER o
-            JOIN FLIGHT f ON f.FLIGHT_NUM = o.FLIGHT_NUM
-            SET o.O_STATUS = 'COMPLETED'
-            WHERE o.O_STATUS = 'ACTIVE'
-              AND f.FLIGHT_STATUS = 'COMPLETED'
-        """)
-
-        db.commit()
-    finally:
-        cur.close()
-        db.close()
-
 FOUR_DAYS = timedelta(days=4)
 
 def four_day_availability_ok(existing_flights, cand_dep_dt, cand_arr_dt, cand_origin, cand_dest):